@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+
+from metrics import registry, Counter, Gauge
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ✅ Admission control settings (rates are requests per minute, bursts are bucket sizes)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_URL = os.getenv("ADMISSION_URL")  # e.g. redis://localhost:6379/1 to share buckets between workers
+ADMISSION_CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "30"))
+ADMISSION_CLIENT_BURST = int(os.getenv("ADMISSION_CLIENT_BURST", "10"))
+ADMISSION_USERNAME_RATE = float(os.getenv("ADMISSION_USERNAME_RATE", "10"))
+ADMISSION_USERNAME_BURST = int(os.getenv("ADMISSION_USERNAME_BURST", "5"))
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "4"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "8"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "1.0"))  # seconds
+ADMISSION_MAX_KEYS = int(os.getenv("ADMISSION_MAX_KEYS", "10000"))
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+
+admission_rejected = registry.register(Counter(
+    "admission_rejected_total", "Requests shed by admission control, by route scope and reason.", ("scope", "reason"),
+))
+admission_fallbacks = registry.register(Counter(
+    "admission_backend_fallbacks_total", "Bucket checks answered by in-process buckets because the shared store failed.",
+))
+
+
+class LocalBuckets:
+    """In-process token buckets, bounded to max_keys (least recently used keys go first)."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Takes a token; returns 0 when allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+        self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> dict:
+        return {"backend": "local", "keys": len(self._buckets), "max_keys": self.max_keys}
+
+
+# Refill and take in one round trip; Redis' clock keeps workers consistent
+_TAKE_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class SharedBuckets:
+    """
+    Token buckets in Redis, shared by every worker. Each take is one
+    atomic script call; idle buckets expire once they would be full again.
+
+    If Redis cannot be reached the take falls back to this worker's own
+    LocalBuckets, so an outage loosens the limits (per worker rather than
+    shared) instead of failing every login with a 500.
+    """
+
+    def __init__(self, client, prefix: str = "admission", max_keys: int = ADMISSION_MAX_KEYS):
+        self.prefix = prefix
+        self._take = client.register_script(_TAKE_SCRIPT)
+        self._fallback = LocalBuckets(max_keys)
+        self.degraded = False
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        try:
+            wait = float(await self._take(keys=[f"{self.prefix}:{key}"], args=[rate, burst]))
+        except Exception as e:
+            if not self.degraded:
+                logger.warning("Admission store unavailable, using in-process buckets: %s", e)
+                self.degraded = True
+            admission_fallbacks.inc()
+            return await self._fallback.take(key, rate, burst)
+        if self.degraded:
+            logger.info("Admission store reachable again")
+            self.degraded = False
+        return wait
+
+    def stats(self) -> dict:
+        return {"backend": "shared", "degraded": self.degraded, "fallback_keys": len(self._fallback._buckets)}
+
+
+class ConcurrencyLimiter:
+    """
+    Caps how many expensive requests run at once in this worker. Up to
+    queue_size more wait at most queue_timeout for a slot; anything beyond
+    that is rejected straight away. It is per process on purpose: it
+    protects this worker's CPU and thread pools.
+    """
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self, scope: str):
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_size:
+                _reject(scope, "queue_full", 503, "Server busy, try again shortly", 1)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                _reject(scope, "queue_timeout", 503, "Server busy, try again shortly", 1)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting, "queue_size": self.queue_size}
+
+
+def _reject(scope: str, reason: str, status_code: int, detail: str, retry_after: float):
+    admission_rejected.inc(scope, reason)
+    raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+# ✅ Request keys for the buckets (None skips the limit for that request)
+def client_key(request: Request):
+    """Client address; the first X-Forwarded-For hop when ADMISSION_TRUST_FORWARDED is set."""
+    forwarded = request.headers.get("x-forwarded-for") if ADMISSION_TRUST_FORWARDED else None
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+def path_username(request: Request):
+    username = request.path_params.get("username")
+    return username.lower() if username else None
+
+
+async def body_username(request: Request):
+    body = await request.json()  # ✅ Already read and cached by FastAPI for the route's body model
+    username = body.get("username") if isinstance(body, dict) else None
+    return username.lower() if isinstance(username, str) and username else None
+
+
+class RateLimit:
+    """One token bucket per key: `rate` requests per minute with bursts of up to `burst`."""
+
+    def __init__(self, name: str, key, rate: float, burst: int):
+        self.name, self.key, self.rate, self.burst = name, key, rate / 60, burst
+
+
+def per_client(rate: float = ADMISSION_CLIENT_RATE, burst: int = ADMISSION_CLIENT_BURST) -> RateLimit:
+    return RateLimit("client", client_key, rate, burst)
+
+
+def per_username(key=body_username, rate: float = ADMISSION_USERNAME_RATE, burst: int = ADMISSION_USERNAME_BURST) -> RateLimit:
+    return RateLimit("username", key, rate, burst)
+
+
+class Admission:
+    """
+    FastAPI dependency guarding an expensive route. Token buckets run first
+    and reject with 429; then the request needs a slot from the concurrency
+    limiter (if given), held until the handler returns, or gets a 503.
+    Both carry Retry-After.
+
+        @router.post("/admin/login", dependencies=[Depends(Admission("login", [per_client(), per_username()], auth_limiter))])
+    """
+
+    def __init__(self, scope: str, limits=(), limiter: ConcurrencyLimiter = None):
+        self.scope = scope
+        self.limits = list(limits)
+        self.limiter = limiter
+
+    async def __call__(self, request: Request):
+        if not ADMISSION_ENABLED:
+            yield
+            return
+
+        for limit in self.limits:
+            key = limit.key(request)
+            if asyncio.iscoroutine(key):
+                key = await key
+            if key is None:
+                continue
+            wait = await buckets.take(f"{self.scope}:{limit.name}:{key}", limit.rate, limit.burst)
+            if wait:
+                _reject(self.scope, limit.name, 429, "Too many requests", wait)
+
+        if self.limiter is None:
+            yield
+            return
+        async with self.limiter.slot(self.scope):
+            yield
+
+
+def _build_buckets():
+    if not ADMISSION_URL:
+        return LocalBuckets(ADMISSION_MAX_KEYS)
+    import redis.asyncio as redis  # ✅ Optional dependency, only needed for shared buckets
+    return SharedBuckets(redis.from_url(ADMISSION_URL, decode_responses=True))
+
+
+buckets = _build_buckets()
+
+# ✅ Shared by the CPU-heavy auth routes (bcrypt logins, QR rendering)
+auth_limiter = ConcurrencyLimiter(ADMISSION_MAX_CONCURRENT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT)
+
+
+def stats() -> dict:
+    return {"enabled": ADMISSION_ENABLED, "buckets": buckets.stats(), "auth": auth_limiter.stats()}
+
+
+registry.register(Gauge("admission_auth_requests", "Expensive auth requests holding or waiting for a slot.", ("state",),
+                        callback=lambda: {("active",): auth_limiter.active, ("waiting",): auth_limiter.waiting}))
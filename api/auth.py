@@ -1,4 +1,11 @@
 import os
+import math
+import time
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from jose import jwt  # Use `python-jose`
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
@@ -16,7 +23,24 @@ ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
 # Password Hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# BCRYPT_ROUNDS pins the cost; hashes made with any other cost report needs_update
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+_bcrypt_settings = {}
+if BCRYPT_ROUNDS:
+    _bcrypt_settings = {
+        "bcrypt__default_rounds": int(BCRYPT_ROUNDS),
+        "bcrypt__min_desired_rounds": int(BCRYPT_ROUNDS),
+        "bcrypt__max_desired_rounds": int(BCRYPT_ROUNDS),
+    }
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", **_bcrypt_settings)
+
+# ✅ bcrypt runs in a small dedicated thread pool (it releases the GIL), so a
+# burst of logins never blocks the event loop. The pool size caps concurrency.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+REHASH_ON_LOGIN = os.getenv("REHASH_ON_LOGIN", "false").lower() in ("1", "true", "yes")
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_stats = {"active": 0, "queued": 0, "completed": 0}
+_hash_stats_lock = threading.Lock()
 
 # OAuth2 Scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="admin/login")
@@ -29,6 +53,38 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def _tracked(func, *args):
+    with _hash_stats_lock:
+        _hash_stats["queued"] -= 1
+        _hash_stats["active"] += 1
+    try:
+        return func(*args)
+    finally:
+        with _hash_stats_lock:
+            _hash_stats["active"] -= 1
+            _hash_stats["completed"] += 1
+
+async def _run_hasher(func, *args):
+    with _hash_stats_lock:
+        _hash_stats["queued"] += 1
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, _tracked, func, *args)
+
+# Async variants for request handlers: hashing happens off the event loop
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hasher(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str):
+    """Returns (valid, new_hash); new_hash is set when the stored hash uses outdated settings."""
+    return await _run_hasher(pwd_context.verify_and_update, plain_password, hashed_password)
+
+def password_hasher_stats() -> dict:
+    """Current bcrypt pool usage; `queued` is the number of calls waiting for a worker."""
+    with _hash_stats_lock:
+        return {"workers": PASSWORD_HASH_WORKERS, **_hash_stats}
+
 # Function to Generate JWT Token
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -36,8 +92,9 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     # Convert 'sub' (subject) to a string
     to_encode["sub"] = str(to_encode["sub"])  
 
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire, "iat": now})
 
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
@@ -51,9 +108,95 @@ def decode_access_token(token: str):
     except JWTError:  # Corrected from InvalidTokenError to JWTError
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# ✅ Verified-token cache: a token's claims are kept (by digest) until its own
+# `exp`, so repeat requests skip the signature check. Revocation evicts
+# entries and blocks the token (or every older token of a subject) outright.
+# Revocation is per process: with several workers a logout or role change
+# only takes effect on the worker that handled it, and other workers keep
+# accepting the token until it expires (ACCESS_TOKEN_EXPIRE_MINUTES).
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "4096"))
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # digest -> claims
+        self._revoked = {}  # digest -> exp, kept until the token would expire anyway
+        self._revoked_before = {}  # sub -> tokens issued before this whole second are rejected
+        self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, digest: str):
+        claims = self._entries.get(digest)
+        if claims is None:
+            self.misses += 1
+            return None
+        if claims["exp"] <= time.time():
+            del self._entries[digest]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return claims
+
+    def put(self, digest: str, claims: dict):
+        if self.max_entries <= 0 or not isinstance(claims.get("exp"), (int, float)):
+            return
+        self._entries[digest] = claims
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def is_revoked(self, digest: str, claims: dict) -> bool:
+        if digest in self._revoked:
+            return True
+        revoked_before = self._revoked_before.get(claims.get("sub"))
+        # ✅ iat has whole seconds, so a token issued in the revoking second is still accepted
+        return revoked_before is not None and claims.get("iat", 0) < revoked_before
+
+    def revoke_token(self, token: str):
+        """Logout hook: evicts the token and rejects it until it expires."""
+        digest = self.digest(token)
+        claims = self._entries.pop(digest, None)
+        now = time.time()
+        self._revoked = {d: e for d, e in self._revoked.items() if e > now}
+        self._revoked[digest] = (claims or {}).get("exp") or now + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+    def revoke_subject(self, sub):
+        """Role/password change hook: evicts and rejects every token issued to `sub` so far."""
+        sub = str(sub)
+        self._revoked_before[sub] = math.floor(time.time())
+        for digest in [d for d, claims in self._entries.items() if claims.get("sub") == sub]:
+            del self._entries[digest]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "revoked_tokens": len(self._revoked),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+token_cache = VerifiedTokenCache(JWT_CACHE_MAX_ENTRIES)
+
 # Function to Get Current Admin from Token
-def get_current_admin(token: str = Depends(oauth2_scheme)):
-    payload = decode_access_token(token)
+# (async: with the cache this is a dict lookup, cheaper than a threadpool hop)
+async def get_current_admin(token: str = Depends(oauth2_scheme)):
+    digest = token_cache.digest(token)
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = decode_access_token(token)
+        token_cache.put(digest, payload)
+    if token_cache.is_revoked(digest, payload):
+        raise HTTPException(status_code=401, detail="Token revoked")
     admin_id: int = payload.get("sub")
     if admin_id is None:
         raise HTTPException(status_code=401, detail="Invalid authentication")
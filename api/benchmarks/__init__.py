@@ -0,0 +1,16 @@
+"""
+Benchmarks for the API, run from the api/ directory with `python -m benchmarks.<name>`.
+
+suite             HTTP hot paths at fixed concurrency, JSON output, baseline regression check
+bench_reorder     PUT /api/media reorder latency vs list size
+bench_login_burst /api/media latency during a login burst
+bench_jwt_cache   protected-route cost with and without the verified-JWT cache
+bench_search      /api/media/search latency on the in-process index
+bench_json        CPU per request with and without the fast JSON path
+bench_logging     caller-side cost of a log call, synchronous vs queued and filtered
+bench_startup     spawn-to-ready time of a fresh worker against a budget, lazy-import check
+bench_batch       POST /api/media/batch throughput against batch size
+bench_upload      chunked upload and download throughput, peak memory against file size
+bench_variants    thumbnail grid bytes and latency: originals vs rendered and cached variants
+bench_changefeed  change feed delivery latency to thousands of SSE subscribers vs a polling round
+"""
@@ -0,0 +1,70 @@
+"""
+Benchmark: POST /api/media/batch throughput against batch size.
+
+Pushes the same number of items through the batch endpoint at each batch
+size: creates, then updates of the created rows, then deletes of them.
+A batch size of 1 is the one-call-per-row flow the single-item crud
+functions imply.
+
+Run from the api/ directory (items and batch sizes are optional):
+    python -m benchmarks.bench_batch 2000 1 10 100 1000
+Uses a throwaway SQLite file unless DATABASE_URL is already set.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_batch.db"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+
+import auth
+import migrations
+from database import engine
+from main import app
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+SIZES = [int(size) for size in sys.argv[2:]] or [1, 10, 100, 1000]
+
+
+async def run(client, headers, operations, size: int):
+    """Sends `operations` in batches of `size`; returns (items/s, results)."""
+    results = []
+    started = time.perf_counter()
+    for start in range(0, len(operations), size):
+        response = await client.post("/api/media/batch", json={"operations": operations[start:start + size]}, headers=headers)
+        results += response.json()["results"]
+    return len(operations) / (time.perf_counter() - started), results
+
+
+async def main():
+    migrations.upgrade(engine)
+    async with app.router.lifespan_context(app):
+        headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 1})}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"{'batch':>5} | {'create/s':>9} | {'update/s':>9} | {'delete/s':>9} | failed")
+            for size in SIZES:
+                creates = [{"op": "create", "type": "video", "values": {
+                    "video_url": f"https://cdn.example.com/videos/{i}.mp4", "title": f"Video {i}", "category": f"c{i % 7}",
+                }} for i in range(ITEMS)]
+                create_rate, created = await run(client, headers, creates, size)
+                ids = [result["id"] for result in created if result["status"] == "created"]
+
+                updates = [{"op": "update", "type": "video", "id": i, "values": {"title": f"Renamed {i}"}} for i in ids]
+                update_rate, updated = await run(client, headers, updates, size)
+                deletes = [{"op": "delete", "type": "video", "id": i} for i in ids]
+                delete_rate, deleted = await run(client, headers, deletes, size)
+
+                failed = sum(result["status"] not in ("created", "updated", "deleted") for result in created + updated + deleted)
+                print(f"{size:>5} | {create_rate:>9.0f} | {update_rate:>9.0f} | {delete_rate:>9.0f} | {failed}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
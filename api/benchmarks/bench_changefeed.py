@@ -0,0 +1,109 @@
+"""
+Benchmark: change feed fan-out against open dashboards.
+
+Opens N /api/media/changes streams (driven as raw ASGI calls, since httpx's
+ASGITransport buffers whole responses), applies W single-item batch writes
+and reports how long each event took to reach every subscriber. For
+comparison it also times the /api/media reads N dashboards polling once
+each would cost per interval.
+
+Run from the api/ directory (subscribers and writes are optional):
+    python -m benchmarks.bench_changefeed 2000 20
+Uses a throwaway SQLite file unless DATABASE_URL is already set.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_changefeed.db"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+
+import auth
+import migrations
+from database import database, engine
+from models import videos
+from main import app
+
+SUBSCRIBERS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+WRITES = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+
+class Subscriber:
+    """One SSE stream; records when each change event (by seq) arrived."""
+
+    def __init__(self):
+        self.arrived, self.ready = {}, asyncio.Event()
+        self._gone = asyncio.Event()
+        scope = {
+            "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "root_path": "",
+            "path": "/api/media/changes", "raw_path": b"/api/media/changes", "query_string": b"",
+            "headers": [], "client": ("127.0.0.1", 0), "server": ("bench", 80),
+        }
+        self.task = asyncio.create_task(app(scope, self._receive, self._send))
+
+    async def _receive(self):
+        await self._gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message):
+        now = time.perf_counter()
+        for frame in message.get("body", b"").split(b"\n\n"):
+            if b"event: ready" in frame:
+                self.ready.set()
+            elif frame.startswith(b"id: ") and b"event: change" in frame:
+                self.arrived[int(frame[4:frame.index(b"\n")])] = now
+
+    async def close(self):
+        self._gone.set()
+        await self.task
+
+
+async def main():
+    migrations.upgrade(engine)
+    async with app.router.lifespan_context(app):
+        await database.execute(videos.delete())
+        await database.execute_many(videos.insert(), [
+            {"file_name": f"v{i}.mp4", "video_url": f"/v/{i}", "title": f"Video {i}"} for i in range(50)
+        ])
+        video_id = await database.fetch_val(videos.select().with_only_columns(videos.c.id).limit(1))
+        headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 1})}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            subscribers = [Subscriber() for _ in range(SUBSCRIBERS)]
+            await asyncio.gather(*[subscriber.ready.wait() for subscriber in subscribers])
+
+            latencies, spreads = [], []
+            for i in range(WRITES):
+                started = time.perf_counter()
+                response = await client.post("/api/media/batch", json={"operations": [
+                    {"op": "update", "type": "video", "id": video_id, "values": {"title": f"Renamed {i}"}},
+                ]}, headers=headers)
+                response.raise_for_status()
+                while not all(len(subscriber.arrived) > i for subscriber in subscribers):
+                    await asyncio.sleep(0.001)
+                seq = max(subscribers[0].arrived)
+                arrivals = [subscriber.arrived[seq] - started for subscriber in subscribers]
+                latencies.append(max(arrivals) * 1000)
+                spreads.append((max(arrivals) - min(arrivals)) * 1000)
+            await asyncio.gather(*[subscriber.close() for subscriber in subscribers])
+
+            started = time.perf_counter()
+            await asyncio.gather(*[client.get("/api/media", params={"limit": 6}) for _ in range(SUBSCRIBERS)])
+            polling_s = time.perf_counter() - started
+
+    print(f"{SUBSCRIBERS} subscribers, {WRITES} writes")
+    print(f"write -> last subscriber  p50 {statistics.median(latencies):7.1f} ms | max {max(latencies):7.1f} ms")
+    print(f"first -> last subscriber  p50 {statistics.median(spreads):7.1f} ms")
+    print(f"one polling round ({SUBSCRIBERS} concurrent /api/media reads) takes {polling_s * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
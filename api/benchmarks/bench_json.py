@@ -0,0 +1,78 @@
+"""
+Benchmark: per-request CPU time of GET /api/media with and without the fast JSON path.
+
+The default path re-validates rows through MediaResponse before encoding; the
+fast path (FAST_JSON_RESPONSES) maps rows straight to the output and encodes
+them with orjson. Pages come from the warm media cache, so the difference is
+serialization. Both paths must return byte-identical bodies.
+
+Run from the api/ directory (request count is optional):
+    python -m benchmarks.bench_json 2000
+Uses a throwaway SQLite file unless DATABASE_URL is already set.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_json.db"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+
+from database import database, engine
+from models import videos, images
+import routes.media
+import migrations
+from main import app
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+PAGE = {"limit": 20}
+
+
+async def seed():
+    await database.execute(videos.delete())
+    await database.execute(images.delete())
+    await database.execute_many(videos.insert(), [{
+        "id": i, "file_name": f"v{i}.mp4", "video_url": f"https://cdn.example.com/videos/{i}.mp4",
+        "title": f"Video number {i}", "uploaded_by": None, "order_position": i,
+    } for i in range(1, 101)])
+    await database.execute_many(images.insert(), [{
+        "id": i, "file_name": f"i{i}.png", "image_url": f"https://cdn.example.com/images/{i}.png",
+        "alt_text": f"Image number {i}", "uploaded_by": None, "order_position": i,
+    } for i in range(1, 101)])
+
+
+async def cpu_per_request(client, fast: bool):
+    """Average process CPU µs per request, plus the last body for comparison."""
+    routes.media.FAST_JSON_RESPONSES = fast
+    body = (await client.get("/api/media", params=PAGE)).content  # warm-up (fills the page cache)
+    started = time.process_time()
+    for _ in range(REQUESTS):
+        await client.get("/api/media", params=PAGE)
+    return (time.process_time() - started) / REQUESTS * 1e6, body
+
+
+async def main():
+    migrations.upgrade(engine)
+    async with app.router.lifespan_context(app):
+        await seed()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = {}
+            for label, fast in (("validated", False), ("fast", True)):
+                results[label] = await cpu_per_request(client, fast)
+
+    (slow_us, slow_body), (fast_us, fast_body) = results["validated"], results["fast"]
+    print(f"{'path':<10} | {'CPU µs/req':>10}")
+    print(f"{'validated':<10} | {slow_us:>10.1f}")
+    print(f"{'fast':<10} | {fast_us:>10.1f}")
+    print(f"saving: {(1 - fast_us / slow_us) * 100:.0f}%  identical bodies: {slow_body == fast_body}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
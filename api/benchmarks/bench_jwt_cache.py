@@ -0,0 +1,63 @@
+"""
+Micro-benchmark: GET /api/admin/protected with and without the verified-JWT cache.
+
+Run from the api/ directory:
+    python -m benchmarks.bench_jwt_cache [requests]
+Uses a throwaway SQLite file unless DATABASE_URL is already set.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_jwt.db"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+
+import auth
+from main import app
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+
+def time_dependency(token: str, rounds: int) -> float:
+    """Average µs per get_current_admin call, outside of HTTP."""
+    loop = asyncio.new_event_loop()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        loop.run_until_complete(auth.get_current_admin(token))
+    loop.close()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+async def time_route(client, token: str) -> float:
+    """Average µs per protected request through the ASGI stack."""
+    headers = {"Authorization": f"Bearer {token}"}
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        await client.get("/api/admin/protected", headers=headers)
+    return (time.perf_counter() - started) / REQUESTS * 1e6
+
+
+async def main():
+    token = auth.create_access_token({"sub": 1})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {}
+        for label, max_entries in (("no cache", 0), ("cache", auth.JWT_CACHE_MAX_ENTRIES or 4096)):
+            auth.token_cache = auth.VerifiedTokenCache(max_entries)
+            await time_route(client, token)  # warm-up
+            results[label] = (await time_route(client, token), await asyncio.to_thread(time_dependency, token, REQUESTS))
+        print(f"{'':<9} | {'route (µs/req)':>14} | {'dependency (µs/call)':>20}")
+        for label, (route_us, dep_us) in results.items():
+            print(f"{label:<9} | {route_us:>14.1f} | {dep_us:>20.2f}")
+        print("cache stats:", auth.token_cache.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
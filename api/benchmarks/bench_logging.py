@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: caller-side cost of a log call, i.e. what the event loop pays.
+
+Compares the previous synchronous StreamHandler (format + write in the
+caller) with the queued pipeline from logging_setup, writing to a slow
+sink (0.1 ms per write, like a busy terminal or pipe), plus the cost of
+calls that are filtered out by level, sampling or rate limiting.
+
+Run from the api/ directory (call count is optional):
+    python -m benchmarks.bench_logging 50000
+Log output goes to a temporary file.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+os.environ["LOG_LEVELS"] = "bench.sampled=INFO,bench.limited=INFO"
+os.environ["LOG_SAMPLE_RATES"] = "bench.sampled=0.01"
+os.environ["LOG_RATE_LIMITS"] = "bench.limited=100"
+
+import logging_setup
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+SINK_WRITE_DELAY = 0.0001
+ROW = {"id": 1, "username": "bench", "email": "bench@example.com", "mfa_enabled": True, "role": "editor"}
+
+
+class SlowSink:
+    """File wrapper whose writes take SINK_WRITE_DELAY seconds."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data):
+        time.sleep(SINK_WRITE_DELAY)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+
+def per_call_us(logger, level: int) -> float:
+    started = time.perf_counter()
+    for i in range(CALLS):
+        logger.log(level, "user %s row %r attempt %d", "bench", ROW, i)
+    return (time.perf_counter() - started) / CALLS * 1e6
+
+
+def main():
+    sink = SlowSink(open(os.path.join(tempfile.mkdtemp(), "bench.log"), "w"))
+    root = logging.getLogger()
+
+    # ✅ Previous setup: logging.basicConfig stream handler, formatting and writing in the caller
+    sync_handler = logging.StreamHandler(sink)
+    sync_handler.setFormatter(logging.Formatter(logging_setup.LOG_FORMAT))
+    root.handlers = [sync_handler]
+    root.setLevel(logging.INFO)
+    results = {"sync handler, INFO": per_call_us(logging.getLogger("bench.plain"), logging.INFO)}
+
+    sys.stderr = sink  # ✅ The queued writer's StreamHandler targets stderr
+    logging_setup.configure_logging()
+    results["queued, INFO"] = per_call_us(logging.getLogger("bench.plain"), logging.INFO)
+    results["queued, DEBUG below level"] = per_call_us(logging.getLogger("bench.plain"), logging.DEBUG)
+    results["queued, sampled at 1%"] = per_call_us(logging.getLogger("bench.sampled"), logging.INFO)
+    results["queued, rate limited 100/s"] = per_call_us(logging.getLogger("bench.limited"), logging.INFO)
+    logging_setup.stop_logging()
+    sys.stderr = sys.__stderr__
+
+    print(f"{'path':<28} | {'µs/call':>8}")
+    for label, us in results.items():
+        print(f"{label:<28} | {us:>8.2f}")
+    print("dropped:", {labels[0]: n for labels, n in logging_setup.log_records_dropped._values.items()})
+
+
+if __name__ == "__main__":
+    main()
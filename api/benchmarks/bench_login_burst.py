@@ -0,0 +1,103 @@
+"""
+Load test: GET /api/media latency during a burst of /api/admin/login calls.
+
+Measures media latency on an idle server, then during a login burst with
+bcrypt offloaded to the hasher pool, then during the same burst with
+admission control shedding it (current code), then with bcrypt verified
+inline on the event loop (original behaviour).
+
+Run from the api/ directory:
+    python -m benchmarks.bench_login_burst [logins]
+Uses a throwaway SQLite file unless DATABASE_URL is already set.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_login.db"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("ADMISSION_ENABLED", "false")  # ✅ Switched on for its own scenario below
+
+import httpx
+
+from database import database, engine
+from models import admin_users, videos
+import admission
+import auth
+import routes.admin
+import migrations
+from main import app
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+MEDIA_REQUESTS = 200
+
+
+async def seed():
+    await database.execute(admin_users.delete())
+    await database.execute(admin_users.insert().values(
+        username="bench", email="bench@example.com", password_hash=auth.hash_password("bench-password"),
+    ))
+    await database.execute(videos.delete())
+    await database.execute_many(videos.insert(), [
+        {"file_name": f"v{i}.mp4", "video_url": f"/v/{i}", "title": f"Video {i}"} for i in range(50)
+    ])
+
+
+async def media_latencies(client):
+    samples = []
+    for _ in range(MEDIA_REQUESTS):
+        started = time.perf_counter()
+        await client.get("/api/media", params={"limit": 6})
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def login_burst(client):
+    body = {"username": "bench", "password": "bench-password"}
+    await asyncio.gather(*[client.post("/api/admin/login", json=body) for _ in range(LOGINS)])
+
+
+async def measure(client, with_burst: bool):
+    if not with_burst:
+        return await media_latencies(client)
+    burst = asyncio.create_task(login_burst(client))
+    await asyncio.sleep(0)  # ✅ Let the burst start first
+    samples = await media_latencies(client)
+    await burst
+    return samples
+
+
+def summary(name, samples):
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<28} | p50 {statistics.median(ordered):7.2f} ms | p95 {p95:7.2f} ms | max {ordered[-1]:7.2f} ms")
+
+
+async def main():
+    migrations.upgrade(engine)
+    async with app.router.lifespan_context(app):
+        await seed()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            summary("idle", await measure(client, False))
+            summary(f"{LOGINS} logins, offloaded", await measure(client, True))
+
+            admission.ADMISSION_ENABLED = True
+            summary(f"{LOGINS} logins, admission control", await measure(client, True))
+            admission.ADMISSION_ENABLED = False
+            print("shed:", {f"{scope}/{reason}": n for (scope, reason), n in admission.admission_rejected._values.items()})
+
+            async def inline_verify(plain, hashed):
+                return auth.verify_password(plain, hashed)
+            routes.admin.verify_password_async = inline_verify
+            summary(f"{LOGINS} logins, inline", await measure(client, True))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Benchmark: PUT /api/media reorder latency vs list size.
+
+Compares the old one-UPDATE-per-item loop with crud.update_media_order
+(one CASE-based UPDATE per table in a single transaction).
+
+Run from the api/ directory (list sizes are optional):
+    python -m benchmarks.bench_reorder 10 100 500
+Uses a throwaway SQLite file unless DATABASE_URL is already set.
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_reorder.db"
+
+from database import database, engine
+from models import videos, images
+import migrations
+from schemas import MediaOrderItem
+import crud
+
+SIZES = [int(size) for size in sys.argv[1:]] or [10, 100, 500]
+ROUNDS = 3
+
+
+async def seed(count: int):
+    await database.execute(videos.delete())
+    await database.execute(images.delete())
+    await database.execute_many(videos.insert(), [
+        {"id": i, "file_name": f"v{i}.mp4", "video_url": f"/v/{i}", "order_position": i} for i in range(1, count + 1)
+    ])
+    await database.execute_many(images.insert(), [
+        {"id": i, "file_name": f"i{i}.png", "image_url": f"/i/{i}", "order_position": i} for i in range(1, count + 1)
+    ])
+
+
+async def per_item_loop(items):
+    """The previous implementation: one UPDATE per item, no transaction."""
+    for item in items:
+        table = videos if item.type == "video" else images
+        await database.execute(table.update().where(table.c.id == item.id).values(order_position=item.position))
+
+
+async def timed(func, items) -> float:
+    samples = []
+    for _ in range(ROUNDS):
+        random.shuffle(items)
+        started = time.perf_counter()
+        await func(items)
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+async def main():
+    migrations.upgrade(engine)
+    await database.connect()
+    print(f"{'items':>6} | {'per-item loop (ms)':>18} | {'batched CASE (ms)':>17} | speedup")
+    for size in SIZES:
+        await seed((size + 1) // 2)
+        items = [
+            MediaOrderItem(id=i // 2 + 1, type="video" if i % 2 else "image", position=i)
+            for i in range(size)
+        ]
+        loop_ms = await timed(per_item_loop, items)
+        batch_ms = await timed(crud.update_media_order, items)
+        print(f"{size:>6} | {loop_ms:>18.2f} | {batch_ms:>17.2f} | {loop_ms / batch_ms:>6.1f}x")
+    await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
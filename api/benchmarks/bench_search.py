@@ -0,0 +1,84 @@
+"""
+Benchmark: /api/media/search latency on the in-process index.
+
+Seeds videos and images with random text, builds the index the way startup
+does, then times full searches (ranking + page row fetch): cold, and repeated
+(served from the ranked-result cache, as when paging with next_cursor).
+
+Run from the api/ directory (row count is optional):
+    python -m benchmarks.bench_search 1000000
+Uses a throwaway SQLite file unless DATABASE_URL is already set.
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_search.db"
+os.environ["SEARCH_BACKEND"] = "memory"
+
+from database import database, engine
+from models import videos, images
+import migrations
+from search import media_search
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+SEARCHES = 200
+WORDS = [f"word{i}" for i in range(20_000)]
+CATEGORIES = ["music", "sport", "travel", "news", "comedy", "gaming"]
+SEED_BATCH = 10_000
+
+
+def phrase(rng: random.Random, length: int) -> str:
+    # ✅ Zipf-like vocabulary: a few very common words, a long tail of rare ones
+    return " ".join(WORDS[int(rng.paretovariate(1.1)) % len(WORDS)] for _ in range(length))
+
+
+async def seed(rng: random.Random):
+    await database.execute(videos.delete())
+    await database.execute(images.delete())
+    for start in range(0, ROWS, SEED_BATCH):
+        ids = range(start + 1, min(start + SEED_BATCH, ROWS) + 1)
+        await database.execute_many(videos.insert(), [{
+            "id": i, "file_name": f"v{i}.mp4", "video_url": f"/v/{i}", "title": phrase(rng, 5),
+            "description": phrase(rng, 30), "category": rng.choice(CATEGORIES),
+        } for i in ids])
+        await database.execute_many(images.insert(), [
+            {"id": i, "file_name": f"i{i}.png", "image_url": f"/i/{i}", "alt_text": phrase(rng, 6)} for i in ids[::10]
+        ])
+
+
+def percentile(samples, fraction: float) -> float:
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+
+async def main():
+    rng = random.Random(42)
+    migrations.upgrade(engine)
+    await database.connect()
+    await seed(rng)
+
+    started = time.perf_counter()
+    await media_search.index.build()
+    print(f"indexed {media_search.stats()['documents']} documents in {time.perf_counter() - started:.1f}s")
+
+    queries = list(dict.fromkeys(phrase(rng, rng.randint(1, 3)) for _ in range(SEARCHES)))
+    cold, warm = [], []
+    for samples in (cold, warm):
+        for q in queries:
+            started = time.perf_counter()
+            await media_search.search(q, 10)
+            samples.append(time.perf_counter() - started)
+
+    print(f"{len(queries)} distinct queries")
+    print(f"{'':<8} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'max (ms)':>9}")
+    for label, samples in (("cold", cold), ("repeat", warm)):
+        print(f"{label:<8} | {percentile(samples, 0.5):>9.2f} | {percentile(samples, 0.95):>9.2f} | {max(samples) * 1000:>9.2f}")
+    await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
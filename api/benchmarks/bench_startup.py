@@ -0,0 +1,101 @@
+"""
+Start-up budget check: how long a fresh worker process takes to become ready.
+
+Each run spawns a new interpreter that imports main and runs the app's
+start-up hooks, and reports interpreter start, `import main` and start-up
+hook time separately. The median spawn-to-ready time must stay within
+--budget seconds, and the modules in LAZY_MODULES must not be imported by
+start-up at all; otherwise the check exits with status 1.
+
+Run from the api/ directory:
+    python -m benchmarks.bench_startup --runs 5 --budget 1.0
+Migrates a throwaway SQLite file first unless DATABASE_URL is already set.
+tests/test_startup.py runs the same check under pytest.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_startup.db"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+# ✅ Modules start-up must not import: MFA/QR-only dependencies, and the ORM the app does not use
+LAZY_MODULES = ("pyotp", "qrcode", "PIL", "sqlalchemy.orm")
+
+# Runs in the child; LAZY_MODULES is prepended to it
+CHILD = """
+import time
+started = time.time()
+import asyncio, json, sys
+from main import app
+imported = time.time()
+
+async def ready():
+    async with app.router.lifespan_context(app):
+        return time.time(), [name for name in LAZY_MODULES if name in sys.modules]
+
+ready_at, loaded = asyncio.run(ready())
+print(json.dumps({"started": started, "imported": imported, "ready": ready_at, "loaded": loaded}))
+"""
+
+
+def run_once() -> dict:
+    script = f"LAZY_MODULES = {LAZY_MODULES!r}\n{CHILD}"
+    spawned = time.time()
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    child = json.loads(output.strip().splitlines()[-1])
+    return {
+        "interpreter_s": child["started"] - spawned,
+        "import_main_s": child["imported"] - child["started"],
+        "startup_hooks_s": child["ready"] - child["imported"],
+        "ready_s": child["ready"] - spawned,
+        "loaded": child["loaded"],
+    }
+
+
+def check(runs: int, budget: float):
+    """Migrates, spawns `runs` workers; returns (per-run timings, median ready seconds, failures)."""
+    import migrations
+    from database import engine
+    migrations.upgrade(engine)
+
+    results = [run_once() for _ in range(runs)]
+    failures = []
+    ready = statistics.median(run["ready_s"] for run in results)
+    if ready > budget:
+        failures.append(f"median ready time {ready:.3f}s exceeds the {budget:.3f}s budget")
+    loaded = sorted({name for run in results for name in run["loaded"]})
+    if loaded:
+        failures.append(f"imported during start-up: {', '.join(loaded)}")
+    return results, ready, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="allowed median spawn-to-ready seconds")
+    args = parser.parse_args()
+
+    runs, ready, failures = check(args.runs, args.budget)
+    print(f"{'phase':<16} | {'median ms':>9} | {'max ms':>9}")
+    for phase in ("interpreter_s", "import_main_s", "startup_hooks_s", "ready_s"):
+        values = [run[phase] for run in runs]
+        print(f"{phase[:-2]:<16} | {statistics.median(values) * 1000:>9.1f} | {max(values) * 1000:>9.1f}")
+
+    for line in failures:
+        print(line)
+    if failures:
+        sys.exit(1)
+    print(f"ready in {ready:.3f}s, within the {args.budget:.3f}s budget")
+
+
+if __name__ == "__main__":
+    main()
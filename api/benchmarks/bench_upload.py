@@ -0,0 +1,91 @@
+"""
+Benchmark: chunked upload throughput and memory.
+
+Uploads one file of the given size through /api/uploads in chunks
+(streamed to the app in 64 KiB pieces, as a socket would deliver them),
+completes it and reads it back, then reports MiB/s and how far the
+process's peak RSS grew during the upload, which should stay a small
+multiple of the chunk size however large the file is. (Download memory
+is not reported: httpx's ASGITransport buffers whole responses.)
+
+Run from the api/ directory (megabytes and chunk size in MiB are optional):
+    python -m benchmarks.bench_upload 1024 8
+Uses a throwaway SQLite file and storage directory unless DATABASE_URL / STORAGE_DIR are set.
+"""
+import asyncio
+import hashlib
+import os
+import resource
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_upload.db"
+os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp())
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+
+import auth
+import migrations
+from database import engine
+from main import app
+
+MEGABYTES = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+CHUNK_SIZE = int(sys.argv[2]) * 1024 * 1024 if len(sys.argv) > 2 else 8 * 1024 * 1024
+PIECE = 64 * 1024
+BLOCK = os.urandom(1024 * 1024)
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def chunk_bytes(offset: int, length: int) -> bytes:
+    """Deterministic file content without holding the file in memory."""
+    return (BLOCK * (length // len(BLOCK) + 2))[offset % len(BLOCK):offset % len(BLOCK) + length]
+
+
+async def pieces(data: bytes):
+    for start in range(0, len(data), PIECE):
+        yield data[start:start + PIECE]
+
+
+async def main():
+    migrations.upgrade(engine)
+    size = MEGABYTES * 1024 * 1024
+    async with app.router.lifespan_context(app):
+        headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 1})}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            baseline = peak_rss_mb()
+            started = time.perf_counter()
+            upload = (await client.post("/api/uploads", json={
+                "type": "video", "file_name": "bench.mp4", "size": size, "chunk_size": CHUNK_SIZE, "title": "Bench",
+            }, headers=headers)).json()
+            for index in range(upload["chunks"]):
+                data = chunk_bytes(index * CHUNK_SIZE, min(CHUNK_SIZE, size - index * CHUNK_SIZE))
+                response = await client.put(f"/api/uploads/{upload['id']}/chunks/{index}", content=pieces(data),
+                                            headers={**headers, "X-Chunk-SHA256": hashlib.sha256(data).hexdigest()})
+                response.raise_for_status()
+            completed = (await client.post(f"/api/uploads/{upload['id']}/complete", headers=headers)).json()
+            upload_s = time.perf_counter() - started
+            upload_rss = peak_rss_mb() - baseline
+
+            started, read = time.perf_counter(), 0
+            async with client.stream("GET", completed["url"]) as response:
+                async for block in response.aiter_bytes():
+                    read += len(block)
+            download_s = time.perf_counter() - started
+
+    print(f"file {MEGABYTES} MiB in {upload['chunks']} chunks of {CHUNK_SIZE // (1024 * 1024)} MiB -> media id {completed['media_id']}")
+    print(f"upload   {MEGABYTES / upload_s:8.1f} MiB/s")
+    print(f"download {read / 1024 / 1024 / download_s:8.1f} MiB/s")
+    print(f"peak RSS grew by {upload_rss:.1f} MiB during the upload (started at {baseline:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
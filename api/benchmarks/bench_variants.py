@@ -0,0 +1,105 @@
+"""
+Benchmark: image variants for a thumbnail grid.
+
+Stores N large JPEGs in local storage, then fetches a grid page's worth
+of thumbnails three ways: the originals (what the dashboard downloaded
+before), the thumb variants cold (rendered in the process pool) and the
+thumb variants warm (served from the variant cache). Reports bytes per
+grid and latency; media listing latency is measured during the cold
+renders to show they stay off the event loop.
+
+Run from the api/ directory (images and source width are optional):
+    python -m benchmarks.bench_variants 24 3000
+Uses a throwaway SQLite file and storage directory unless DATABASE_URL / STORAGE_DIR are set.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_variants.db"
+os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp())
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+
+import migrations
+from database import database, engine
+from models import images
+from storage import storage
+from main import app
+
+IMAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+WIDTH = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+
+
+def make_sources():
+    from PIL import Image, ImageDraw  # ✅ Only the benchmark draws; the API process never imports PIL
+
+    os.makedirs(storage.file_path("images", ""), exist_ok=True)
+    names = []
+    for i in range(IMAGES):
+        image = Image.radial_gradient("L").resize((WIDTH, WIDTH * 2 // 3)).convert("RGB")
+        ImageDraw.Draw(image).text((WIDTH // 3, WIDTH // 3), f"image {i}", fill=(255, 200, 0))
+        name = f"{i:032x}.jpg"
+        image.save(storage.file_path("images", name), quality=90)
+        names.append(name)
+    return names
+
+
+async def fetch_all(client, urls):
+    """Fetches `urls` concurrently; returns (bytes, seconds, per-request ms)."""
+    async def one(url):
+        started = time.perf_counter()
+        response = await client.get(url)
+        response.raise_for_status()
+        return len(response.content), (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    results = await asyncio.gather(*[one(url) for url in urls])
+    return sum(size for size, _ in results), time.perf_counter() - started, [ms for _, ms in results]
+
+
+async def listing_latencies(client, stop):
+    samples = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/api/media", params={"limit": 6})
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def main():
+    migrations.upgrade(engine)
+    names = make_sources()
+    async with app.router.lifespan_context(app):
+        await database.execute(images.delete())
+        await database.execute_many(images.insert(), [
+            {"file_name": name, "image_url": storage.url("image", name), "alt_text": f"Image {i}"} for i, name in enumerate(names)
+        ])
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            rows = (await client.get("/api/media", params={"limit": 20})).json()["images"]
+            rows += (await client.get("/api/media", params={"limit": 20, "page": 2})).json()["images"]
+            originals = [storage.url("image", name) for name in names]
+            thumbs = [f"/api/media/images/{i}/variants/thumb.webp" for i in range(1, IMAGES + 1)]
+            print(f"{IMAGES} sources of {WIDTH}px; listing rows carry variants: {bool(rows and rows[0]['variants'])}")
+
+            print(f"{'grid':<12} | {'bytes':>11} | {'wall s':>7} | {'p50 ms':>8} | {'max ms':>8}")
+            for label, urls in (("originals", originals), ("thumbs cold", thumbs), ("thumbs warm", thumbs)):
+                stop = asyncio.Event()
+                listing = asyncio.create_task(listing_latencies(client, stop)) if label == "thumbs cold" else None
+                size, wall, samples = await fetch_all(client, urls)
+                print(f"{label:<12} | {size:>11,} | {wall:>7.2f} | {statistics.median(samples):>8.1f} | {max(samples):>8.1f}")
+                if listing is not None:
+                    stop.set()
+                    during = sorted(await listing)
+                    print(f"  /api/media during cold renders: p50 {statistics.median(during):.1f} ms, max {during[-1]:.1f} ms over {len(during)} requests")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
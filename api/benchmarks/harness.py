@@ -0,0 +1,93 @@
+"""
+Shared pieces of the HTTP benchmark suite: seeding and the fixed-concurrency load runner.
+"""
+import asyncio
+import random
+import time
+
+from database import database
+from models import admin_users, videos, images
+from cache import media_cache
+import auth
+import facets
+
+BENCH_PASSWORD = "bench-password"
+BENCH_MFA_SECRET = "JBSWY3DPEHPK3PXP"  # ✅ Fixed so runs are reproducible
+CATEGORIES = ["music", "sport", "travel", "news", "comedy", "gaming"]
+SEED_BATCH = 5000
+
+
+async def seed(rows: int, seed_value: int = 42):
+    """
+    Replaces the admin users and media with a deterministic data set:
+    `bench` (password only), `bench-mfa` (MFA enabled) and `rows` videos and images.
+    """
+    rng = random.Random(seed_value)
+    for table in (videos, images, admin_users):
+        await database.execute(table.delete())
+
+    password_hash = auth.hash_password(BENCH_PASSWORD)
+    await database.execute_many(admin_users.insert(), [
+        {"id": 1, "username": "bench", "email": "bench@example.com", "password_hash": password_hash},
+        {"id": 2, "username": "bench-mfa", "email": "bench-mfa@example.com", "password_hash": password_hash,
+         "mfa_secret": BENCH_MFA_SECRET, "mfa_enabled": True},
+    ])
+
+    for start in range(0, rows, SEED_BATCH):
+        ids = range(start + 1, min(start + SEED_BATCH, rows) + 1)
+        await database.execute_many(videos.insert(), [{
+            "id": i, "file_name": f"v{i}.mp4", "video_url": f"https://cdn.example.com/videos/{i}.mp4",
+            "title": f"Video {i}", "description": f"Description of video {i}", "category": rng.choice(CATEGORIES),
+            "uploaded_by": rng.choice((1, 2)), "order_position": rng.randrange(rows),
+        } for i in ids])
+        await database.execute_many(images.insert(), [{
+            "id": i, "file_name": f"i{i}.png", "image_url": f"https://cdn.example.com/images/{i}.png",
+            "alt_text": f"Image {i}", "category": rng.choice(CATEGORIES),
+            "uploaded_by": rng.choice((1, 2)), "order_position": rng.randrange(rows),
+        } for i in ids])
+
+    # ✅ Rows were written behind crud's back: rebuild derived state
+    await facets.rebuild()
+    await media_cache.invalidate("videos", "images")
+
+
+def percentile(sorted_samples, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+async def run_level(send, concurrency: int, requests: int) -> dict:
+    """
+    Runs `requests` calls of `send(i) -> httpx.Response` with exactly
+    `concurrency` of them in flight, and summarises latency and throughput.
+    """
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await send(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
@@ -0,0 +1,160 @@
+"""
+HTTP benchmark suite for the API hot paths.
+
+Runs the FastAPI app in-process behind an httpx ASGI client, seeds a
+deterministic data set, then drives each scenario at fixed concurrency
+levels and reports throughput and p50/p95/p99 latency.
+
+Run from the api/ directory:
+    python -m benchmarks.suite --rows 10000 --concurrency 1 8 32 --output bench.json
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --tolerance 0.2
+
+With --baseline the run exits with status 1 if any scenario/concurrency
+pair lost more than `tolerance` of its throughput or grew its p95 by more
+than that. Baselines are machine-specific: record them on the machine that
+checks them.
+
+Uses a throwaway SQLite file unless DATABASE_URL is already set (point it
+at a local MySQL to benchmark against the real backend; it is reseeded).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_suite.db"
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("ADMISSION_ENABLED", "false")  # ✅ Rate limits would turn the auth scenarios into 429s
+
+import httpx
+import pyotp
+
+import auth
+from database import database, engine
+import migrations
+from main import app
+from benchmarks.harness import seed, run_level, BENCH_PASSWORD, BENCH_MFA_SECRET
+
+MEDIA_PAGES = 20  # ✅ Listing requests rotate over this many pages
+
+
+def scenarios(client, token: str):
+    """Scenario name -> `send(i)` coroutine function."""
+    totp = pyotp.TOTP(BENCH_MFA_SECRET)
+    auth_headers = {"Authorization": f"Bearer {token}"}
+
+    async def media(i):
+        return await client.get("/api/media", params={"page": i % MEDIA_PAGES + 1, "limit": 6})
+
+    async def login(i):
+        return await client.post("/api/admin/login", json={"username": "bench", "password": BENCH_PASSWORD})
+
+    async def mfa_verify(i):
+        return await client.post("/api/mfa/verify", json={"username": "bench-mfa", "token": totp.now()})
+
+    async def protected(i):
+        return await client.get("/api/admin/protected", headers=auth_headers)
+
+    return {"media": media, "login": login, "mfa_verify": mfa_verify, "protected": protected}
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Returns human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for name, levels in baseline.get("results", {}).items():
+        for level, base in levels.items():
+            current = results.get(name, {}).get(level)
+            if current is None:
+                continue
+            if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{name} @ c={level}: throughput {current['throughput_rps']} < {base['throughput_rps']} rps")
+            if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{name} @ c={level}: p95 {current['p95_ms']} > {base['p95_ms']} ms")
+    return regressions
+
+
+def print_table(results: dict):
+    print(f"{'scenario':<11} | {'c':>3} | {'rps':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'errors':>6}")
+    for name, levels in results.items():
+        for level, stats in levels.items():
+            print(
+                f"{name:<11} | {level:>3} | {stats['throughput_rps']:>8.1f} | {stats['p50_ms']:>8.2f} | "
+                f"{stats['p95_ms']:>8.2f} | {stats['p99_ms']:>8.2f} | {stats['errors']:>6}"
+            )
+
+
+async def run(args) -> dict:
+    results = {}
+    migrations.upgrade(engine)
+    async with app.router.lifespan_context(app):
+        await seed(args.rows, args.seed)
+        token = auth.create_access_token({"sub": 1})
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            available = scenarios(client, token)
+            for name in args.scenarios:
+                send = available[name]
+                await run_level(send, 1, min(args.requests, 10))  # ✅ Warm-up: fills caches and opens pooled connections
+                results[name] = {}
+                for concurrency in args.concurrency:
+                    results[name][str(concurrency)] = await run_level(send, concurrency, args.requests)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000, help="videos and images to seed (each)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--scenarios", nargs="+", default=["media", "login", "mfa_verify", "protected"],
+                        choices=["media", "login", "mfa_verify", "protected"])
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--baseline", help="fail if results regress past this results JSON")
+    parser.add_argument("--save-baseline", help="write the results JSON here as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # ✅ Request logging would dominate the measurements
+    results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database.url.dialect,
+            "rows": args.rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+
+    print_table(results)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ✅ Media page cache settings
+MEDIA_CACHE_MAX_ENTRIES = int(os.getenv("MEDIA_CACHE_MAX_ENTRIES", "1024"))
+MEDIA_CACHE_TTL = float(os.getenv("MEDIA_CACHE_TTL", "30"))
+MEDIA_CACHE_URL = os.getenv("MEDIA_CACHE_URL")  # e.g. redis://localhost:6379/0 or memory://
+
+
+class LRUCache:
+    """Size- and TTL-bounded in-process LRU with hit/miss/eviction counters."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class LocalBackend:
+    """
+    In-process backend: an LRU plus per-table generation counters. Writes
+    made through other workers never bump this process's counters, so a
+    generation also rolls over every `ttl` seconds: pages and ETags built on
+    it are trusted for one TTL at most, never indefinitely.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.lru = LRUCache(max_entries, ttl)
+        self._generations = {}
+        # ✅ Counters restart at 0 with the process, so versions carry a per-process epoch
+        self.epoch = secrets.token_hex(4)
+
+    async def generation(self, table: str) -> str:
+        window = int(time.time() // max(self.lru.ttl, 1))
+        return f"{self._generations.get(table, 0)}.{window}"
+
+    async def version(self, table: str) -> str:
+        return f"{self.epoch}.{await self.generation(table)}"
+
+    async def bump(self, table: str):
+        self._generations[table] = self._generations.get(table, 0) + 1
+
+    async def get(self, key):
+        return self.lru.get(key)
+
+    async def set(self, key, value):
+        self.lru.set(key, value)
+
+    def stats(self):
+        return {"backend": "local", **self.lru.stats()}
+
+
+class SharedBackend:
+    """
+    Backend shared by every worker, on top of a Redis-style client
+    (async get / set(ex=, nx=) / incr). Generations live in the shared store
+    so a write on one worker invalidates pages cached by all of them.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = "media-cache"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = self.misses = 0
+
+    async def generation(self, table: str) -> int:
+        value = await self.client.get(f"{self.prefix}:gen:{table}")
+        return int(value or 0)
+
+    async def version(self, table: str) -> str:
+        # ✅ Generations restart at 0 if the store is flushed; a new random epoch
+        # stored beside them keeps ETags issued before that from matching again
+        key = f"{self.prefix}:epoch"
+        epoch = await self.client.get(key)
+        if epoch is None:
+            await self.client.set(key, secrets.token_hex(4), nx=True)
+            epoch = await self.client.get(key)
+        return f"{epoch}.{await self.generation(table)}"
+
+    async def bump(self, table: str):
+        await self.client.incr(f"{self.prefix}:gen:{table}")
+
+    async def get(self, key):
+        raw = await self.client.get(f"{self.prefix}:{key}")
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key, value):
+        raw = json.dumps(value, default=_json_default)
+        await self.client.set(f"{self.prefix}:{key}", raw, ex=max(1, int(self.ttl)))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "shared",
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": None,  # ✅ Evictions happen inside the shared store
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class LocalSharedStore:
+    """Minimal in-memory stand-in for the Redis client used by SharedBackend."""
+
+    def __init__(self):
+        self._data = {}
+
+    async def get(self, key):
+        value, expires = self._data.get(key, (None, None))
+        if expires is not None and expires < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and await self.get(key) is not None:
+            return None
+        self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def incr(self, key):
+        value = int(await self.get(key) or 0) + 1
+        self._data[key] = (str(value), None)
+        return value
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+class MediaCache:
+    """Read-through page cache keyed by table generation and page parameters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def get_or_load(self, table: str, params: tuple, loader):
+        # ✅ Read the generation before loading: a write that lands meanwhile
+        # bumps it, so the page stored below can never be served afterwards
+        generation = await self.backend.generation(table)
+        # ✅ repr keeps None apart from "None" and values containing ":"
+        key = f"{table}:{generation}:{tuple(params)!r}"
+        value = await self.backend.get(key)
+        if value is None:
+            value = await loader()
+            await self.backend.set(key, value)
+        return value
+
+    async def version(self, table: str) -> str:
+        """Cheap version stamp for a table; it changes on every invalidation."""
+        return await self.backend.version(table)
+
+    async def invalidate(self, *tables: str):
+        for table in tables:
+            await self.backend.bump(table)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def _build_backend():
+    if not MEDIA_CACHE_URL:
+        return LocalBackend(MEDIA_CACHE_MAX_ENTRIES, MEDIA_CACHE_TTL)
+    if MEDIA_CACHE_URL.startswith("memory://"):
+        return SharedBackend(LocalSharedStore(), MEDIA_CACHE_TTL)
+    import redis.asyncio as redis  # ✅ Optional dependency, only needed for a Redis backend
+    return SharedBackend(redis.from_url(MEDIA_CACHE_URL, decode_responses=True), MEDIA_CACHE_TTL)
+
+
+media_cache = MediaCache(_build_backend())
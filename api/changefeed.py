@@ -0,0 +1,258 @@
+import asyncio
+import bisect
+import logging
+import os
+import time
+
+import orjson
+from dotenv import load_dotenv
+from sqlalchemy import func, literal_column, select
+
+from database import database
+from metrics import registry, Counter, Gauge
+from models import media_changes
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ✅ Change feed settings
+CHANGEFEED_POLL_INTERVAL = float(os.getenv("CHANGEFEED_POLL_INTERVAL", "1.0"))  # ✅ Picks up other workers' writes
+CHANGEFEED_BUFFER = int(os.getenv("CHANGEFEED_BUFFER", "10000"))  # ✅ Recent events kept in memory for resuming
+CHANGEFEED_BATCH_SIZE = int(os.getenv("CHANGEFEED_BATCH_SIZE", "500"))  # ✅ Events per read and per write to a client
+CHANGEFEED_MAX_SUBSCRIBERS = int(os.getenv("CHANGEFEED_MAX_SUBSCRIBERS", "5000"))
+CHANGEFEED_HEARTBEAT = float(os.getenv("CHANGEFEED_HEARTBEAT", "15"))  # ✅ Seconds between keep-alive comments
+CHANGEFEED_RETENTION_HOURS = float(os.getenv("CHANGEFEED_RETENTION_HOURS", "24"))
+CHANGEFEED_GAP_GRACE = 2.0  # ✅ Seconds a missing seq may still commit before it is skipped
+CHANGEFEED_LATE_WINDOW = float(os.getenv("CHANGEFEED_LATE_WINDOW", "600"))  # ✅ Seconds a skipped seq is still watched
+
+MEDIA_TYPES = {"videos": "video", "images": "image"}
+RETRY_MS = 3000
+
+changefeed_events = registry.register(Counter("changefeed_events_total", "Media change events read from the log."))
+changefeed_resets = registry.register(Counter(
+    "changefeed_resets_total", "Subscribers told to refetch everything: the log no longer has what they missed.",
+))
+changefeed_late = registry.register(Counter(
+    "changefeed_late_total", "Changes that committed after their seq was skipped, re-logged under a new seq.",
+))
+
+
+def _frame(event: str, seq: int, data: dict) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (seq, event.encode(), orjson.dumps(data))
+
+
+def _change_frame(row) -> bytes:
+    return _frame("change", row["seq"], {
+        "seq": row["seq"], "op": row["op"], "type": row["media_type"],
+        "id": row["media_id"], "order_position": row["order_position"],
+    })
+
+
+class ChangeFeed:
+    """
+    Streams writes to videos and images as Server-Sent Events.
+
+    crud records every write in media_changes inside the write's own
+    transaction, so the log's seq orders changes across all workers and is
+    what clients resume from (Last-Event-ID or ?since=). One tail task per
+    worker reads new rows (on wake() after local writes, otherwise every
+    CHANGEFEED_POLL_INTERVAL) into a ring of pre-encoded frames. Subscribers
+    read the ring from their own cursor at their own pace: a slow client
+    only delays itself, and one that falls off the ring catches up from the
+    log, or gets a `reset` once retention has dropped what it missed.
+
+    A seq missing from the log for CHANGEFEED_GAP_GRACE is skipped (its
+    transaction may have rolled back), but watched for CHANGEFEED_LATE_WINDOW:
+    if it commits after all, the change is logged again under a new seq, so
+    live and resuming subscribers on every worker still receive it.
+    """
+
+    def __init__(self):
+        self.head = 0  # ✅ Highest seq read from the log
+        self.subscribers = 0
+        self._seqs, self._frames = [], []  # ✅ The ring: parallel lists, oldest first
+        self._floor = 0  # ✅ Every event up to this seq is older than the ring
+        self._changed = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._gap_since = None
+        self._skipped = {}  # ✅ seq -> when it was skipped
+        self._pruned_at = 0.0
+        self._task = None
+        self._stopping = False
+
+    async def record(self, op: str, name: str, items):
+        """Logs (media_id, order_position) pairs of one op; call inside the write's transaction."""
+        rows = [
+            {"op": op, "media_type": MEDIA_TYPES[name], "media_id": media_id, "order_position": position}
+            for media_id, position in items
+        ]
+        for start in range(0, len(rows), 1000):
+            await database.execute(media_changes.insert().values(rows[start:start + 1000]))
+
+    def wake(self):
+        """Reads the log now rather than at the next poll; call after the write committed."""
+        self._wake.set()
+
+    async def start(self):
+        self.head = self._floor = await database.fetch_val(select(func.coalesce(func.max(media_changes.c.seq), 0)))
+        self._stopping = False
+        self._task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        self._stopping = True
+        self._changed.set()  # ✅ Lets open streams end
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _tail(self):
+        while True:
+            timeout = 0.1 if self._gap_since is not None else CHANGEFEED_POLL_INTERVAL
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._relog_late()
+                while await self._poll() == CHANGEFEED_BATCH_SIZE:
+                    pass
+                await self._prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Change feed poll failed: %s", e)
+
+    async def _poll(self) -> int:
+        query = select(media_changes).where(media_changes.c.seq > self.head).order_by(media_changes.c.seq).limit(CHANGEFEED_BATCH_SIZE)
+        rows = await database.fetch_all(query)
+        fresh = 0
+        for row in rows:
+            if row["seq"] != self.head + 1:
+                # ✅ A lower seq may belong to a transaction that has not committed yet
+                if self._gap_since is None:
+                    self._gap_since = time.monotonic()
+                if time.monotonic() - self._gap_since < CHANGEFEED_GAP_GRACE:
+                    break
+                for seq in range(self.head + 1, row["seq"]):
+                    self._skipped[seq] = time.monotonic()
+            self._gap_since = None
+            self._seqs.append(row["seq"])
+            self._frames.append(_change_frame(row))
+            self.head = row["seq"]
+            fresh += 1
+
+        if fresh:
+            changefeed_events.inc(amount=fresh)
+            if len(self._seqs) > CHANGEFEED_BUFFER * 2:
+                drop = len(self._seqs) - CHANGEFEED_BUFFER
+                self._floor = self._seqs[drop - 1]
+                del self._seqs[:drop], self._frames[:drop]
+            self._changed.set()
+            self._changed = asyncio.Event()
+        return len(rows) if fresh == len(rows) else 0
+
+    async def _relog_late(self):
+        """Moves skipped seqs that committed late to new seqs, past every cursor already handed out."""
+        now = time.monotonic()
+        for seq in [seq for seq, skipped_at in self._skipped.items() if now - skipped_at > CHANGEFEED_LATE_WINDOW]:
+            del self._skipped[seq]
+        seqs = sorted(self._skipped)
+        for start in range(0, len(seqs), CHANGEFEED_BATCH_SIZE):
+            chunk = seqs[start:start + CHANGEFEED_BATCH_SIZE]
+            for row in await database.fetch_all(select(media_changes).where(media_changes.c.seq.in_(chunk))):
+                self._skipped.pop(row["seq"], None)
+                async with database.transaction():
+                    # ✅ Every worker skipped it: only the first to lock the row re-logs it
+                    query = select(media_changes.c.seq).where(media_changes.c.seq == row["seq"]).with_for_update()
+                    if await database.fetch_val(query) is None:
+                        continue
+                    await database.execute(media_changes.delete().where(media_changes.c.seq == row["seq"]))
+                    await database.execute(media_changes.insert().values(
+                        op=row["op"], media_type=row["media_type"], media_id=row["media_id"], order_position=row["order_position"],
+                    ))
+                changefeed_late.inc()
+
+    async def _prune(self):
+        if time.monotonic() - self._pruned_at < 60:
+            return
+        self._pruned_at = time.monotonic()
+        # ✅ Computed by the database, in the same clock and time zone as the CURRENT_TIMESTAMP default
+        seconds = int(CHANGEFEED_RETENTION_HOURS * 3600)
+        if database.url.dialect == "mysql":
+            cutoff = func.now() - literal_column(f"INTERVAL {seconds} SECOND")
+        else:
+            cutoff = func.datetime("now", f"-{seconds} seconds")
+        await database.execute(media_changes.delete().where(media_changes.c.created_at < cutoff))
+
+    async def read(self, cursor: int):
+        """(frames after `cursor`, new cursor); frames is None when the client must refetch everything."""
+        if cursor >= self._floor:
+            start = bisect.bisect_right(self._seqs, cursor)
+            end = start + CHANGEFEED_BATCH_SIZE
+            if start < len(self._seqs):
+                return self._frames[start:end], self._seqs[start:end][-1]
+            return [], cursor
+
+        # ✅ Behind the ring: catch up from the log, unless retention already dropped part of the gap
+        oldest = await database.fetch_val(select(func.min(media_changes.c.seq)))
+        if oldest is None or oldest > cursor + 1:
+            changefeed_resets.inc()
+            return None, self.head
+        query = (
+            select(media_changes)
+            .where(media_changes.c.seq > cursor, media_changes.c.seq <= self._floor)
+            .order_by(media_changes.c.seq)
+            .limit(CHANGEFEED_BATCH_SIZE)
+        )
+        rows = await database.fetch_all(query)
+        if not rows:
+            return [], self._floor
+        return [_change_frame(row) for row in rows], rows[-1]["seq"]
+
+    async def stream(self, since: int = None):
+        """
+        SSE frames for one subscriber: a `ready` event with the current seq,
+        then `change` events after `since` (or from now), `reset` events when
+        the client must refetch everything, and keep-alive comments.
+        """
+        self.subscribers += 1
+        try:
+            cursor = self.head if since is None else max(since, 0)
+            if cursor > self.head and cursor > await database.fetch_val(select(func.coalesce(func.max(media_changes.c.seq), 0))):
+                # ✅ From before the log was reset: resuming from it would drop events until seq catches up
+                changefeed_resets.inc()
+                yield b"retry: %d\n" % RETRY_MS + _frame("ready", self.head, {"seq": self.head})
+                yield _frame("reset", self.head, {"seq": self.head})
+                cursor = self.head
+            else:
+                yield b"retry: %d\n" % RETRY_MS + _frame("ready", cursor, {"seq": cursor})
+
+            while not self._stopping:
+                changed = self._changed
+                frames, cursor = await self.read(cursor)
+                if frames is None:
+                    yield _frame("reset", cursor, {"seq": cursor})
+                elif frames:
+                    yield b"".join(frames)
+                else:
+                    try:
+                        await asyncio.wait_for(changed.wait(), CHANGEFEED_HEARTBEAT)
+                    except asyncio.TimeoutError:
+                        yield b": ping\n\n"
+        finally:
+            self.subscribers -= 1
+
+    def stats(self) -> dict:
+        return {
+            "head": self.head, "subscribers": self.subscribers, "max_subscribers": CHANGEFEED_MAX_SUBSCRIBERS,
+            "buffered": len(self._seqs), "buffer_floor": self._floor, "waiting_on_gap": self._gap_since is not None,
+            "watching_skipped": len(self._skipped),
+        }
+
+
+changefeed = ChangeFeed()
+
+registry.register(Gauge("changefeed_subscribers", "Open change feed streams.", callback=lambda: {(): changefeed.subscribers}))
@@ -1,42 +1,163 @@
-from database import database
+from database import database, replicas
 from models import videos, images
-from schemas import MediaSchema
+from schemas import VideoSchema, ImageSchema
+from pagination import paginate, SORT_KEYS
+from cache import media_cache
+from search import media_search
+from changefeed import changefeed
+import facets
+from collections import Counter
 from fastapi import HTTPException
+from sqlalchemy import case, select
+import logging
 
-async def get_videos(page: int, limit: int):
-    query = videos.select().offset((page - 1) * limit).limit(limit)
-    return await database.fetch_all(query)
+logger = logging.getLogger(__name__)
 
-async def get_images(page: int, limit: int):
-    query = images.select().offset((page - 1) * limit).limit(limit)
-    return await database.fetch_all(query)
+# ✅ Errors that mean the database refused a row's values (drivers raise their
+# own DB-API classes, so they are matched by name); anything else, such as a
+# lost connection, is not the rows' fault and must not be retried per row
+_ROW_ERRORS = ("IntegrityError", "DataError")
+
+def _is_row_error(error: Exception) -> bool:
+    return any(cls.__name__ in _ROW_ERRORS for cls in type(error).__mro__)
+
+def _projection(table, schema):
+    """Only the columns the response schema exposes, plus the sort keys cursors need."""
+    names = [name for name in schema.model_fields if name in table.c]
+    names += [column for column, _ in SORT_KEYS.values() if column not in names]
+    return [table.c[name] for name in names]
+
+# ✅ Listings never pull unused columns such as videos.description
+VIDEO_COLUMNS = _projection(videos, VideoSchema)
+IMAGE_COLUMNS = _projection(images, ImageSchema)
+
+def _filtered(table, columns, category: str = None, uploaded_by: int = None):
+    """Listing query with the optional filters; each has a (filter, sort key, id) index."""
+    query = select(*columns)
+    if category is not None:
+        query = query.where(table.c.category == category)
+    if uploaded_by is not None:
+        query = query.where(table.c.uploaded_by == uploaded_by)
+    return query
+
+# ✅ Listing reads go to a read replica when one is configured (see database.ReplicaRouter)
+async def get_videos(page: int, limit: int, sort: str = "order", cursor: str = None, category: str = None, uploaded_by: int = None):
+    async def load():
+        query = paginate(_filtered(videos, VIDEO_COLUMNS, category, uploaded_by), videos, sort, page, limit, cursor)
+        return [dict(row) for row in await replicas.fetch_all(query)]
+    return await media_cache.get_or_load("videos", (sort, page, limit, cursor, category, uploaded_by), load)
+
+async def get_images(page: int, limit: int, sort: str = "order", cursor: str = None, category: str = None, uploaded_by: int = None):
+    async def load():
+        query = paginate(_filtered(images, IMAGE_COLUMNS, category, uploaded_by), images, sort, page, limit, cursor)
+        return [dict(row) for row in await replicas.fetch_all(query)]
+    return await media_cache.get_or_load("images", (sort, page, limit, cursor, category, uploaded_by), load)
+
+async def count_media(table: str, category: str = None, uploaded_by: int = None) -> int:
+    """Total rows matching a listing's filters, from the facet aggregate (cached like pages)."""
+    async def load():
+        return await facets.count(table, category, uploaded_by)
+    return await media_cache.get_or_load(table, ("total", category, uploaded_by), load)
+
+async def get_facets(table: str, category: str = None, uploaded_by: int = None) -> dict:
+    async def load():
+        return await facets.summary(table, category, uploaded_by)
+    return await media_cache.get_or_load(table, ("facets", category, uploaded_by), load)
+
+async def get_media_version():
+    """Version stamps of the videos and images tables, bumped by every write below."""
+    return await media_cache.version("videos"), await media_cache.version("images")
 
 async def save_media(media_data):
     if media_data.video_url:  # It's a video
-        query = videos.insert().values(
+        values = dict(
             video_url=media_data.video_url,
             title=media_data.title,
             uploaded_by=media_data.uploaded_by
         )
-        return await database.execute(query)
+        async with database.transaction():
+            media_id = await database.execute(videos.insert().values(**values))
+            await facets.apply(facets.deltas_for("videos", [values]))
+            await changefeed.record("create", "videos", [(media_id, 0)])
+        await media_cache.invalidate("videos")
+        changefeed.wake()
+        await media_search.refresh("videos", [media_id])
+        return media_id
 
     elif media_data.image_url:  # It's an image
-        query = images.insert().values(
+        values = dict(
             image_url=media_data.image_url,
             alt_text=media_data.alt_text,
             uploaded_by=media_data.uploaded_by
         )
-        return await database.execute(query)
+        async with database.transaction():
+            media_id = await database.execute(images.insert().values(**values))
+            await facets.apply(facets.deltas_for("images", [values]))
+            await changefeed.record("create", "images", [(media_id, 0)])
+        await media_cache.invalidate("images")
+        changefeed.wake()
+        await media_search.refresh("images", [media_id])
+        return media_id
 
     raise HTTPException(status_code=400, detail="Invalid media type")
 
+async def insert_videos(rows, checkpoint=None):
+    """
+    Inserts a batch of (row_number, values) pairs with one multi-row INSERT.
+    If the database refuses the batch's values (an integrity or data error),
+    rows are retried one at a time so only the offending ones are reported;
+    any other error propagates. Returns (inserted, [(row_number, reason)]).
+    `checkpoint(inserted, failures)`, if given, is awaited inside the
+    transaction that commits the batch, so what it records commits with it.
+    """
+    failures = []
+    try:
+        async with database.transaction():
+            query = videos.insert().values([values for _, values in rows])
+            if database.insert_returning:
+                ids = sorted(row[0] for row in await database.fetch_all(query.returning(videos.c.id)))
+                await changefeed.record("create", "videos", [(media_id, values.get("order_position", 0)) for media_id, (_, values) in zip(ids, rows)])
+            else:
+                await database.execute(query)
+                await changefeed.record("refresh", "videos", [(None, None)])  # ✅ MySQL only reports the first id
+            await facets.apply(facets.deltas_for("videos", [values for _, values in rows]))
+            if checkpoint is not None:
+                await checkpoint(len(rows), failures)
+        inserted = len(rows)
+    except Exception as e:
+        if not _is_row_error(e):
+            raise
+        inserted = 0
+        async with database.transaction():
+            for row_number, values in rows:
+                try:
+                    async with database.transaction():  # ✅ Savepoint: a bad row only rolls back itself
+                        media_id = await database.execute(videos.insert().values(**values))
+                        await facets.apply(facets.deltas_for("videos", [values]))
+                        await changefeed.record("create", "videos", [(media_id, values.get("order_position", 0))])
+                    inserted += 1
+                except Exception as e:
+                    if not _is_row_error(e):
+                        raise
+                    failures.append((row_number, str(e)))
+            if checkpoint is not None:
+                await checkpoint(inserted, failures)
+
+    if inserted:
+        await media_cache.invalidate("videos")
+        changefeed.wake()
+        await media_search.catch_up("videos")
+    return inserted, failures
+
 async def modify_media(media_id: int, media_data):
     if media_data.video_url:  # Updating a video
+        table, media_table = "videos", videos
         query = videos.update().where(videos.c.id == media_id).values(
             video_url=media_data.video_url,
             title=media_data.title
         )
     elif media_data.image_url:  # Updating an image
+        table, media_table = "images", images
         query = images.update().where(images.c.id == media_id).values(
             image_url=media_data.image_url,
             alt_text=media_data.alt_text
@@ -44,37 +165,239 @@ async def modify_media(media_id: int, media_data):
     else:
         raise HTTPException(status_code=400, detail="Invalid media type")
 
-    result = await database.execute(query)
-    
-    if result == 0:  # If no row was updated
-        raise HTTPException(status_code=404, detail="Media not found")
-    
+    # ✅ category and uploaded_by are untouched, so the facet counts stay valid
+    async with database.transaction():
+        # ✅ execute() reports the last row id, not a row count, so check the row exists first
+        if await database.fetch_val(select(media_table.c.id).where(media_table.c.id == media_id).with_for_update()) is None:
+            raise HTTPException(status_code=404, detail="Media not found")
+        await database.execute(query)
+        await changefeed.record("update", table, [(media_id, None)])
+    await media_cache.invalidate(table)
+    changefeed.wake()
+    await media_search.refresh(table, [media_id])
+
     return {"message": "Media updated successfully"}
 
 async def remove_media(media_id: int):
-    video_query = videos.delete().where(videos.c.id == media_id)
-    image_query = images.delete().where(images.c.id == media_id)
-    
-    video_deleted = await database.execute(video_query)
-    image_deleted = await database.execute(image_query)
-    
-    if not video_deleted and not image_deleted:
+    # ✅ Read what is deleted first: the facet counts need its category and uploader
+    removed = []
+    async with database.transaction():
+        for name, table in (("videos", videos), ("images", images)):
+            row = await database.fetch_one(select(table.c.category, table.c.uploaded_by).where(table.c.id == media_id).with_for_update())
+            if row is not None:
+                await database.execute(table.delete().where(table.c.id == media_id))
+                await facets.apply(facets.deltas_for(name, [dict(row)], sign=-1))
+                await changefeed.record("delete", name, [(media_id, None)])
+                removed.append(name)
+
+    if not removed:
         raise HTTPException(status_code=404, detail="Media not found")
-    
+
+    await media_cache.invalidate(*removed)
+    changefeed.wake()
+    for name in removed:
+        media_search.discard(name, [media_id])
     return {"message": "Media deleted successfully"}
 
-# ✅ New function: Update Media Order
-async def update_media_order(media_list):
+# ✅ Reorders are applied in chunks of this many ids per UPDATE statement
+ORDER_UPDATE_CHUNK = 1000
+
+async def update_media_order(items):
     """
     Updates the order of media items in the database.
+    Each table gets a single CASE-based UPDATE (chunked for very large lists),
+    all inside one transaction so a reorder is never half-applied.
     """
-    for media in media_list:
-        if media.get("video_url"):
-            query = videos.update().where(videos.c.id == media["id"]).values(order_position=media["order"])
-        elif media.get("image_url"):
-            query = images.update().where(images.c.id == media["id"]).values(order_position=media["order"])
-        else:
-            continue  # Skip invalid entries
-        await database.execute(query)
-    
+    positions = {"videos": {}, "images": {}}
+    for item in items:
+        positions["videos" if item.type == "video" else "images"][item.id] = item.position
+
+    tables = {"videos": videos, "images": images}
+    async with database.transaction():
+        for name, table_positions in positions.items():
+            table, ids = tables[name], list(table_positions)
+            for start in range(0, len(ids), ORDER_UPDATE_CHUNK):
+                chunk = {media_id: table_positions[media_id] for media_id in ids[start:start + ORDER_UPDATE_CHUNK]}
+                query = (
+                    table.update()
+                    .where(table.c.id.in_(list(chunk)))
+                    # ✅ Explicit, so no ON UPDATE clause (dropped by migration 0005) can move the created_at sort key
+                    .values(order_position=case(chunk, value=table.c.id), created_at=table.c.created_at)
+                )
+                await database.execute(query)
+            await changefeed.record("reorder", name, table_positions.items())
+
+    await media_cache.invalidate(*[name for name, table_positions in positions.items() if table_positions])
+    changefeed.wake()
     return {"message": "Media order updated successfully"}
+
+
+# ✅ Batch writes: columns clients may set per media table
+BATCH_TABLES = {"video": ("videos", videos), "image": ("images", images)}
+BATCH_COLUMNS = {
+    "videos": ("file_name", "video_url", "title", "description", "category", "uploaded_by", "order_position"),
+    "images": ("file_name", "image_url", "alt_text", "category", "uploaded_by", "order_position"),
+}
+URL_COLUMNS = {"videos": "video_url", "images": "image_url"}
+
+def _chunks(items, size: int = ORDER_UPDATE_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _batch_values(name: str, table, values: dict, creating: bool) -> dict:
+    """Checks an operation's values against the table's columns; raises ValueError."""
+    unknown = set(values) - set(BATCH_COLUMNS[name])
+    if unknown:
+        raise ValueError(f"Unknown fields: {sorted(unknown)}")
+    if not values and not creating:
+        raise ValueError("Nothing to update")
+
+    values = dict(values)
+    if creating:
+        url = values.get(URL_COLUMNS[name])
+        if not url:
+            raise ValueError(f"Missing value for {URL_COLUMNS[name]}")
+        if not values.get("file_name") and isinstance(url, str):
+            values["file_name"] = url.rstrip("/").rsplit("/", 1)[-1] or None  # ✅ Defaults to the URL's last segment
+
+    for column, value in values.items():
+        column_type = table.c[column].type
+        if value is None:
+            if not table.c[column].nullable:
+                raise ValueError(f"Missing value for {column}")
+        elif column_type.python_type is int:
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError(f"{column} must be an integer")
+        elif not isinstance(value, str):
+            raise ValueError(f"{column} must be a string")
+        elif getattr(column_type, "length", None) and len(value) > column_type.length:
+            raise ValueError(f"{column} is longer than {column_type.length} characters")
+    return values
+
+async def _locked_rows(table, ids) -> dict:
+    """id -> {category, uploaded_by} of the existing rows among `ids`, locked for the transaction."""
+    rows = {}
+    for chunk in _chunks(ids):
+        query = select(table.c.id, table.c.category, table.c.uploaded_by).where(table.c.id.in_(chunk)).with_for_update()
+        rows.update((row["id"], dict(row)) for row in await database.fetch_all(query))
+    return rows
+
+async def _batch_delete(name: str, table, pending, deltas: Counter):
+    found = await _locked_rows(table, [result["id"] for result, _ in pending])
+    for chunk in _chunks(list(found)):
+        await database.execute(table.delete().where(table.c.id.in_(chunk)))
+    deltas.update(facets.deltas_for(name, found.values(), sign=-1))
+    for result, _ in pending:
+        result["status"] = "deleted" if result["id"] in found else "not_found"
+
+async def _batch_update(name: str, table, pending, deltas: Counter):
+    """One UPDATE per chunk of ids: each column is a CASE over the rows that set it."""
+    found = await _locked_rows(table, [result["id"] for result, _ in pending])
+    updates = {result["id"]: values for result, values in pending if result["id"] in found}
+    columns = {column for values in updates.values() for column in values}
+    for chunk in _chunks(list(updates)):
+        assignments = {}
+        for column in columns:
+            whens = {media_id: updates[media_id][column] for media_id in chunk if column in updates[media_id]}
+            if whens:
+                assignments[column] = case(whens, value=table.c.id, else_=table.c[column])
+        assignments["created_at"] = table.c.created_at  # ✅ See update_media_order
+        await database.execute(table.update().where(table.c.id.in_(chunk)).values(**assignments))
+
+    for media_id, values in updates.items():
+        if values.keys() & {"category", "uploaded_by"}:
+            deltas.update(facets.deltas_for(name, [found[media_id]], sign=-1))
+            deltas.update(facets.deltas_for(name, [{**found[media_id], **values}]))
+    for result, _ in pending:
+        result["status"] = "updated" if result["id"] in updates else "not_found"
+
+async def _batch_create(name: str, table, pending, deltas: Counter):
+    if database.insert_returning:
+        # ✅ One multi-row INSERT per set of columns (and chunk); ids come back in insertion order once sorted
+        groups = {}
+        for item in pending:
+            groups.setdefault(tuple(sorted(item[1])), []).append(item)
+        for items in groups.values():
+            for chunk in _chunks(items):
+                query = table.insert().values([values for _, values in chunk]).returning(table.c.id)
+                ids = sorted(row[0] for row in await database.fetch_all(query))
+                for (result, _), media_id in zip(chunk, ids):
+                    result.update(id=media_id, status="created")
+    else:
+        # MySQL has no INSERT ... RETURNING and multi-row inserts only report the first id
+        for result, values in pending:
+            result.update(id=await database.execute(table.insert().values(**values)), status="created")
+    deltas.update(facets.deltas_for(name, [values for _, values in pending]))
+
+async def apply_media_batch(operations):
+    """
+    Applies typed create/update/delete operations in one transaction, with
+    multi-row statements per table and operation. Invalid operations and
+    unknown ids are reported per item without stopping the rest; if the
+    database rejects the batch, nothing is applied and every remaining
+    item is reported as failed. Returns one result per operation, in order.
+    """
+    results, pending, seen = [], {}, set()
+    for index, operation in enumerate(operations):
+        name, table = BATCH_TABLES[operation.type]
+        result = {"index": index, "op": operation.op, "type": operation.type, "id": operation.id, "error": None}
+        results.append(result)
+        try:
+            if operation.op == "create":
+                if operation.id is not None:
+                    raise ValueError("create takes no id")
+            elif operation.id is None:
+                raise ValueError(f"{operation.op} needs an id")
+            elif (name, operation.id) in seen:
+                raise ValueError("Duplicate id in batch")
+
+            if operation.op == "delete":
+                if operation.values:
+                    raise ValueError("delete takes no values")
+                values = None
+            else:
+                values = _batch_values(name, table, operation.values, operation.op == "create")
+        except ValueError as e:
+            result.update(status="invalid", error=str(e))
+            continue
+        if operation.id is not None:
+            seen.add((name, operation.id))
+        pending.setdefault((operation.op, name), []).append((result, values))
+
+    deltas = Counter()
+    try:
+        async with database.transaction():
+            for name, table in (("videos", videos), ("images", images)):
+                if ("delete", name) in pending:
+                    await _batch_delete(name, table, pending[("delete", name)], deltas)
+                if ("update", name) in pending:
+                    await _batch_update(name, table, pending[("update", name)], deltas)
+                if ("create", name) in pending:
+                    await _batch_create(name, table, pending[("create", name)], deltas)
+            for (op, name), items in pending.items():
+                await changefeed.record(op, name, [
+                    (result["id"], (values or {}).get("order_position", 0 if op == "create" else None))
+                    for result, values in items if result["status"] in ("created", "updated", "deleted")
+                ])
+            await facets.apply(deltas)
+    except Exception:
+        logger.exception("Media batch of %d operation(s) failed", len(operations))
+        for (op, _), items in pending.items():
+            for result, _ in items:
+                result.update(status="failed", error="Database error: nothing in this batch was applied",
+                              id=None if op == "create" else result["id"])
+        return results
+
+    touched = sorted({name for _, name in pending})
+    if touched:
+        await media_cache.invalidate(*touched)
+        changefeed.wake()
+    for (op, name), items in pending.items():
+        ids = [result["id"] for result, _ in items if result["status"] in ("created", "updated", "deleted")]
+        if not ids:
+            continue
+        if op == "delete":
+            media_search.discard(name, ids)
+        else:
+            await media_search.refresh(name, ids)
+    return results
@@ -1,23 +1,402 @@
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.sql.expression import ClauseElement, TextClause
+from sqlalchemy.sql.util import find_tables
 from databases import Database
+from starlette.requests import cookie_parser
+from contextvars import ContextVar
+import asyncio
+import hashlib
+import hmac
+import itertools
+import logging
 import os
+import re
+import time
 from dotenv import load_dotenv
 
+from metrics import registry, Counter, Gauge, observe_statement
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-database = Database(DATABASE_URL)
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# ✅ Connection pool settings (shared by every route through `database`)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_WARMUP = os.getenv("DB_POOL_WARMUP", "true").lower() in ("1", "true", "yes")
+
+# ✅ Read replicas (optional): listing reads go to them, everything else to DATABASE_URL.
+# Locally, a second SQLite file works as a stand-in: migrate it with
+# `DATABASE_URL=sqlite:///./replica.db python -m migrations` and copy data into it by hand.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))  # read-your-writes window
+DB_REPLICA_HEALTH_INTERVAL = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL", "5"))
+DB_REPLICA_HEALTH_TIMEOUT = float(os.getenv("DB_REPLICA_HEALTH_TIMEOUT", "1"))
+
+# SQLite (local testing) has no server-side pool to tune
+POOLED = not DATABASE_URL.startswith("sqlite")
+
+
+def _pool_options() -> dict:
+    """
+    aiomysql has no overflow or pre-ping settings: max_size covers the
+    overflow, and on checkout it already drops connections the server closed
+    and retires those older than pool_recycle.
+    """
+    if not POOLED:
+        return {}
+    return {
+        "min_size": DB_POOL_SIZE if DB_POOL_WARMUP else 1,
+        "max_size": DB_POOL_SIZE + DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+def _engine_options() -> dict:
+    if not POOLED:
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+_SQL_VERB = re.compile(r"\s*(\w+)")
+
+
+def statement_label(query) -> str:
+    """Low-cardinality metric label for a statement: operation and main table."""
+    if isinstance(query, ClauseElement) and not isinstance(query, TextClause):
+        table = getattr(query, "table", None)
+        if table is None and hasattr(query, "get_final_froms"):
+            froms = query.get_final_froms()
+            table = froms[0] if froms else None
+        verb = "select" if getattr(query, "is_select", False) else type(query).__name__.lower()
+        return f"{verb} {getattr(table, 'name', '') or ''}".strip()
+    match = _SQL_VERB.match(str(query))
+    return f"{match.group(1).lower()} (raw)" if match else "raw"
+
+
+class InstrumentedDatabase(Database):
+    """
+    Database whose query methods report pool checkout wait and statement time
+    to metrics.py, and log statements slower than SLOW_QUERY_MS by shape
+    (SQL with placeholders, never the bound values). `on_write(query)`, if
+    set, is called after each execute, and after INSERT/UPDATE/DELETE
+    statements run through the fetch methods (... RETURNING).
+    """
+
+    on_write = None
+
+    @property
+    def insert_returning(self) -> bool:
+        """Whether multi-row INSERT ... RETURNING is available (SQLite 3.35+; not MySQL)."""
+        return self._backend._dialect.insert_returning
+
+    def _shape(self, query):
+        return lambda: str(query.compile(dialect=self._backend._dialect)) if isinstance(query, ClauseElement) else str(query)
+
+    async def _timed(self, method: str, query, *args, **kwargs):
+        started = time.perf_counter()
+        # ✅ The pooled connection is acquired on entering the outermost context
+        async with self.connection() as connection:
+            acquired = time.perf_counter()
+            # Statements inside a transaction (or nested contexts) reuse the held connection
+            wait = acquired - started if connection._connection_counter == 1 else None
+            try:
+                return await getattr(connection, method)(query, *args, **kwargs)
+            finally:
+                observe_statement(statement_label(query), time.perf_counter() - acquired, wait, self._shape(query))
+
+    def _returned(self, query, result):
+        if self.on_write is not None and getattr(query, "is_dml", False):
+            self.on_write(query)
+        return result
+
+    async def fetch_all(self, query, values=None):
+        return self._returned(query, await self._timed("fetch_all", query, values))
+
+    async def fetch_one(self, query, values=None):
+        return self._returned(query, await self._timed("fetch_one", query, values))
+
+    async def fetch_val(self, query, values=None, column=0):
+        return self._returned(query, await self._timed("fetch_val", query, values, column=column))
+
+    async def execute(self, query, values=None):
+        result = await self._timed("execute", query, values)
+        if self.on_write is not None:
+            self.on_write(query)
+        return result
+
+    async def execute_many(self, query, values):
+        result = await self._timed("execute_many", query, values)
+        if self.on_write is not None:
+            self.on_write(query)
+        return result
+
+
+# ✅ Every route goes through the async pool; the sync engine is only for migrations
+database = InstrumentedDatabase(DATABASE_URL, **_pool_options())
+engine = create_engine(DATABASE_URL, **_engine_options())
+
+
+# ✅ Migration statements on the sync engine are timed through its events
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_started"].pop()
+    observe_statement(statement_label(statement), duration, shape=lambda: statement)
 metadata = MetaData()
-Base = declarative_base()
 
-# ✅ Function to get a database session
-def get_db():
-    db = SessionLocal()
+
+async def warm_up_pool():
+    """Opens DB_POOL_SIZE connections concurrently and checks each with SELECT 1."""
+    if not (POOLED and DB_POOL_WARMUP):
+        return 0
+    await asyncio.gather(*[database.fetch_val("SELECT 1") for _ in range(DB_POOL_SIZE)])
+    return DB_POOL_SIZE
+
+
+def pool_stats() -> dict:
+    """Utilisation of the async connection pool."""
+    stats = {"backend": database.url.dialect, "pooled": POOLED}
+    pool = getattr(database._backend, "_pool", None)
+    if POOLED and pool is not None:
+        in_use = pool.size - pool.freesize
+        stats.update({
+            "size": pool.size,
+            "free": pool.freesize,
+            "in_use": in_use,
+            "min_size": pool.minsize,
+            "max_size": pool.maxsize,
+            "utilisation": round(in_use / pool.maxsize, 4) if pool.maxsize else 0.0,
+            "recycle": DB_POOL_RECYCLE,
+        })
+    return stats
+
+
+def _pool_gauge():
+    stats = pool_stats()
+    if "size" not in stats:
+        return {}
+    return {(state,): stats[state] for state in ("size", "free", "in_use", "max_size")}
+
+
+def _pool_utilisation():
+    return {(): pool_stats().get("utilisation", 0.0)}
+
+
+registry.register(Gauge("db_pool_connections", "Async pool connections, by state.", ("state",), callback=_pool_gauge))
+registry.register(Gauge("db_pool_utilisation", "Share of the pool's max_size checked out.", callback=_pool_utilisation))
+
+
+db_reads = registry.register(Counter(
+    "db_routed_reads_total", "Reads sent through the replica router, by where they ran.", ("target",),
+))
+
+# Per-request read-your-writes state: [primary-until timestamp], shared with copied contexts
+_sticky = ContextVar("db_sticky", default=None)
+
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.database = InstrumentedDatabase(url, **_pool_options())
+        self.healthy = False
+        self.last_error = None
+
+    def mark_down(self, error):
+        if self.healthy:
+            logger.warning("Replica %s marked down: %s", self.name, error)
+        self.healthy, self.last_error = False, str(error)
+
+
+class ReplicaRouter:
+    """
+    Routes listing reads to healthy replicas in round-robin, falling back
+    to the primary when none is healthy or a replica read fails (which also
+    marks it down). A background task pings replicas every
+    DB_REPLICA_HEALTH_INTERVAL and brings recovered ones back.
+
+    Read-your-writes: for DB_REPLICA_STICKY_SECONDS after a write,
+    - the request that wrote (and, through ReadYourWritesMiddleware's
+      cookie, that client's next requests on any worker) reads the primary;
+    - this process reads the written tables from the primary, so the media
+      cache is never refilled from a replica that has not caught up.
+    """
+
+    def __init__(self, primary: InstrumentedDatabase, urls, sticky_seconds: float):
+        self.primary = primary
+        self.replicas = [Replica(f"replica{i}", url) for i, url in enumerate(urls)]
+        self.sticky_seconds = sticky_seconds
+        self._next = itertools.count()
+        self._written = {}  # table name -> primary-until timestamp
+        self._health_task = None
+        if self.replicas:
+            primary.on_write = self.note_write
+
+    async def connect(self):
+        if self.replicas:
+            await self.check_health()
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def disconnect(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for replica in self.replicas:
+            if replica.database.is_connected:
+                await replica.database.disconnect()
+
+    async def check_health(self):
+        for replica in self.replicas:
+            try:
+                if not replica.database.is_connected:
+                    await asyncio.wait_for(replica.database.connect(), DB_REPLICA_HEALTH_TIMEOUT)
+                await asyncio.wait_for(replica.database.fetch_val("SELECT 1"), DB_REPLICA_HEALTH_TIMEOUT)
+            except Exception as e:
+                replica.mark_down(e)
+                continue
+            if not replica.healthy:
+                logger.info("Replica %s is healthy", replica.name)
+            replica.healthy, replica.last_error = True, None
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(DB_REPLICA_HEALTH_INTERVAL)
+            await self.check_health()
+
+    def note_write(self, query):
+        """Starts the read-your-writes window for the current request and the written table."""
+        until = time.time() + self.sticky_seconds
+        holder = _sticky.get()
+        if holder is not None:
+            holder[0] = until
+        table = getattr(query, "table", None)
+        if getattr(table, "name", None):
+            self._written[table.name] = until
+
+    def _pick(self, query):
+        """The replica to read from, or None for the primary."""
+        now = time.time()
+        holder = _sticky.get()
+        if holder is not None and holder[0] > now:
+            return None
+        if isinstance(query, ClauseElement) and any(self._written.get(t.name, 0) > now for t in find_tables(query)):
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    async def _read(self, method: str, query, *args, **kwargs):
+        replica = self._pick(query) if self.replicas else None
+        if replica is not None:
+            try:
+                result = await getattr(replica.database, method)(query, *args, **kwargs)
+                db_reads.inc("replica")
+                return result
+            except Exception as e:
+                replica.mark_down(e)
+                db_reads.inc("fallback")
+        else:
+            db_reads.inc("primary")
+        return await getattr(self.primary, method)(query, *args, **kwargs)
+
+    async def fetch_all(self, query, values=None):
+        return await self._read("fetch_all", query, values)
+
+    async def fetch_one(self, query, values=None):
+        return await self._read("fetch_one", query, values)
+
+    async def fetch_val(self, query, values=None, column=0):
+        return await self._read("fetch_val", query, values, column=column)
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "replicas": [
+                {"name": r.name, "url": r.database.url.obscure_password, "healthy": r.healthy, "last_error": r.last_error}
+                for r in self.replicas
+            ],
+            "sticky_seconds": self.sticky_seconds,
+            "sticky_tables": sorted(name for name, until in self._written.items() if until > now),
+        }
+
+
+# ✅ Listing reads go through `replicas`; with no DATABASE_REPLICA_URLS it simply uses `database`
+replicas = ReplicaRouter(database, DATABASE_REPLICA_URLS, DB_REPLICA_STICKY_SECONDS)
+
+registry.register(Gauge("db_replica_healthy", "1 while a read replica passes health checks.", ("replica",),
+                        callback=lambda: {(r.name,): int(r.healthy) for r in replicas.replicas}))
+
+
+STICKY_COOKIE = "db_primary_until"
+_STICKY_KEY = (os.getenv("SECRET_KEY") or "").encode()
+
+
+def _sticky_signature(until: str) -> str:
+    return hmac.new(_STICKY_KEY, f"{STICKY_COOKIE}:{until}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def _sticky_until(cookie: str) -> float:
+    """The primary-until timestamp of a cookie value this app issued; 0 if it is missing or forged."""
+    until, _, signature = cookie.rpartition(".")
+    if not until or not hmac.compare_digest(signature, _sticky_signature(until)):
+        return 0.0
     try:
-        yield db
-    finally:
-        db.close()
+        return float(until)
+    except ValueError:
+        return 0.0
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware carrying the read-your-writes window between
+    requests: a request that wrote gets a short-lived cookie, and requests
+    presenting it read from the primary until it expires. The cookie is
+    signed with SECRET_KEY, so clients cannot mint or extend it. Browsers
+    only send it cross-origin with credentials (the React client sets
+    withCredentials). A no-op without replicas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replicas.replicas:
+            return await self.app(scope, receive, send)
+
+        now = time.time()
+        until = 0.0
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookie = cookie_parser(value.decode("latin-1")).get(STICKY_COOKIE)
+                if cookie:
+                    # ✅ Clamped as well, in case another worker's clock runs ahead
+                    until = min(_sticky_until(cookie), now + replicas.sticky_seconds)
+        holder = [until]
+        token = _sticky.set(holder)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and holder[0] > max(until, now):
+                max_age = max(1, int(holder[0] - time.time() + 0.999))
+                value = f"{holder[0]:.3f}"
+                cookie = f"{STICKY_COOKIE}={value}.{_sticky_signature(value)}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _sticky.reset(token)
@@ -0,0 +1,388 @@
+import asyncio
+import hashlib
+import io
+import ipaddress
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import socket
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+from starlette.concurrency import run_in_threadpool
+
+from crud import URL_COLUMNS
+from database import database, replicas
+from metrics import registry, Counter, Gauge
+from models import videos, images
+from storage import STORAGE_DIR, STORAGE_URL, MEDIA_DIRS, storage
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ✅ Derivative (image variant) settings
+DERIVATIVES_DIR = os.getenv("DERIVATIVES_DIR", os.path.join(STORAGE_DIR, "derivatives"))
+DERIVATIVES_URL = os.getenv("DERIVATIVES_URL", "/api/media")  # ✅ Prefix of the variant URLs in listings
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", "2"))
+DERIVATIVE_CACHE_MAX_MB = int(os.getenv("DERIVATIVE_CACHE_MAX_MB", "2048"))
+DERIVATIVE_WIDTHS = tuple(int(width) for width in os.getenv("DERIVATIVE_WIDTHS", "320,640,1280").split(",") if width.strip())
+DERIVATIVE_THUMB_SIZE = int(os.getenv("DERIVATIVE_THUMB_SIZE", "256"))
+DERIVATIVE_WAIT = float(os.getenv("DERIVATIVE_WAIT", "10"))  # ✅ Seconds a request waits for a missing variant
+# ✅ Hosts remote sources may be fetched from ("cdn.example.com", "*.example.com"); empty: none
+DERIVATIVE_REMOTE_HOSTS = tuple(host.strip().lower() for host in os.getenv("DERIVATIVE_REMOTE_HOSTS", "").split(",") if host.strip())
+DERIVATIVE_MAX_INFLIGHT = int(os.getenv("DERIVATIVE_MAX_INFLIGHT", "32"))  # ✅ Renders requests may start; past it they are shed
+DERIVATIVE_MAX_SOURCE_MB = int(os.getenv("DERIVATIVE_MAX_SOURCE_MB", "50"))  # ✅ Remote images only
+DERIVATIVE_FFMPEG = shutil.which(os.getenv("DERIVATIVE_FFMPEG", "ffmpeg"))  # ✅ None: videos get no poster variants
+DERIVATIVE_POSTER_AT = float(os.getenv("DERIVATIVE_POSTER_AT", "1.0"))  # ✅ Seconds into the video
+DERIVATIVE_TOUCH_INTERVAL = 3600  # ✅ Hits refresh a variant's mtime (its LRU clock) at most this often
+
+DERIVATIVE_VERSION = 1  # ✅ Bump when rendering changes: every key changes with it
+VARIANTS = {"thumb": ("cover", DERIVATIVE_THUMB_SIZE), **{f"w{width}": ("width", width) for width in DERIVATIVE_WIDTHS}}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}, "image/webp"),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}, "image/jpeg"),
+}
+TABLES = {"videos": videos, "images": images}
+
+media_variants = registry.register(Counter(
+    "media_variants_total", "Media variant lookups and renders, by result (hit, rendered, failed, shed).", ("result",),
+))
+
+
+def allowed_remote(url: str) -> bool:
+    """Whether `url` is http(s) on one of DERIVATIVE_REMOTE_HOSTS."""
+    parsed = urllib.parse.urlsplit(url)
+    host = (parsed.hostname or "").lower()
+    if parsed.scheme not in ("http", "https") or not host:
+        return False
+    return any(host == allowed or (allowed.startswith("*.") and host.endswith(allowed[1:])) for allowed in DERIVATIVE_REMOTE_HOSTS)
+
+
+# Renderers run in worker processes, so they must stay top-level and picklable.
+# PIL is imported there, never in the API process.
+def _check_public(url: str):
+    """Refuses URLs whose host resolves to a loopback, private or otherwise internal address."""
+    parsed = urllib.parse.urlsplit(url)
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, parsed.port or 80)}
+    except OSError as e:
+        raise ValueError(f"Could not resolve {parsed.hostname}: {e}") from None
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError(f"{parsed.hostname} resolves to an internal address")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # ✅ A redirect could leave the allowed hosts
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def _fetch(url: str, max_bytes: int) -> bytes:
+    _check_public(url)
+    try:
+        with _opener.open(url, timeout=20) as response:
+            data = response.read(max_bytes + 1)
+    except OSError as e:
+        raise ValueError(f"Could not fetch {url}: {e}") from None  # ✅ HTTPError does not pickle back from the worker
+    if len(data) > max_bytes:
+        raise ValueError(f"{url} is larger than {max_bytes} bytes")
+    return data
+
+
+def _poster_frame(source: str, ffmpeg: str, at: float) -> bytes:
+    """One PNG frame `at` seconds into the video (or its first frame if it is shorter)."""
+    if source.startswith(("http://", "https://")):
+        _check_public(source)
+    for seek in (at, 0):
+        result = subprocess.run(
+            [ffmpeg, "-v", "error", "-protocol_whitelist", "file,http,https,tcp,tls,crypto",
+             "-ss", str(seek), "-i", source, "-frames:v", "1", "-f", "image2pipe", "-c:v", "png", "-"],
+            capture_output=True, timeout=120,
+        )
+        if result.stdout:
+            return result.stdout
+    raise ValueError(f"No frame in {source}: {result.stderr.decode(errors='replace')[-200:]}")
+
+
+def render_variant(source: str, is_video: bool, mode: str, size: int, fmt: str, target: str,
+                   ffmpeg: str = None, poster_at: float = 0, max_bytes: int = 0) -> int:
+    """
+    Renders one variant of `source` (a local path or an http(s) URL) into
+    `target`, written atomically; returns its size in bytes. "cover" crops
+    to a size x size square, "width" scales down to at most `size` wide.
+    """
+    from PIL import Image, ImageOps
+
+    if is_video:
+        image = Image.open(io.BytesIO(_poster_frame(source, ffmpeg, poster_at)))
+    elif source.startswith(("http://", "https://")):
+        image = Image.open(io.BytesIO(_fetch(source, max_bytes)))
+    else:
+        image = Image.open(source)
+
+    with image:
+        image.draft("RGB", (size, size))  # ✅ JPEG sources decode straight at a reduced scale
+        image = ImageOps.exif_transpose(image)
+        if mode == "cover":
+            image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        elif image.width > size:
+            image = image.resize((size, max(1, round(image.height * size / image.width))), Image.LANCZOS)
+
+    pil_format, options, _ = FORMATS[fmt]
+    if fmt == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.mode or "transparency" in image.info else "RGB")
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as output:
+            image.save(output, pil_format, **options)
+        os.replace(temporary, target)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return os.path.getsize(target)
+
+
+class DerivativeUnavailable(Exception):
+    """The variant cannot be served yet (`pending`) or at all."""
+
+    def __init__(self, url: str, pending: bool):
+        super().__init__(url)
+        self.url = url
+        self.pending = pending
+
+
+class DerivativeCache:
+    """
+    Resized and recompressed variants (a square thumbnail and a few widths,
+    as WebP or JPEG) of images and of video poster frames. Files are stored
+    under a key hashing the source and the variant's parameters, so a
+    changed image URL or rendering simply gets new files and nothing is
+    ever invalidated. Misses render in a process pool and concurrent misses
+    for one key share a render; requests start at most max_inflight renders
+    at once, and a miss past that is shed rather than queued. The directory
+    is bounded: past max_bytes the least recently used files (by mtime) are
+    deleted.
+    """
+
+    def __init__(self, root: str, max_bytes: int, workers: int, max_inflight: int = DERIVATIVE_MAX_INFLIGHT):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.max_inflight = max_inflight
+        self._inflight = {}  # variant path -> future
+        self._pool = None
+        self._size = None  # ✅ Bytes on disk, measured by the first prune
+        self._pruning = None
+        self.hits = self.rendered = self.failures = self.shed = 0
+
+    @staticmethod
+    def fingerprint(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest()[:12]
+
+    def source(self, name: str, url: str):
+        """(local path or URL, is_video) to render `url` from, or None when it cannot be."""
+        is_video = name == "videos"
+        if not url or (is_video and not DERIVATIVE_FFMPEG):
+            return None
+        prefix = STORAGE_URL.rstrip("/") + "/"
+        if url.startswith(prefix):
+            directory, _, stored_name = url[len(prefix):].partition("/")
+            if directory not in MEDIA_DIRS.values() or not stored_name or "/" in stored_name or stored_name.startswith("."):
+                return None
+            return storage.file_path(directory, stored_name), is_video
+        if allowed_remote(url):
+            return url, is_video
+        return None
+
+    def urls(self, name: str, row: dict) -> dict:
+        """Variant name -> WebP URL for a listing row (swap the extension for JPEG)."""
+        url = row.get(URL_COLUMNS[name])
+        if self.source(name, url) is None:
+            return {}
+        version = self.fingerprint(url)
+        base = f"{DERIVATIVES_URL.rstrip('/')}/{name}/{row['id']}/variants"
+        return {variant: f"{base}/{variant}.webp?v={version}" for variant in VARIANTS}
+
+    def annotate(self, name: str, rows: list) -> list:
+        """Copies of listing rows with their `variants` (rows may be shared cache entries)."""
+        return [{**row, "variants": self.urls(name, row)} for row in rows]
+
+    def path(self, source: str, variant: str, fmt: str) -> str:
+        key = hashlib.sha256(f"{DERIVATIVE_VERSION}\0{source}\0{VARIANTS[variant]}\0{fmt}".encode()).hexdigest()
+        return os.path.join(self.root, key[:2], f"{key}.{fmt}")
+
+    @staticmethod
+    def _lookup(path: str):
+        """stat of a cached variant (refreshing its mtime now and then), or None."""
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if time.time() - stat_result.st_mtime > DERIVATIVE_TOUCH_INTERVAL:
+            os.utime(path)
+        return stat_result
+
+    def _render(self, source: str, is_video: bool, variant: str, fmt: str, path: str):
+        future = self._inflight.get(path)
+        if future is None:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            mode, size = VARIANTS[variant]
+            future = asyncio.get_running_loop().run_in_executor(
+                self._pool, render_variant, source, is_video, mode, size, fmt, path,
+                DERIVATIVE_FFMPEG, DERIVATIVE_POSTER_AT, DERIVATIVE_MAX_SOURCE_MB * 1024 * 1024,
+            )
+            self._inflight[path] = future
+            future.add_done_callback(lambda done: self._rendered(path, source, done))
+        return future
+
+    def _rendered(self, path: str, source: str, future):
+        self._inflight.pop(path, None)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.failures += 1
+            media_variants.inc("failed")
+            logger.warning("Could not render a variant of %s: %s", source, future.exception())
+            return
+        self.rendered += 1
+        media_variants.inc("rendered")
+        if self._size is not None:
+            self._size += future.result()
+        if (self._size is None or self._size > self.max_bytes) and self._pruning is None:
+            self._pruning = asyncio.create_task(self._prune())
+
+    def _prune_sync(self) -> int:
+        """Deletes least recently used variants down to 90% of max_bytes; returns the bytes left."""
+        entries, total = [], 0
+        for directory, _, files in os.walk(self.root):
+            for file_name in files:
+                path = os.path.join(directory, file_name)
+                try:
+                    stat_result = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat_result.st_mtime, stat_result.st_size, path))
+                total += stat_result.st_size
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        return total
+
+    async def _prune(self):
+        try:
+            self._size = await run_in_threadpool(self._prune_sync)
+        finally:
+            self._pruning = None
+
+    async def get(self, name: str, media_id: int, variant: str, fmt: str):
+        """
+        (path, stat_result, source URL) of a variant, rendering it if needed.
+        Raises LookupError for unknown media, DerivativeUnavailable when the
+        render fails, takes longer than DERIVATIVE_WAIT or cannot start
+        because max_inflight renders are already running.
+        """
+        table = TABLES[name]
+        url = await replicas.fetch_val(select(table.c[URL_COLUMNS[name]]).where(table.c.id == media_id))
+        if url is None:
+            raise LookupError(media_id)
+        resolved = self.source(name, url)
+        if resolved is None:
+            raise DerivativeUnavailable(url, pending=False)
+        source, is_video = resolved
+        path = self.path(source, variant, fmt)
+
+        stat_result = await run_in_threadpool(self._lookup, path)
+        if stat_result is None:
+            if path not in self._inflight and len(self._inflight) >= self.max_inflight:
+                # ✅ The route is public: cold misses must not queue unbounded work
+                self.shed += 1
+                media_variants.inc("shed")
+                raise DerivativeUnavailable(url, pending=True)
+            future = self._render(source, is_video, variant, fmt, path)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), DERIVATIVE_WAIT)
+            except asyncio.TimeoutError:
+                raise DerivativeUnavailable(url, pending=True)
+            except Exception:
+                raise DerivativeUnavailable(url, pending=False)
+            stat_result = await run_in_threadpool(os.stat, path)
+        else:
+            self.hits += 1
+            media_variants.inc("hit")
+        return path, stat_result, url
+
+    async def warm(self, name: str, rows: list) -> dict:
+        """Renders the missing variants (WebP) of `rows` (dicts with id and the URL column)."""
+        futures = []
+        for row in rows:
+            resolved = self.source(name, row.get(URL_COLUMNS[name]))
+            if resolved is None:
+                continue
+            for variant in VARIANTS:
+                path = self.path(resolved[0], variant, "webp")
+                if not await run_in_threadpool(os.path.exists, path):
+                    futures.append(self._render(*resolved, variant, "webp", path))
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        failed = sum(isinstance(result, BaseException) for result in results)
+        return {"rendered": len(results) - failed, "failed": failed}
+
+    async def backfill(self, names=("images", "videos"), progress=None, batch_size: int = 100) -> dict:
+        """Warms every row of the given tables, batch by batch (the `derivatives` job)."""
+        totals = {"rendered": 0, "failed": 0}
+        counts = {name: await database.fetch_val(select(func.count()).select_from(TABLES[name])) for name in names}
+        done, overall = 0, sum(counts.values()) or 1
+        for name in names:
+            table, last_id = TABLES[name], 0
+            url_column = table.c[URL_COLUMNS[name]]
+            while True:
+                query = select(table.c.id, url_column).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+                rows = [dict(row) for row in await database.fetch_all(query)]
+                if not rows:
+                    break
+                report = await self.warm(name, rows)
+                totals = {key: totals[key] + report[key] for key in totals}
+                last_id, done = rows[-1]["id"], done + len(rows)
+                if progress is not None:
+                    await progress(done / overall)
+        return totals
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits, "rendered": self.rendered, "failures": self.failures, "shed": self.shed,
+            "inflight": len(self._inflight), "max_inflight": self.max_inflight, "remote_hosts": list(DERIVATIVE_REMOTE_HOSTS),
+            "bytes": self._size, "max_bytes": self.max_bytes, "workers": self.workers,
+            "variants": sorted(VARIANTS), "video_posters": DERIVATIVE_FFMPEG is not None,
+        }
+
+
+derivative_cache = DerivativeCache(DERIVATIVES_DIR, DERIVATIVE_CACHE_MAX_MB * 1024 * 1024, DERIVATIVE_WORKERS)
+
+registry.register(Gauge("media_variants_rendering", "Variant renders queued or running in the process pool.",
+                        callback=lambda: {(): len(derivative_cache._inflight)}))
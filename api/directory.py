@@ -0,0 +1,58 @@
+import os
+
+from dotenv import load_dotenv
+
+from auth import token_cache
+from database import database
+from models import admin_users
+
+load_dotenv()
+
+# ✅ Prebuilt TOTP verifiers kept, at most (least recently built go first)
+ADMIN_TOTP_CACHE_ENTRIES = int(os.getenv("ADMIN_TOTP_CACHE_ENTRIES", "1024"))
+
+
+class AdminDirectory:
+    """
+    Admin_users lookups shared by the login and MFA flows.
+    Rows are read from the database on every call and never cached, so a
+    password, MFA or role change made by another worker or by hand applies
+    to the next request, and a newly created admin can log in at once. Only
+    each user's TOTP verifier is cached, keyed by its secret, so it is
+    rebuilt whenever the secret changes.
+    """
+
+    def __init__(self, max_totp: int):
+        self.max_totp = max_totp
+        self._totp = {}  # username -> (secret, pyotp.TOTP)
+
+    async def credentials(self, username: str):
+        """The full admin_users row; None if unknown."""
+        row = await database.fetch_one(admin_users.select().where(admin_users.c.username == username))
+        return dict(row) if row is not None else None
+
+    def totp(self, record):
+        """Prebuilt pyotp.TOTP verifier for the mfa_secret of a credentials() record."""
+        import pyotp  # ✅ Imported on first MFA use, not at worker start-up
+
+        secret = record["mfa_secret"]
+        cached = self._totp.pop(record["username"], None)
+        if cached is None or cached[0] != secret:
+            cached = (secret, pyotp.TOTP(secret))
+        self._totp[record["username"]] = cached
+        while len(self._totp) > self.max_totp:
+            del self._totp[next(iter(self._totp))]
+        return cached[1]
+
+    async def update(self, record, **values):
+        """Writes admin_users columns for a user."""
+        await database.execute(admin_users.update().where(admin_users.c.id == record["id"]).values(**values))
+        if "mfa_secret" in values:
+            self._totp.pop(record["username"], None)
+        if "role" in values and values["role"] != record.get("role"):
+            # ✅ Tokens issued under the old role must not outlive it
+            token_cache.revoke_subject(record["id"])
+            token_cache.revoke_subject(record["username"])
+
+
+admin_directory = AdminDirectory(ADMIN_TOTP_CACHE_ENTRIES)
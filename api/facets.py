@@ -0,0 +1,99 @@
+import logging
+from collections import Counter
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import mysql, sqlite
+
+from database import database, replicas
+from models import videos, images, media_facets
+
+logger = logging.getLogger(__name__)
+
+TABLES = {"videos": videos, "images": images}
+MEDIA_TYPES = {"videos": "video", "images": "image"}
+
+# The aggregate's primary key cannot hold NULLs, so these stand in for them
+NO_CATEGORY = ""
+NO_UPLOADER = 0
+
+
+def deltas_for(name: str, rows, sign: int = 1) -> Counter:
+    """Count changes for inserting (sign=1) or deleting (sign=-1) rows of a media table."""
+    deltas = Counter()
+    for row in rows:
+        key = (MEDIA_TYPES[name], row.get("category") or NO_CATEGORY, row.get("uploaded_by") or NO_UPLOADER)
+        deltas[key] += sign
+    return deltas
+
+
+async def apply(deltas: Counter):
+    """
+    Adds count deltas to media_facets with a single upsert.
+    Call it inside the transaction of the write it accounts for, so the
+    aggregate commits (or rolls back) together with the rows.
+    """
+    rows = [
+        {"media_type": media_type, "category": category, "uploaded_by": uploaded_by, "count": delta}
+        for (media_type, category, uploaded_by), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    if database.url.dialect == "mysql":
+        query = mysql.insert(media_facets).values(rows)
+        query = query.on_duplicate_key_update(count=media_facets.c.count + query.inserted["count"])
+    else:
+        query = sqlite.insert(media_facets).values(rows)
+        query = query.on_conflict_do_update(
+            index_elements=["media_type", "category", "uploaded_by"],
+            set_={"count": media_facets.c.count + query.excluded["count"]},
+        )
+    await database.execute(query)
+
+
+def _filtered(media_type: str, category: str = None, uploaded_by: int = None):
+    query = select(media_facets).where(media_facets.c.media_type == media_type, media_facets.c.count > 0)
+    if category is not None:
+        query = query.where(media_facets.c.category == category)
+    if uploaded_by is not None:
+        query = query.where(media_facets.c.uploaded_by == uploaded_by)
+    return query
+
+
+async def count(name: str, category: str = None, uploaded_by: int = None) -> int:
+    """Rows of a media table matching the listing filters, read from the aggregate."""
+    query = _filtered(MEDIA_TYPES[name], category, uploaded_by).with_only_columns(func.coalesce(func.sum(media_facets.c.count), 0))
+    return int(await replicas.fetch_val(query))
+
+
+async def summary(name: str, category: str = None, uploaded_by: int = None) -> dict:
+    """Total plus per-category and per-uploader counts, most common first."""
+    categories, uploaders = Counter(), Counter()
+    for row in await replicas.fetch_all(_filtered(MEDIA_TYPES[name], category, uploaded_by)):
+        categories[row["category"] or None] += row["count"]
+        uploaders[row["uploaded_by"] or None] += row["count"]
+    return {
+        "total": sum(categories.values()),
+        "categories": [{"value": value, "count": n} for value, n in categories.most_common()],
+        "uploaders": [{"value": value, "count": n} for value, n in uploaders.most_common()],
+    }
+
+
+async def rebuild():
+    """Recomputes the whole aggregate with GROUP BY; for first start-up and drift repair."""
+    async with database.transaction():
+        await database.execute(media_facets.delete())
+        deltas = Counter()
+        for name, table in TABLES.items():
+            query = select(table.c.category, table.c.uploaded_by, func.count().label("n")).group_by(table.c.category, table.c.uploaded_by)
+            for row in await database.fetch_all(query):
+                deltas[(MEDIA_TYPES[name], row["category"] or NO_CATEGORY, row["uploaded_by"] or NO_UPLOADER)] += row["n"]
+        await apply(deltas)
+    return sum(deltas.values())
+
+
+async def ensure_built():
+    """Builds the aggregate if it has never been populated (e.g. right after deploying it)."""
+    if await database.fetch_val(select(func.count()).select_from(media_facets)):
+        return
+    rows = await rebuild()
+    logger.info("Built media facets from %d rows", rows)
@@ -0,0 +1,137 @@
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
+from functools import lru_cache
+import codecs, csv, io, itertools, os
+
+from crud import insert_videos
+
+REQUIRED_COLUMNS = {"file_name", "video_url", "title", "description", "category", "uploaded_by", "created_at"}
+DATE_FORMATS = ("%d-%m-%Y %H:%M", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S")
+CSV_INGEST_BATCH_SIZE = int(os.getenv("CSV_INGEST_BATCH_SIZE", "1000"))
+MAX_REPORTED_REJECTIONS = 100  # ✅ Rejections are all counted, but only this many are listed
+
+
+def _latin1_fallback(error):
+    """Decodes bytes that aren't valid UTF-8 as Latin-1 instead of failing the upload."""
+    return error.object[error.start:error.end].decode("latin1"), error.end
+
+codecs.register_error("latin1_fallback", _latin1_fallback)
+
+
+@lru_cache(maxsize=4096)
+def parse_datetime(date_str: str) -> datetime:
+    """Try to parse date in multiple formats"""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str.strip(), fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date format: {date_str!r}")
+
+
+def normalise_row(record: dict) -> dict:
+    """Validates one CSV record and maps it to a `videos` row."""
+    if None in record:
+        raise ValueError("Too many fields")
+    for column in ("file_name", "video_url"):
+        if not (record.get(column) or "").strip():
+            raise ValueError(f"Missing value for {column}")
+
+    uploaded_by = (record.get("uploaded_by") or "").strip()
+    if uploaded_by and not uploaded_by.isdigit():
+        raise ValueError(f"Invalid uploaded_by: {uploaded_by!r}")
+
+    return {
+        "file_name": record["file_name"].strip(),
+        "video_url": record["video_url"].strip(),
+        "title": record.get("title") or None,
+        "description": record.get("description") or None,
+        "category": record.get("category") or None,
+        "uploaded_by": int(uploaded_by) if uploaded_by else None,
+        "created_at": parse_datetime(record.get("created_at") or ""),
+    }
+
+
+def _read_batch(reader, size: int):
+    return list(itertools.islice(reader, size))
+
+
+async def ingest_csv(binary, batch_size: int = CSV_INGEST_BATCH_SIZE, progress=None, resume: dict = None, checkpoint=None) -> dict:
+    """
+    Streams a binary CSV file of videos into the database.
+    The file is parsed incrementally (reads run in the threadpool) and inserted
+    `batch_size` rows at a time, so memory stays flat regardless of file size.
+    Invalid rows are skipped and reported with their reason; a bad header or
+    malformed CSV raises ValueError. `progress`, if given, is awaited after
+    every batch with the fraction of the file consumed so far.
+
+    `checkpoint`, if given, is awaited with the report so far (plus
+    `rows_read`) inside the transaction that commits each batch. Passing the
+    last one back as `resume` skips the rows it covers, so an interrupted
+    import carries on without inserting anything twice.
+    """
+    total_size = 0
+    if progress:
+        total_size = binary.seek(0, io.SEEK_END)
+        binary.seek(0)
+    stream = io.TextIOWrapper(binary, encoding="utf-8-sig", errors="latin1_fallback", newline="")
+    reader = csv.DictReader(stream)
+    resume = resume or {}
+    accepted, rejected = resume.get("rows_accepted", 0), resume.get("rows_rejected", 0)
+    rejections = list(resume.get("rejections", []))
+    row_number = 0
+
+    def reject(number, reason):
+        nonlocal rejected
+        rejected += 1
+        if len(rejections) < MAX_REPORTED_REJECTIONS:
+            rejections.append({"row": number, "reason": reason})
+
+    def report() -> dict:
+        return {"rows_accepted": accepted, "rows_rejected": rejected, "rejections": rejections}
+
+    try:
+        # ✅ Check the header before touching any data
+        columns = await run_in_threadpool(lambda: reader.fieldnames)
+        if not columns:
+            raise ValueError("Uploaded file is empty")
+        missing = REQUIRED_COLUMNS - set(columns)
+        if missing:
+            raise ValueError(f"Missing required columns: {sorted(missing)}")
+
+        if resume.get("rows_read"):
+            row_number = await run_in_threadpool(lambda: sum(1 for _ in itertools.islice(reader, resume["rows_read"])))
+
+        while batch := await run_in_threadpool(_read_batch, reader, batch_size):
+            rows = []
+            for record in batch:
+                row_number += 1
+                try:
+                    rows.append((row_number, normalise_row(record)))
+                except ValueError as ve:
+                    reject(row_number, str(ve))
+
+            async def save(inserted, failures):
+                state = {**report(), "rows_accepted": accepted + inserted, "rows_read": row_number}
+                state["rows_rejected"] += len(failures)
+                state["rejections"] = (rejections + [{"row": number, "reason": reason} for number, reason in failures])[:MAX_REPORTED_REJECTIONS]
+                await checkpoint(state)
+
+            if rows:
+                inserted, failures = await insert_videos(rows, save if checkpoint else None)
+                accepted += inserted
+                for number, reason in failures:
+                    reject(number, reason)
+            elif checkpoint:
+                await save(0, [])
+
+            if progress and total_size:
+                await progress(min(binary.tell() / total_size, 1.0))
+
+    except csv.Error as e:
+        raise ValueError(f"Malformed CSV near row {row_number + 1}: {e}")
+
+    finally:
+        stream.detach()  # ✅ Leave closing the file to the caller
+
+    return report()
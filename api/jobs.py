@@ -0,0 +1,326 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import or_
+
+from database import database
+from models import jobs
+from crud import update_media_order
+from ingest import ingest_csv, CSV_INGEST_BATCH_SIZE
+from schemas import MediaOrderSchema
+from derivatives import derivative_cache
+import facets
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ✅ Job engine settings
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOBS_DIR = os.getenv("JOBS_DIR", "job_files")  # ✅ Uploaded files kept until their job finishes
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))  # ✅ A running job whose owner stops renewing is re-queued after this
+
+UNFINISHED = ("queued", "running")
+
+
+class JobContext:
+    """Handed to job handlers so they can report progress and save a resume point."""
+
+    def __init__(self, manager, job_id: int, saved=None):
+        self.manager = manager
+        self.job_id = job_id
+        self.saved = saved  # ✅ The last save() of an earlier, interrupted run, or None
+
+    async def set_progress(self, fraction: float):
+        await self.manager._update(self.job_id, progress=round(fraction, 4))
+
+    async def save(self, state: dict):
+        """Stores `state` as the job's partial result; a re-queued run gets it back as `saved`."""
+        await self.manager._update(self.job_id, result=json.dumps(state, default=str))
+
+
+class JobManager:
+    """
+    Small asyncio job engine: a queue of job ids drained by a bounded pool of
+    worker tasks, with every job's state persisted in the `jobs` table.
+
+    Several processes can share the table. A worker claims a queued job with
+    a conditional UPDATE, so each job runs once, and holds it under a lease
+    it renews every JOB_LEASE_SECONDS / 3. Jobs whose owner stopped renewing
+    (it crashed) are re-queued by whichever process sweeps next; a process
+    shutting down cleanly hands its running jobs back at once. Cancelling a
+    job running in another process marks it in the table, and its owner
+    stops it at its next renewal.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.owner = uuid.uuid4().hex  # ✅ This process, in jobs.owner
+        self.handlers = {}
+        self.cleanups = {}
+        self.queue = asyncio.Queue()
+        self._queued = set()  # ✅ Ids in self.queue, so sweeps do not add them twice
+        self._worker_tasks = []
+        self._lease_task = None
+        self._running = {}  # job id -> handler task (None while it is being claimed)
+        self._cancel_requested = set()
+        self._abandoned = set()  # ✅ Lost the lease: stop without touching the row
+
+    def register(self, kind: str, cleanup=None):
+        """
+        Decorator registering `async def handler(ctx, payload) -> result` for a
+        job kind. `cleanup(payload)`, if given, runs when the job is cancelled.
+        """
+        def decorator(handler):
+            self.handlers[kind] = handler
+            if cleanup is not None:
+                self.cleanups[kind] = cleanup
+            return handler
+        return decorator
+
+    async def start(self):
+        await self._sweep()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._lease_task = asyncio.create_task(self._lease_loop())
+
+    async def stop(self):
+        tasks = self._worker_tasks + ([self._lease_task] if self._lease_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks, self._lease_task = [], None
+        # ✅ Hand interrupted jobs back now rather than when their lease runs out
+        await database.execute(
+            jobs.update().where(jobs.c.owner == self.owner, jobs.c.status == "running")
+            .values(status="queued", owner=None, lease_until=None, started_at=None)
+        )
+
+    def _enqueue(self, job_id: int):
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self.queue.put_nowait(job_id)
+
+    async def submit(self, kind: str, payload: dict, submitted_by: int = None) -> int:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = await database.execute(jobs.insert().values(
+            kind=kind, status="queued", progress=0.0, payload=json.dumps(payload), submitted_by=submitted_by,
+        ))
+        self._enqueue(job_id)
+        return job_id
+
+    async def get(self, job_id: int):
+        job = await database.fetch_one(jobs.select().where(jobs.c.id == job_id))
+        if job is None:
+            return None
+        job = dict(job)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    async def cancel(self, job_id: int) -> bool:
+        """Cancels a queued or running job; returns False if it had already finished."""
+        job = await self.get(job_id)
+        if job is None or job["status"] not in UNFINISHED:
+            return False
+        if job_id in self._running:
+            self._cancel_requested.add(job_id)
+            task = self._running[job_id]
+            if task is not None:
+                task.cancel()  # ✅ Otherwise _run cancels it as soon as it is registered
+            return True
+
+        # ✅ Queued, or running in another process (its owner sees this at its next renewal)
+        await database.execute(
+            jobs.update().where(jobs.c.id == job_id, jobs.c.status.in_(UNFINISHED))
+            .values(status="cancelled", finished_at=datetime.utcnow())
+        )
+        job = await self.get(job_id)
+        if job["status"] != "cancelled":
+            return False
+        await self._cleanup(job)
+        return True
+
+    async def _cleanup(self, job):
+        cleanup = self.cleanups.get(job["kind"])
+        if cleanup is None:
+            return
+        try:
+            await cleanup(json.loads(job["payload"] or "{}"))
+        except Exception as e:
+            logger.warning("Cleanup of cancelled job %s failed: %s", job["id"], e)
+
+    async def _update(self, job_id: int, **values):
+        await database.execute(jobs.update().where(jobs.c.id == job_id).values(**values))
+
+    async def _finish(self, job_id: int, status: str, result=None, error: str = None, **values):
+        self._cancel_requested.discard(job_id)
+        # ✅ Only while this process still holds the job: a cancel from elsewhere wins
+        await database.execute(
+            jobs.update().where(jobs.c.id == job_id, jobs.c.owner == self.owner, jobs.c.status == "running").values(
+                status=status, error=error, finished_at=datetime.utcnow(), owner=None, lease_until=None,
+                result=json.dumps(result, default=str) if result is not None else None, **values,
+            )
+        )
+
+    async def _claim(self, job_id: int):
+        """The job row if this process won it (queued -> running), else None."""
+        async with database.transaction():
+            await database.execute(
+                jobs.update().where(jobs.c.id == job_id, jobs.c.status == "queued").values(
+                    status="running", owner=self.owner, started_at=datetime.utcnow(),
+                    lease_until=datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS),
+                )
+            )
+            job = await database.fetch_one(jobs.select().where(jobs.c.id == job_id))
+        if job is None or job["status"] != "running" or job["owner"] != self.owner:
+            return None
+        return job
+
+    async def _sweep(self):
+        """Re-queues running jobs whose lease ran out and queues every unclaimed job."""
+        now = datetime.utcnow()
+        expired = await database.fetch_all(jobs.select().where(
+            jobs.c.status == "running", or_(jobs.c.lease_until.is_(None), jobs.c.lease_until < now),
+        ))
+        for job in expired:
+            await database.execute(
+                jobs.update().where(jobs.c.id == job["id"], jobs.c.status == "running", jobs.c.owner == job["owner"])
+                .values(status="queued", owner=None, lease_until=None, started_at=None)
+            )
+            logger.info("Re-queued job %s (%s): its owner stopped renewing the lease", job["id"], job["kind"])
+
+        queued = await database.fetch_all(jobs.select().where(jobs.c.status == "queued").order_by(jobs.c.id))
+        for job in queued:
+            self._enqueue(job["id"])
+
+    async def _renew(self):
+        """Extends the leases of this process's jobs and stops those cancelled or taken over."""
+        ids = [job_id for job_id, task in self._running.items() if task is not None]
+        if ids:
+            await database.execute(
+                jobs.update().where(jobs.c.id.in_(ids), jobs.c.owner == self.owner, jobs.c.status == "running")
+                .values(lease_until=datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS))
+            )
+            rows = await database.fetch_all(jobs.select().where(jobs.c.id.in_(ids)))
+            for job in rows:
+                task = self._running.get(job["id"])
+                if task is None or (job["status"] == "running" and job["owner"] == self.owner):
+                    continue
+                if job["status"] == "cancelled":
+                    self._cancel_requested.add(job["id"])
+                else:
+                    self._abandoned.add(job["id"])
+                    logger.warning("Job %s was taken over by another process; stopping it here", job["id"])
+                task.cancel()
+
+    async def _lease_loop(self):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await self._renew()
+                await self._sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Job lease renewal failed: %s", e)
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job %s crashed the worker: %s", job_id, e)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: int):
+        self._running[job_id] = None  # ✅ A cancel() from now on is handled here
+        try:
+            job = await self._claim(job_id)
+            if job is None:
+                if job_id in self._cancel_requested:  # ✅ Another process won it meanwhile: cancel it there
+                    self._cancel_requested.discard(job_id)
+                    self._running.pop(job_id, None)
+                    await self.cancel(job_id)
+                return  # ✅ Cancelled, finished or claimed elsewhere while waiting in the queue
+
+            handler = self.handlers[job["kind"]]
+            saved = json.loads(job["result"]) if job["result"] else None
+            task = asyncio.create_task(handler(JobContext(self, job_id, saved), json.loads(job["payload"] or "{}")))
+            self._running[job_id] = task
+            if job_id in self._cancel_requested:
+                task.cancel()  # ✅ cancel() landed while the job was being claimed
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if job_id in self._abandoned:
+                    return
+                if job_id not in self._cancel_requested:
+                    raise  # ✅ Shutting down: stop() hands the job back to the queue
+                await self._finish(job_id, "cancelled")
+                await self._cleanup(job)
+            except Exception as e:
+                logger.error("Job %s (%s) failed: %s", job_id, job["kind"], e)
+                await self._finish(job_id, "failed", error=str(e))
+            else:
+                await self._finish(job_id, "succeeded", result=result, progress=1.0)
+        finally:
+            self._running.pop(job_id, None)
+            self._abandoned.discard(job_id)
+
+
+job_manager = JobManager()
+
+
+# ✅ Built-in job kinds
+async def _remove_csv(payload: dict):
+    if os.path.exists(payload["path"]):
+        os.remove(payload["path"])
+
+
+@job_manager.register("csv_import", cleanup=_remove_csv)
+async def _csv_import(ctx: JobContext, payload: dict):
+    path = payload["path"]
+    try:
+        with open(path, "rb") as binary:
+            # ✅ Each batch commits with its checkpoint, so a re-queued import resumes after it
+            report = await ingest_csv(
+                binary, payload.get("batch_size", CSV_INGEST_BATCH_SIZE), ctx.set_progress,
+                resume=ctx.saved, checkpoint=ctx.save,
+            )
+    except asyncio.CancelledError:
+        raise  # ✅ Keep the file: after a shutdown the job is re-queued (a user cancel removes it)
+    except Exception:
+        os.remove(path)
+        raise
+    os.remove(path)
+    return report
+
+
+@job_manager.register("reorder")
+async def _reorder(ctx: JobContext, payload: dict):
+    order = MediaOrderSchema.model_validate(payload)
+    await update_media_order(order.items)
+    return {"items": len(order.items)}
+
+
+@job_manager.register("rebuild_facets")
+async def _rebuild_facets(ctx: JobContext, payload: dict):
+    return {"rows": await facets.rebuild()}
+
+
+@job_manager.register("derivatives")
+async def _derivatives(ctx: JobContext, payload: dict):
+    names = payload.get("types") or ["images", "videos"]
+    if not set(names) <= {"images", "videos"}:
+        raise ValueError(f"Unknown media types: {names}")
+    return await derivative_cache.backfill(names, ctx.set_progress)
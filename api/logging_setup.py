@@ -0,0 +1,174 @@
+import atexit
+import copy
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from dotenv import load_dotenv
+
+from metrics import registry, Counter, Gauge
+
+load_dotenv()
+
+
+def _mapping(raw: str) -> dict:
+    """Parses "logger=value,other.logger=value" settings."""
+    pairs = (item.split("=", 1) for item in raw.split(",") if "=" in item)
+    return {name.strip(): value.strip() for name, value in pairs}
+
+
+# ✅ Logging settings
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_LEVELS = _mapping(os.getenv("LOG_LEVELS", ""))  # e.g. routes.mfa=WARNING
+LOG_SAMPLE_RATES = {k: float(v) for k, v in _mapping(os.getenv("LOG_SAMPLE_RATES", "")).items()}  # e.g. uvicorn.access=0.01
+LOG_RATE_LIMITS = {k: float(v) for k, v in _mapping(os.getenv("LOG_RATE_LIMITS", "")).items()}  # records/s, e.g. routes.mfa=20
+
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+log_records_dropped = registry.register(Counter(
+    "log_records_dropped_total", "Log records dropped before reaching the writer, by reason.", ("reason",),
+))
+
+
+class _PerLogger:
+    """Resolves a per-logger setting through the logger hierarchy ("a.b" falls back to "a")."""
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self._resolved = {}
+
+    def get(self, name: str):
+        if name not in self._resolved:
+            lookup = name
+            while lookup and lookup not in self.settings:
+                lookup = lookup.rpartition(".")[0]
+            self._resolved[name] = self.settings.get(lookup)
+        return self._resolved[name]
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a configured fraction of each logger's records below WARNING."""
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = _PerLogger(rates)
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None or rate >= 1 or random.random() < rate:
+            return True
+        log_records_dropped.inc("sampled")
+        return False
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logger for records below ERROR. The first record let
+    through after a burst says how many were suppressed.
+    """
+
+    def __init__(self, limits: dict):
+        super().__init__()
+        self.limits = _PerLogger(limits)
+        self._buckets = {}  # logger name -> [tokens, last refill, suppressed]
+
+    def filter(self, record) -> bool:
+        rate = self.limits.get(record.name)
+        if rate is None or record.levelno >= logging.ERROR:
+            return True
+
+        now = time.monotonic()
+        bucket = self._buckets.setdefault(record.name, [rate, now, 0])
+        bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            log_records_dropped.inc("rate_limited")
+            return False
+
+        bucket[0] -= 1
+        if bucket[2]:
+            record.msg = f"[{bucket[2]} similar records suppressed] {record.msg}"
+            bucket[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread, which applies LOG_FORMAT off the
+    event loop. The message is merged with its args (and a traceback
+    rendered) here, like the stdlib QueueHandler does, so mutable args are
+    logged as they were at the call site. A full queue drops the record
+    instead of blocking the caller.
+    """
+
+    _formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)  # ✅ Other handlers of the same logger still get the original
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._formatter.formatException(record.exc_info)
+            record.exc_info = None  # ✅ Traceback objects pin every frame's locals
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc("queue_full")
+
+
+_listener = None
+_queue = None
+
+
+def configure_logging():
+    """Routes the root and uvicorn loggers through one queue drained by a background writer."""
+    global _listener, _queue
+    if _listener is not None:
+        return
+
+    _queue = queue.Queue(LOG_QUEUE_SIZE)
+    writer = logging.StreamHandler()
+    writer.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    handler = NonBlockingQueueHandler(_queue)
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+    handler.addFilter(RateLimitFilter(LOG_RATE_LIMITS))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    # ✅ Level checks happen before a record is even built, so they are the cheapest filter
+    for name, level in LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+    # ✅ uvicorn installs its own synchronous stream handlers before importing the app
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        if uvicorn_logger.handlers:
+            uvicorn_logger.handlers = [handler]
+
+    _listener = QueueListener(_queue, writer, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Writes out whatever is still queued and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+registry.register(Gauge("log_queue_depth", "Log records waiting for the writer thread.",
+                        callback=lambda: {(): _queue.qsize() if _queue is not None else 0}))
@@ -3,17 +3,28 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from database import database, metadata, engine
+from database import database, replicas, warm_up_pool, ReadYourWritesMiddleware
+from jobs import job_manager
+from qr import qr_renderer
+from derivatives import derivative_cache
+from search import media_search
+from changefeed import changefeed
+from storage import storage
+from responses import FastJSONResponse
+from metrics import MetricsMiddleware
+from logging_setup import configure_logging
+import facets
+import migrations
 import routes.media
 import routes.admin
 import routes.loaddata
 import routes.mfa
+import routes.jobs
+import routes.uploads
+import routes.metrics
 
-# ✅ Global Logging Configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s"
-)
+# ✅ Global Logging Configuration (queued; a background thread does the writing)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # ✅ API Metadata
@@ -22,11 +33,9 @@ app = FastAPI(
     description="APIs for managing video uploads, authentication, and data handling",
     version="1.0.0",
     contact={"name": "Your Name", "email": "your@email.com"},
+    default_response_class=FastJSONResponse,  # ✅ orjson for every route
 )
 
-# ✅ Create Database Tables
-metadata.create_all(engine)
-
 # ✅ CORS Middleware (Fixes React API request issue)
 app.add_middleware(
     CORSMiddleware,
@@ -34,12 +43,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # ✅ Lets the React client read ETags for conditional requests
 )
 
+# ✅ Carries the read-your-writes window to a client's next requests (no-op without replicas)
+app.add_middleware(ReadYourWritesMiddleware)
+
+# ✅ Per-route metrics (added last so it wraps everything, CORS included)
+app.add_middleware(MetricsMiddleware)
+
 # ✅ Global Exception Logging
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"⚠️ Unexpected error: {exc}")
+    logger.error("⚠️ Unexpected error: %s", exc)
     return JSONResponse(
         status_code=500,
         content={"detail": "An unexpected error occurred. Please try again later."},
@@ -50,17 +66,39 @@ async def global_exception_handler(request: Request, exc: Exception):
 async def startup():
     await database.connect()
     logger.info("✅ Database Connected Successfully")
+    # ✅ The schema is managed by `python -m migrations`, never at import or startup
+    pending = await migrations.pending(database)
+    if pending:
+        raise RuntimeError(f"{len(pending)} schema migration(s) pending ({', '.join(pending)}); run `python -m migrations` first")
+    warmed = await warm_up_pool()
+    if warmed:
+        logger.info("✅ Warmed up %d pooled connections", warmed)
+    await replicas.connect()
+    await facets.ensure_built()
+    await storage.purge_expired()
+    await changefeed.start()
+    await job_manager.start()
+    await media_search.start()
 
 @app.on_event("shutdown")
 async def shutdown():
+    await media_search.stop()
+    await job_manager.stop()
+    await changefeed.stop()
+    qr_renderer.shutdown()
+    derivative_cache.shutdown()
+    await replicas.disconnect()
     await database.disconnect()
     logger.info("❌ Database Disconnected")
 
 # ✅ Include All API Routers
 app.include_router(routes.media.router, prefix="/api")
 app.include_router(routes.admin.router, prefix="/api")
-# app.include_router(routes.loaddata.router, prefix="/api")
+app.include_router(routes.loaddata.router, prefix="/api")
 app.include_router(routes.mfa.router, prefix="/api")
+app.include_router(routes.jobs.router, prefix="/api")
+app.include_router(routes.uploads.router, prefix="/api")
+app.include_router(routes.metrics.router)  # ✅ /metrics, where Prometheus expects it
 
 
 
@@ -0,0 +1,192 @@
+import bisect
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+from starlette.routing import Match
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ✅ Metrics settings
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_MAX_SQL = 500  # ✅ Characters of statement shape kept in the slow-query log
+ROUTE_CACHE_MAX_ENTRIES = 4096
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.type = "counter"
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Counter):
+    """Gauge set directly, or read from `callback() -> {labels tuple: value}` at scrape time."""
+
+    def __init__(self, name: str, help: str, labelnames=(), callback=None):
+        super().__init__(name, help, labelnames)
+        self.type = "gauge"
+        self.callback = callback
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self):
+        values = self.callback() if self.callback is not None else self._values
+        for labels, value in values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        names = self.labelnames + ("le",)
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ✅ HTTP
+http_requests = registry.register(Counter(
+    "http_requests_total", "Requests handled, by route template and status.", ("method", "route", "status"),
+))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency, by route template.", ("method", "route"),
+))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled, by route template.", ("method", "route"),
+))
+
+# ✅ Database (fed by database.InstrumentedDatabase and the sync engine's events)
+db_statement_latency = registry.register(Histogram(
+    "db_statement_duration_seconds", "Statement execution time, by operation and table.", ("statement",),
+))
+db_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent acquiring a pooled connection.",
+))
+db_slow_statements = registry.register(Counter(
+    "db_slow_statements_total", "Statements slower than SLOW_QUERY_MS, by operation and table.", ("statement",),
+))
+
+
+def observe_statement(label: str, duration: float, wait: float = None, shape=None):
+    """
+    Records one statement; `wait` is the pool checkout time when the statement
+    had to acquire a connection. `shape()` renders its SQL only when it is slow.
+    """
+    db_statement_latency.observe(duration, label)
+    if wait is not None:
+        db_checkout_wait.observe(wait)
+    if duration * 1000 >= SLOW_QUERY_MS:
+        db_slow_statements.inc(label)
+        sql = " ".join(shape().split())[:SLOW_QUERY_MAX_SQL] if shape is not None else label
+        waited = f", waited {wait * 1000:.1f} ms for a connection" if wait else ""
+        logger.warning("Slow query (%.1f ms%s): %s", duration * 1000, waited, sql)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body buffering) recording
+    per-route counts, latency and in-flight requests. Routes are labelled by
+    their path template so /mfa/generate/{username} stays one series;
+    unmatched paths share the "unmatched" label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = {}  # (method, path) -> route template
+
+    def _route(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        template = self._routes.get(key)
+        if template is None:
+            template = "unmatched"
+            for route in scope["app"].router.routes:
+                match, _ = route.matches(scope)
+                if match != Match.NONE:
+                    template = getattr(route, "path", "unmatched")
+                    if match == Match.FULL:
+                        break
+            if len(self._routes) >= ROUTE_CACHE_MAX_ENTRIES:
+                self._routes.clear()
+            self._routes[key] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method, route = scope["method"], self._route(scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(method, route)
+            http_latency.observe(time.perf_counter() - started, method, route)
+            http_requests.inc(method, route, status)
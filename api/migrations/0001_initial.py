@@ -0,0 +1,111 @@
+"""
+Baseline schema: admin_users, jobs, images, videos and media_facets.
+
+The tables are a frozen copy of models.py at the time, so later model
+changes need migrations of their own. Databases created by the old
+create_all-at-startup are adopted: existing tables are kept, and the
+columns and indexes added to them since they were created (such as
+order_position) are added.
+"""
+from sqlalchemy import (
+    Table, Column, Integer, String, ForeignKey, Boolean, TIMESTAMP, DateTime, Float, Enum, Text, Index,
+    MetaData, PrimaryKeyConstraint, inspect, text,
+)
+from sqlalchemy.schema import CreateColumn
+
+metadata = MetaData()
+
+Table(
+    "admin_users", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("username", String(50), unique=True, nullable=False),
+    Column("password_hash", String(255), nullable=False),
+    Column("email", String(100), unique=True, nullable=False),
+    Column("role", Enum("superadmin", "editor", "moderator"), server_default=text("'editor'")),
+    Column("mfa_secret", String(255), nullable=True),
+    Column("mfa_enabled", Boolean, server_default=text("0"), nullable=False),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
+)
+
+Table(
+    "jobs", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("kind", String(50), nullable=False),
+    Column("status", Enum("queued", "running", "succeeded", "failed", "cancelled"), server_default=text("'queued'"), nullable=False),
+    Column("progress", Float, server_default=text("0"), nullable=False),
+    Column("payload", Text, nullable=True),
+    Column("result", Text, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("submitted_by", Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
+    Column("started_at", DateTime, nullable=True),
+    Column("finished_at", DateTime, nullable=True),
+    Index("ix_jobs_status_id", "status", "id"),
+)
+
+Table(
+    "images", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("file_name", String(255), nullable=False),
+    Column("image_url", String(255), nullable=False),
+    Column("alt_text", String(255), nullable=True),
+    Column("category", String(100), nullable=True),
+    Column("uploaded_by", Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True),
+    Column("order_position", Integer, server_default=text("0"), nullable=False),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")),
+    Index("ix_images_order_position_id", "order_position", "id"),
+    Index("ix_images_created_at_id", "created_at", "id"),
+    Index("ix_images_category_order_position_id", "category", "order_position", "id"),
+    Index("ix_images_category_created_at_id", "category", "created_at", "id"),
+    Index("ix_images_uploaded_by_order_position_id", "uploaded_by", "order_position", "id"),
+    Index("ix_images_uploaded_by_created_at_id", "uploaded_by", "created_at", "id"),
+    Index("ft_images_alt_text", "alt_text", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+)
+
+Table(
+    "videos", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("file_name", String(255), nullable=False),
+    Column("video_url", String(255), nullable=False),
+    Column("title", String(255), nullable=True),
+    Column("description", Text, nullable=True),
+    Column("category", String(100), nullable=True),
+    Column("uploaded_by", Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True),
+    Column("order_position", Integer, server_default=text("0"), nullable=False),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")),
+    Index("ix_videos_order_position_id", "order_position", "id"),
+    Index("ix_videos_created_at_id", "created_at", "id"),
+    Index("ix_videos_category_order_position_id", "category", "order_position", "id"),
+    Index("ix_videos_category_created_at_id", "category", "created_at", "id"),
+    Index("ix_videos_uploaded_by_order_position_id", "uploaded_by", "order_position", "id"),
+    Index("ix_videos_uploaded_by_created_at_id", "uploaded_by", "created_at", "id"),
+    Index("ft_videos_text", "title", "description", "category", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+)
+
+Table(
+    "media_facets", metadata,
+    Column("media_type", Enum("video", "image"), nullable=False),
+    Column("category", String(100), server_default=text("''"), nullable=False),
+    Column("uploaded_by", Integer, server_default=text("0"), nullable=False),
+    Column("count", Integer, server_default=text("0"), nullable=False),
+    PrimaryKeyConstraint("media_type", "category", "uploaded_by"),
+)
+
+
+def upgrade(connection):
+    existing = set(inspect(connection).get_table_names())
+    metadata.create_all(connection)  # ✅ checkfirst: existing tables are left alone
+
+    inspector = inspect(connection)
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in present:  # ✅ Before the indexes: they may cover it
+                ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        indexed = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexed:
+                index.create(connection)  # ✅ Honours ddl_if, so FULLTEXT stays MySQL-only
@@ -0,0 +1,43 @@
+"""
+Resumable uploads: the uploads and upload_chunks tables (see storage.py).
+"""
+from sqlalchemy import (
+    Table, Column, Integer, BigInteger, String, ForeignKey, TIMESTAMP, DateTime, Enum, Text, Index,
+    MetaData, PrimaryKeyConstraint, text,
+)
+
+metadata = MetaData()
+
+Table("admin_users", metadata, Column("id", Integer, primary_key=True))  # ✅ Foreign key target only, never created here
+
+uploads = Table(
+    "uploads", metadata,
+    Column("id", String(32), primary_key=True),
+    Column("media_type", Enum("video", "image"), nullable=False),
+    Column("file_name", String(255), nullable=False),
+    Column("stored_name", String(64), nullable=False),
+    Column("size", BigInteger, nullable=False),
+    Column("chunk_size", Integer, nullable=False),
+    Column("sha256", String(64), nullable=True),
+    Column("details", Text, nullable=True),
+    Column("status", Enum("uploading", "completing", "completed"), server_default=text("'uploading'"), nullable=False),
+    Column("media_id", Integer, nullable=True),
+    Column("created_by", Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
+    Column("expires_at", DateTime, nullable=False),
+    Index("ix_uploads_status_expires_at", "status", "expires_at"),
+)
+
+upload_chunks = Table(
+    "upload_chunks", metadata,
+    Column("upload_id", String(32), ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False),
+    Column("chunk_index", Integer, nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("sha256", String(64), nullable=False),
+    PrimaryKeyConstraint("upload_id", "chunk_index"),
+)
+
+
+def upgrade(connection):
+    uploads.create(connection, checkfirst=True)
+    upload_chunks.create(connection, checkfirst=True)
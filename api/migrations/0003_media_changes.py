@@ -0,0 +1,22 @@
+"""
+Change feed: the media_changes log (see changefeed.py).
+"""
+from sqlalchemy import Table, Column, Integer, TIMESTAMP, Enum, Index, MetaData, text
+
+metadata = MetaData()
+
+media_changes = Table(
+    "media_changes", metadata,
+    Column("seq", Integer, primary_key=True, autoincrement=True),
+    Column("op", Enum("create", "update", "delete", "reorder", "refresh"), nullable=False),
+    Column("media_type", Enum("video", "image"), nullable=False),
+    Column("media_id", Integer, nullable=True),
+    Column("order_position", Integer, nullable=True),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
+    Index("ix_media_changes_created_at", "created_at"),
+    sqlite_autoincrement=True,  # ✅ seq must never be reused once retention empties the log
+)
+
+
+def upgrade(connection):
+    media_changes.create(connection, checkfirst=True)
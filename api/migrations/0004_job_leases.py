@@ -0,0 +1,19 @@
+"""
+Job leases: jobs.owner and jobs.lease_until (see JobManager in jobs.py).
+"""
+from sqlalchemy import Table, Column, String, DateTime, MetaData, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+jobs = Table(
+    "jobs", MetaData(),
+    Column("owner", String(32), nullable=True),
+    Column("lease_until", DateTime, nullable=True),
+)
+
+
+def upgrade(connection):
+    present = {column["name"] for column in inspect(connection).get_columns("jobs")}
+    for column in jobs.columns:
+        if column.name not in present:  # ✅ Re-runnable after a partial MySQL upgrade
+            ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE jobs ADD COLUMN {ddl}"))
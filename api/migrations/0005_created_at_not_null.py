@@ -0,0 +1,17 @@
+"""
+videos.created_at and images.created_at: NOT NULL, without ON UPDATE.
+
+They are the created_at sort key (pagination.py). ON UPDATE CURRENT_TIMESTAMP
+moved rows whenever they were edited, and NULLs fell out of keyset seeks.
+NULLs are backfilled with the current time. SQLite cannot alter a column's
+constraints in place (and never had ON UPDATE), so there only the backfill
+runs.
+"""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    for table in ("videos", "images"):
+        connection.execute(text(f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"))
+        if connection.dialect.name == "mysql":
+            connection.execute(text(f"ALTER TABLE {table} MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP"))
@@ -0,0 +1,19 @@
+"""
+upload_chunks.started_at and claim: mark chunks a PUT is still writing, and which PUT (see LocalStorage in storage.py).
+"""
+from sqlalchemy import Table, Column, DateTime, MetaData, String, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+upload_chunks = Table(
+    "upload_chunks", MetaData(),
+    Column("started_at", DateTime, nullable=True),
+    Column("claim", String(32), nullable=True),
+)
+
+
+def upgrade(connection):
+    present = {column["name"] for column in inspect(connection).get_columns("upload_chunks")}
+    for column in upload_chunks.columns:
+        if column.name not in present:
+            ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE upload_chunks ADD COLUMN {ddl}"))
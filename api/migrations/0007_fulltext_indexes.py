@@ -0,0 +1,22 @@
+"""
+FULLTEXT indexes for /media/search on MySQL: ft_videos_text and ft_images_alt_text.
+
+models.py only emits them when create_all builds a table, so databases created
+before search existed ran MATCH ... AGAINST without an index, which MySQL
+refuses. Other dialects use the in-process index and get nothing here.
+"""
+from sqlalchemy import inspect, text
+
+FULLTEXT_INDEXES = {
+    "videos": ("ft_videos_text", ("title", "description", "category")),
+    "images": ("ft_images_alt_text", ("alt_text",)),
+}
+
+
+def upgrade(connection):
+    if connection.dialect.name != "mysql":
+        return
+    inspector = inspect(connection)
+    for table, (name, columns) in FULLTEXT_INDEXES.items():
+        if name not in {index["name"] for index in inspector.get_indexes(table)}:
+            connection.execute(text(f"CREATE FULLTEXT INDEX {name} ON {table} ({', '.join(columns)})"))
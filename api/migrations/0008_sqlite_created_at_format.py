@@ -0,0 +1,20 @@
+"""
+videos.created_at and images.created_at on SQLite: one text format.
+
+SQLite compares timestamps as text. CURRENT_TIMESTAMP stores
+'YYYY-MM-DD HH:MM:SS', but values bound from Python (e.g. CSV imports)
+used to be stored with fractional seconds, which sort after every value
+of the same second and broke created_at keyset seeks. models.SortTimestamp
+now binds the short format; this rewrites the rows stored the long way.
+MySQL stores real TIMESTAMPs and needs nothing.
+"""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    if connection.dialect.name != "sqlite":
+        return
+    for table in ("videos", "images"):
+        connection.execute(text(
+            f"UPDATE {table} SET created_at = strftime('%Y-%m-%d %H:%M:%S', created_at) WHERE created_at LIKE '%.%'"
+        ))
@@ -0,0 +1,37 @@
+"""
+media_changes.seq on SQLite: AUTOINCREMENT, so seqs are never reused.
+
+Without it SQLite hands out max(seq) + 1, which starts again at 1 once the
+retention sweep has emptied the log, and change feeds tailing from a higher
+seq never saw the new rows. SQLite cannot alter a column, so the table is
+rebuilt. MySQL's AUTO_INCREMENT already never goes back.
+"""
+from sqlalchemy import Table, Column, Integer, TIMESTAMP, Enum, Index, MetaData, text
+
+media_changes = Table(
+    "media_changes", MetaData(),
+    Column("seq", Integer, primary_key=True, autoincrement=True),
+    Column("op", Enum("create", "update", "delete", "reorder", "refresh"), nullable=False),
+    Column("media_type", Enum("video", "image"), nullable=False),
+    Column("media_id", Integer, nullable=True),
+    Column("order_position", Integer, nullable=True),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
+    Index("ix_media_changes_created_at", "created_at"),
+    sqlite_autoincrement=True,
+)
+
+
+def upgrade(connection):
+    if connection.dialect.name != "sqlite":
+        return
+    sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'media_changes'")).scalar()
+    if "AUTOINCREMENT" in (sql or "").upper():
+        return
+    connection.execute(text("DROP INDEX IF EXISTS ix_media_changes_created_at"))
+    connection.execute(text("ALTER TABLE media_changes RENAME TO media_changes_old"))
+    media_changes.create(connection)
+    connection.execute(text(
+        "INSERT INTO media_changes (seq, op, media_type, media_id, order_position, created_at) "
+        "SELECT seq, op, media_type, media_id, order_position, created_at FROM media_changes_old"
+    ))
+    connection.execute(text("DROP TABLE media_changes_old"))
@@ -0,0 +1,66 @@
+"""
+Versioned schema migrations. The app never changes the schema itself: run
+`python -m migrations` from the api/ directory before starting (or
+upgrading) the workers. `python -m migrations status` lists what is pending.
+
+Each migration is a module named NNNN_description.py in this package with an
+`upgrade(connection)` function. They run in order on the sync engine, each
+in its own transaction, and applied versions are recorded in
+schema_migrations. MySQL commits DDL implicitly, so a migration that fails
+halfway must be safe to re-run.
+"""
+import importlib
+import os
+import re
+
+from sqlalchemy import Table, Column, String, TIMESTAMP, MetaData, inspect, select, text
+
+import models  # noqa: F401  ✅ Registers the SQLite CREATE COLUMN hook the migrations rely on
+
+_MODULE_NAME = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", String(16), primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
+)
+
+
+def available() -> list:
+    """(version, module name) of every migration in this package, oldest first."""
+    found = (_MODULE_NAME.match(name) for name in os.listdir(os.path.dirname(__file__)))
+    return sorted((match.group(1), match.group(0)[:-3]) for match in found if match)
+
+
+def applied(connection) -> set:
+    if not inspect(connection).has_table(schema_migrations.name):
+        return set()
+    return set(connection.scalars(select(schema_migrations.c.version)))
+
+
+def upgrade(engine, target: str = None) -> list:
+    """Applies pending migrations up to `target` (default: all); returns their names."""
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+
+    ran = []
+    for version, name in available():
+        if target is not None and version > target:
+            break
+        with engine.begin() as connection:
+            if version in applied(connection):
+                continue
+            importlib.import_module(f"{__name__}.{name}").upgrade(connection)
+            connection.execute(schema_migrations.insert().values(version=version, name=name))
+        ran.append(name)
+    return ran
+
+
+async def pending(database) -> list:
+    """Names of migrations the database has not applied, read through the async pool."""
+    try:
+        versions = {row[0] for row in await database.fetch_all(select(schema_migrations.c.version))}
+    except Exception:  # ✅ No schema_migrations table yet: nothing has been applied
+        versions = set()
+    return [name for version, name in available() if version not in versions]
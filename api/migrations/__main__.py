@@ -0,0 +1,35 @@
+"""
+Applies or lists schema migrations against DATABASE_URL.
+
+Run from the api/ directory:
+    python -m migrations              # apply everything pending
+    python -m migrations --to 0001    # stop after a version
+    python -m migrations status
+"""
+import argparse
+
+from database import engine
+import migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status"])
+    parser.add_argument("--to", help="last version to apply (upgrade only)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        with engine.connect() as connection:
+            done = migrations.applied(connection)
+        for version, name in migrations.available():
+            print(f"{'applied' if version in done else 'pending':<8} {name}")
+        return
+
+    ran = migrations.upgrade(engine, args.to)
+    for name in ran:
+        print(f"applied  {name}")
+    print(f"{len(ran)} migration(s) applied" if ran else "schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,21 @@
-from sqlalchemy import Table, Column, Integer, String, ForeignKey,Boolean, TIMESTAMP, Enum, Text, text
+from sqlalchemy import Table, Column, Integer, BigInteger, String, ForeignKey,Boolean, TIMESTAMP, DateTime, Float, Enum, Text, Index, text, PrimaryKeyConstraint
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn
 from database import metadata
 
+# ✅ SQLite (used for local testing) has no MySQL "ON UPDATE" clause
+@compiles(CreateColumn, "sqlite")
+def _sqlite_create_column(element, compiler, **kw):
+    return compiler.visit_create_column(element, **kw).replace(" ON UPDATE CURRENT_TIMESTAMP", "")
+
+# ✅ Sort-key timestamps: SQLite stores CURRENT_TIMESTAMP as text without
+# fractional seconds, so bound values use that format too and text
+# comparisons in keyset seeks (pagination.py) order correctly
+SortTimestamp = TIMESTAMP().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"), "sqlite",
+)
+
 # ✅ Admin Users Table (Updated with `mfa_secret`)
 admin_users = Table(
     "admin_users", metadata,
@@ -14,6 +29,25 @@ admin_users = Table(
     Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
 )
 
+# ✅ Background Jobs Table (long-running admin work, see jobs.py)
+jobs = Table(
+    "jobs", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("kind", String(50), nullable=False),
+    Column("status", Enum("queued", "running", "succeeded", "failed", "cancelled"), server_default=text("'queued'"), nullable=False),
+    Column("progress", Float, server_default=text("0"), nullable=False),  # ✅ 0.0 - 1.0
+    Column("payload", Text, nullable=True),  # ✅ JSON
+    Column("result", Text, nullable=True),  # ✅ JSON
+    Column("error", Text, nullable=True),
+    Column("submitted_by", Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
+    Column("started_at", DateTime, nullable=True),
+    Column("finished_at", DateTime, nullable=True),
+    Column("owner", String(32), nullable=True),  # ✅ JobManager.owner of the process running it
+    Column("lease_until", DateTime, nullable=True),  # ✅ Re-queued once this passes without renewal
+    Index("ix_jobs_status_id", "status", "id"),  # ✅ Restart recovery scans unfinished jobs
+)
+
 # ✅ Images Table
 images = Table(
     "images", metadata,
@@ -23,7 +57,15 @@ images = Table(
     Column("alt_text", String(255), nullable=True),
     Column("category", String(100), nullable=True),
     Column("uploaded_by", Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True),  # ✅ Ensured ON DELETE SET NULL
-    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")),  # ✅ Auto-update timestamp
+    Column("order_position", Integer, server_default=text("0"), nullable=False),  # ✅ Manual display order
+    Column("created_at", SortTimestamp, server_default=text("CURRENT_TIMESTAMP"), nullable=False),  # ✅ Sort key: set once, never NULL
+    Index("ix_images_order_position_id", "order_position", "id"),  # ✅ Keyset pagination by order
+    Index("ix_images_created_at_id", "created_at", "id"),  # ✅ Keyset pagination by date
+    Index("ix_images_category_order_position_id", "category", "order_position", "id"),  # ✅ Filtered listings
+    Index("ix_images_category_created_at_id", "category", "created_at", "id"),
+    Index("ix_images_uploaded_by_order_position_id", "uploaded_by", "order_position", "id"),
+    Index("ix_images_uploaded_by_created_at_id", "uploaded_by", "created_at", "id"),
+    Index("ft_images_alt_text", "alt_text", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),  # ✅ /media/search
 )
 
 # ✅ Videos Table
@@ -36,5 +78,67 @@ videos = Table(
     Column("description", Text, nullable=True),
     Column("category", String(100), nullable=True),
     Column("uploaded_by", Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True),  # ✅ Ensured ON DELETE SET NULL
-    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")),  # ✅ Auto-update timestamp
+    Column("order_position", Integer, server_default=text("0"), nullable=False),  # ✅ Manual display order
+    Column("created_at", SortTimestamp, server_default=text("CURRENT_TIMESTAMP"), nullable=False),  # ✅ Sort key: set once, never NULL
+    Index("ix_videos_order_position_id", "order_position", "id"),  # ✅ Keyset pagination by order
+    Index("ix_videos_created_at_id", "created_at", "id"),  # ✅ Keyset pagination by date
+    Index("ix_videos_category_order_position_id", "category", "order_position", "id"),  # ✅ Filtered listings
+    Index("ix_videos_category_created_at_id", "category", "created_at", "id"),
+    Index("ix_videos_uploaded_by_order_position_id", "uploaded_by", "order_position", "id"),
+    Index("ix_videos_uploaded_by_created_at_id", "uploaded_by", "created_at", "id"),
+    Index("ft_videos_text", "title", "description", "category", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),  # ✅ /media/search
+)
+
+# ✅ Media Facets Table (row counts per category/uploader pair, maintained by crud; see facets.py)
+media_facets = Table(
+    "media_facets", metadata,
+    Column("media_type", Enum("video", "image"), nullable=False),
+    Column("category", String(100), server_default=text("''"), nullable=False),  # ✅ '' stands for NULL
+    Column("uploaded_by", Integer, server_default=text("0"), nullable=False),  # ✅ 0 stands for NULL
+    Column("count", Integer, server_default=text("0"), nullable=False),
+    PrimaryKeyConstraint("media_type", "category", "uploaded_by"),
+)
+
+# ✅ Resumable Uploads Table (chunked uploads into local storage, see storage.py)
+uploads = Table(
+    "uploads", metadata,
+    Column("id", String(32), primary_key=True),  # ✅ Random hex token, also the stored file's name
+    Column("media_type", Enum("video", "image"), nullable=False),
+    Column("file_name", String(255), nullable=False),  # ✅ As sent by the client
+    Column("stored_name", String(64), nullable=False),
+    Column("size", BigInteger, nullable=False),
+    Column("chunk_size", Integer, nullable=False),
+    Column("sha256", String(64), nullable=True),  # ✅ Optional whole-file checksum, checked on completion
+    Column("details", Text, nullable=True),  # ✅ JSON: column values for the media row
+    Column("status", Enum("uploading", "completing", "completed"), server_default=text("'uploading'"), nullable=False),
+    Column("media_id", Integer, nullable=True),
+    Column("created_by", Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
+    Column("expires_at", DateTime, nullable=False),  # ✅ Pushed back by every chunk
+    Index("ix_uploads_status_expires_at", "status", "expires_at"),  # ✅ Expiry sweep
+)
+
+# ✅ Upload Chunks Table (one row per verified or in-flight chunk of an unfinished upload)
+upload_chunks = Table(
+    "upload_chunks", metadata,
+    Column("upload_id", String(32), ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False),
+    Column("chunk_index", Integer, nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("sha256", String(64), nullable=False),
+    Column("started_at", DateTime, nullable=True),  # ✅ Set while a PUT is writing the chunk (unverified)
+    Column("claim", String(32), nullable=True),  # ✅ That PUT's token (DATETIME drops microseconds on MySQL)
+    PrimaryKeyConstraint("upload_id", "chunk_index"),
+)
+
+# ✅ Media Change Log (one row per write to videos/images, streamed to clients by changefeed.py)
+media_changes = Table(
+    "media_changes", metadata,
+    Column("seq", Integer, primary_key=True, autoincrement=True),  # ✅ Resume point for clients
+    Column("op", Enum("create", "update", "delete", "reorder", "refresh"), nullable=False),  # ✅ refresh: refetch the whole type
+    Column("media_type", Enum("video", "image"), nullable=False),
+    Column("media_id", Integer, nullable=True),
+    Column("order_position", Integer, nullable=True),  # ✅ Set when the write set it
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")),
+    Index("ix_media_changes_created_at", "created_at"),  # ✅ Retention sweep
+    sqlite_autoincrement=True,  # ✅ Otherwise SQLite reuses seqs once retention empties the log
 )
@@ -0,0 +1,93 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# ✅ Sort keys available for listings: name -> (column, descending)
+# Each one is backed by a composite (column, id) index in models.py
+SORT_KEYS = {
+    "order": ("order_position", False),
+    "created_at": ("created_at", True),
+}
+
+
+def encode_token(payload: dict) -> str:
+    """Serialises a small dict into an opaque, URL-safe token."""
+    raw = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> dict:
+    """Inverse of encode_token; raises ValueError on anything malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(str(e))
+    if not isinstance(payload, dict):
+        raise ValueError("not an object")
+    return payload
+
+
+def encode_cursor(sort: str, row) -> str:
+    """Builds an opaque cursor pointing just past the given row."""
+    column, _ = SORT_KEYS[sort]
+    value = row[column]
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return encode_token({"s": sort, "k": value, "id": row["id"]})
+
+
+def decode_cursor(sort: str, cursor: str):
+    """Returns the (sort value, id) pair stored in a cursor."""
+    try:
+        payload = decode_token(cursor)
+        if payload["s"] != sort:
+            raise ValueError("cursor was issued for a different sort")
+        value, last_id = payload["k"], payload["id"]
+        if not isinstance(last_id, int) or isinstance(last_id, bool):
+            raise ValueError("id must be an integer")
+        if SORT_KEYS[sort][0] == "created_at":
+            if not isinstance(value, str):
+                raise ValueError("sort value must be a timestamp")
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError("sort value must be an integer")
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    return value, last_id
+
+
+def paginate(query, table, sort: str, page: int, limit: int, cursor: str = None):
+    """
+    Orders a select by (sort column, id) and pages it.
+    With a cursor the query seeks past the last row seen, so any page costs
+    the same as the first one; without it the legacy OFFSET paging is used.
+    """
+    column_name, descending = SORT_KEYS[sort]
+    column, id_column = table.c[column_name], table.c.id
+
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    if cursor:
+        value, last_id = decode_cursor(sort, cursor)
+        if descending:
+            seek = or_(column < value, and_(column == value, id_column < last_id))
+        else:
+            seek = or_(column > value, and_(column == value, id_column > last_id))
+        return query.where(seek).limit(limit)
+
+    return query.offset((page - 1) * limit).limit(limit)
+
+
+def next_cursor(rows, sort: str, limit: int):
+    """Returns the cursor for the following page, or None on the last one."""
+    if len(rows) < limit:
+        return None
+    return encode_cursor(sort, rows[-1])
@@ -0,0 +1,100 @@
+import asyncio
+import base64
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ✅ QR rendering settings
+QR_CACHE_MAX_ENTRIES = int(os.getenv("QR_CACHE_MAX_ENTRIES", "256"))
+QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", "2"))
+
+
+# Renderers run in worker processes, so they must stay top-level and picklable.
+# qrcode (and PIL behind it) is imported there, never in the API process.
+def render_png(otp_uri: str) -> str:
+    """Base64-encoded PNG of the provisioning URI."""
+    import qrcode
+
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(otp_uri)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def render_svg(otp_uri: str) -> str:
+    """SVG markup of the provisioning URI (no PIL involved)."""
+    import qrcode
+    import qrcode.image.svg
+
+    qr = qrcode.QRCode(version=1, box_size=10, border=5, image_factory=qrcode.image.svg.SvgPathImage)
+    qr.add_data(otp_uri)
+    qr.make(fit=True)
+    return qr.make_image().to_string(encoding="unicode")
+
+
+RENDERERS = {"png": render_png, "svg": render_svg}
+
+
+class QRRenderer:
+    """
+    Bounded LRU of rendered QR codes keyed by (username, mfa_secret, format).
+    The key fully determines the image, so its digest doubles as the ETag.
+    Misses render in a process pool; concurrent misses for one key share a render.
+    """
+
+    def __init__(self, max_entries: int, workers: int):
+        self.max_entries = max_entries
+        self.workers = workers
+        self._entries = OrderedDict()  # key digest -> rendered image
+        self._inflight = {}  # key digest -> future
+        self._pool = None
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def etag(username: str, mfa_secret: str, fmt: str) -> str:
+        return hashlib.sha256(f"{username}\0{mfa_secret}\0{fmt}".encode()).hexdigest()
+
+    async def render(self, username: str, mfa_secret: str, otp_uri: str, fmt: str = "png") -> str:
+        key = self.etag(username, mfa_secret, fmt)
+        image = self._entries.get(key)
+        if image is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+        self.misses += 1
+        future = self._inflight.get(key)
+        if future is None:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            future = asyncio.get_running_loop().run_in_executor(self._pool, RENDERERS[fmt], otp_uri)
+            self._inflight[key] = future
+        try:
+            image = await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+        self._entries[key] = image
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return image
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+qr_renderer = QRRenderer(QR_CACHE_MAX_ENTRIES, QR_RENDER_WORKERS)
@@ -0,0 +1,33 @@
+import os
+from typing import Optional
+
+import orjson
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+
+load_dotenv()
+
+# ✅ Opt-in: media routes hand their rows straight to the encoder, skipping
+# response_model re-validation (the schemas still document the responses)
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson; set as the app-wide default in main.py."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def shape(schema, rows):
+    """Maps rows to exactly the schema's fields, in order, without validating them."""
+    fields = tuple(schema.model_fields)
+    return [{name: row.get(name) for name in fields} for row in rows]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names `etag` (weak comparison) or is `*`."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
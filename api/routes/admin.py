@@ -1,6 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from auth import create_access_token, verify_password, hash_password, get_current_admin
-from database import database
+from auth import (
+    create_access_token, get_current_admin, verify_password_async,
+    verify_and_update_password_async, password_hasher_stats, REHASH_ON_LOGIN,
+    oauth2_scheme, token_cache,
+)
+from database import database, pool_stats, replicas
+from admission import Admission, auth_limiter, per_client, per_username
+import admission
+from directory import admin_directory
 from models import admin_users
 from datetime import timedelta
 from schemas import AdminLogin
@@ -8,30 +15,42 @@ from sqlalchemy.exc import SQLAlchemyError
 from passlib.context import CryptContext
 from datetime import timedelta
 from jose import JWTError
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# ✅ bcrypt is the expensive part: per-client and per-username buckets, then a shared slot
+login_admission = Admission("login", [per_client(), per_username()], auth_limiter)
+
 # Admin Login Route
 
-@router.post("/admin/login")
+@router.post("/admin/login", dependencies=[Depends(login_admission)])
 async def admin_login(data: AdminLogin):
     try:
-        # ✅ Fetch admin user from the database
-        query = admin_users.select().where(admin_users.c.username == data.username)
-        result = await database.fetch_one(query)
+        # ✅ Fetch admin user through the directory (credentials are always read fresh)
+        admin = await admin_directory.credentials(data.username)
+        if not admin:
+            raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        # ✅ Ensure result is valid and convert to dictionary
-        if result:
-            admin = dict(result)  # ✅ Convert to dictionary if needed
-        else:
+        # ✅ Ensure the user has a valid password hash (bcrypt runs off the event loop)
+        if not admin.get("password_hash"):
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        # ✅ Ensure the user has a valid password hash
-        if "password_hash" not in admin or not verify_password(data.password, admin["password_hash"]):
+        if REHASH_ON_LOGIN:
+            valid, new_hash = await verify_and_update_password_async(data.password, admin["password_hash"])
+        else:
+            valid, new_hash = await verify_password_async(data.password, admin["password_hash"]), None
+
+        if not valid:
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
+        # ✅ Opt-in: upgrade hashes made with an outdated bcrypt cost
+        if new_hash:
+            await admin_directory.update(admin, password_hash=new_hash)
+
         # ✅ Check if MFA is enabled for the user
         if "mfa_enabled" in admin and admin["mfa_enabled"]:
             return {"mfa_required": True, "username": admin["username"]}  # ✅ Frontend should request OTP
@@ -43,15 +62,47 @@ async def admin_login(data: AdminLogin):
         return {"access_token": access_token, "token_type": "bearer"}
 
     except SQLAlchemyError as db_error:
-        print(f"Database error: {db_error}")  # ✅ Log database errors
+        logger.error("Database error: %s", db_error)  # ✅ Log database errors
         raise HTTPException(status_code=500, detail="Database error. Please try again later.")
 
     except HTTPException as http_error:
         raise http_error  # ✅ Directly raise HTTP exceptions (e.g., invalid login)
 
     except Exception as e:
-        print(f"Unexpected error: {e}")  # ✅ Log unexpected errors
+        logger.exception("Unexpected error: %s", e)  # ✅ Log unexpected errors
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")  # ✅ Return exact error for debugging
+# Logout: revokes the presented token (Requires JWT)
+@router.post("/admin/logout")
+async def admin_logout(token: str = Depends(oauth2_scheme), admin_id: int = Depends(get_current_admin)):
+    token_cache.revoke_token(token)
+    return {"message": "Logged out"}
+
+# Verified-token cache hit ratio (Requires JWT)
+@router.get("/admin/token-cache-stats")
+async def token_cache_stats(admin_id: int = Depends(get_current_admin)):
+    return token_cache.stats()
+
+# Password hashing pool usage (Requires JWT)
+@router.get("/admin/password-hasher-stats")
+async def hasher_stats(admin_id: int = Depends(get_current_admin)):
+    return password_hasher_stats()
+
+# Admission control state: rate-limit keys and auth slots in use (Requires JWT)
+@router.get("/admin/admission-stats")
+async def admission_stats(admin_id: int = Depends(get_current_admin)):
+    return admission.stats()
+
+# Database pool utilisation and liveness (Requires JWT)
+@router.get("/admin/db-pool")
+async def db_pool(admin_id: int = Depends(get_current_admin)):
+    try:
+        await database.fetch_val("SELECT 1")
+        connected = True
+    except Exception as e:
+        logger.error("Database error: %s", e)
+        connected = False
+    return {"db_connection": connected, **pool_stats(), **replicas.stats()}
+
 # Protected Route (Requires JWT)
 @router.get("/admin/protected")
 async def protected_route(admin_id: int = Depends(get_current_admin)):
@@ -67,7 +118,7 @@ async def protected_route(admin_id: int = Depends(get_current_admin)):
 
     except SQLAlchemyError as db_error:
         # Handle database errors (in case you expand this function later)
-        print(f"Database error: {db_error}")  # Log the error (use proper logging in production)
+        logger.error("Database error: %s", db_error)
         raise HTTPException(status_code=500, detail="Database error. Please try again later.")
 
     except JWTError:
@@ -76,5 +127,5 @@ async def protected_route(admin_id: int = Depends(get_current_admin)):
 
     except Exception as e:
         # Catch any other unexpected errors
-        print(f"Unexpected error: {e}")  # Log the error (use proper logging in production)
+        logger.exception("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="An unexpected error occurred. Please contact support.")
\ No newline at end of file
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+import os, shutil, uuid
+
+from auth import get_current_admin
+from ingest import CSV_INGEST_BATCH_SIZE
+from jobs import job_manager, JOBS_DIR
+from schemas import JobSubmit, JobResponse, MediaOrderSchema
+
+router = APIRouter()
+
+
+def _admin_id(admin_id) -> int:
+    return int(admin_id) if str(admin_id).isdigit() else None
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(data: JobSubmit, admin_id=Depends(get_current_admin)):
+    """Queues a background job (e.g. kind="reorder" with a MediaOrderSchema payload)."""
+    if data.kind == "reorder":
+        try:
+            MediaOrderSchema.model_validate(data.payload)
+        except ValidationError as ve:
+            raise HTTPException(status_code=422, detail=ve.errors(include_url=False, include_context=False))
+    elif data.kind == "csv_import":
+        raise HTTPException(status_code=400, detail="Use POST /jobs/csv-import to upload the file")
+
+    try:
+        job_id = await job_manager.submit(data.kind, data.payload, _admin_id(admin_id))
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return await job_manager.get(job_id)
+
+
+@router.post("/jobs/csv-import", response_model=JobResponse, status_code=202)
+async def submit_csv_import(
+    file: UploadFile = File(...),
+    batch_size: int = Query(CSV_INGEST_BATCH_SIZE, ge=1, le=10000),
+    admin_id=Depends(get_current_admin),
+):
+    """Stores the uploaded CSV on disk and imports it in the background."""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = os.path.join(JOBS_DIR, f"{uuid.uuid4().hex}.csv")
+    with open(path, "wb") as target:
+        await run_in_threadpool(shutil.copyfileobj, file.file, target)
+
+    job_id = await job_manager.submit("csv_import", {"path": path, "batch_size": batch_size}, _admin_id(admin_id))
+    return await job_manager.get(job_id)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: int, admin_id=Depends(get_current_admin)):
+    """Returns a job's status, progress and (once finished) its result."""
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: int, admin_id=Depends(get_current_admin)):
+    """Cancels a queued or running job."""
+    if not await job_manager.cancel(job_id):
+        job = await job_manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    return await job_manager.get(job_id)
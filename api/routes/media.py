@@ -1,19 +1,204 @@
-from fastapi import APIRouter, Query
-from typing import Dict
-from crud import get_videos, get_images, update_media_order
-from schemas import MediaResponse, MediaSchema
+import asyncio
+import hashlib
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
+from typing import Dict, Literal, Optional
+from auth import get_current_admin
+from crud import get_videos, get_images, get_media_version, update_media_order, count_media, get_facets, apply_media_batch
+from cache import media_cache
+from pagination import next_cursor
+from search import media_search
+from changefeed import changefeed, CHANGEFEED_MAX_SUBSCRIBERS
+from derivatives import derivative_cache, DerivativeUnavailable, FORMATS, VARIANTS
+from storage import MediaFileResponse, STORAGE_CACHE_CONTROL
+from responses import FAST_JSON_RESPONSES, FastJSONResponse, etag_matches, shape
+from schemas import MediaResponse, MediaOrderSchema, SearchResponse, FacetsResponse, VideoSchema, ImageSchema, MediaBatchRequest, MediaBatchResponse
 
 router = APIRouter()
 
+# ✅ Clients may keep listings but must revalidate them with If-None-Match
+MEDIA_CACHE_CONTROL = "private, no-cache"
+
+def _media_etag(version, *params) -> str:
+    digest = hashlib.sha1(repr((version, params)).encode()).hexdigest()
+    return f'"{digest}"'
+
 @router.get("/media", response_model=MediaResponse)
-async def fetch_media(page: int = Query(1, ge=1), limit: int = Query(6, ge=1, le=20)):
-    """Fetches media URLs (videos & images) with pagination."""
-    videos_data = await get_videos(page, limit)
-    images_data = await get_images(page, limit)
-    return {"videos": videos_data, "images": images_data}
+async def fetch_media(
+    request: Request,
+    response: Response,
+    page: int = Query(1, ge=1),
+    limit: int = Query(6, ge=1, le=20),
+    sort: Literal["order", "created_at"] = Query("order"),
+    video_cursor: Optional[str] = Query(None, description="next_cursor.videos from the previous page"),
+    image_cursor: Optional[str] = Query(None, description="next_cursor.images from the previous page"),
+    category: Optional[str] = Query(None, max_length=100),
+    uploaded_by: Optional[int] = Query(None, ge=1),
+):
+    """
+    Fetches media URLs (videos & images) with pagination.
+    Pass the returned `next_cursor` values back to seek to the next page;
+    `page` is still honoured for media types without a cursor.
+    `category` and `uploaded_by` filter both lists, and `total` counts every
+    match so the UI can render page controls.
+    Responses carry an ETag; a matching If-None-Match gets a bare 304.
+    """
+    version = await get_media_version()
+    etag = _media_etag(version, page, limit, sort, video_cursor, image_cursor, category, uploaded_by)
+    headers = {"ETag": etag, "Cache-Control": MEDIA_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # ✅ Both listings run concurrently, each on its own pooled connection
+    videos_data, images_data, videos_total, images_total = await asyncio.gather(
+        get_videos(page, limit, sort, video_cursor, category, uploaded_by),
+        get_images(page, limit, sort, image_cursor, category, uploaded_by),
+        count_media("videos", category, uploaded_by),
+        count_media("images", category, uploaded_by),
+    )
+    cursors = {
+        "videos": next_cursor(videos_data, sort, limit),
+        "images": next_cursor(images_data, sort, limit),
+    }
+    totals = {"videos": videos_total, "images": images_total}
+    videos_data = derivative_cache.annotate("videos", videos_data)
+    images_data = derivative_cache.annotate("images", images_data)
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse({
+            "videos": shape(VideoSchema, videos_data),
+            "images": shape(ImageSchema, images_data),
+            "next_cursor": cursors,
+            "total": totals,
+        }, headers=headers)
+
+    response.headers.update(headers)
+    return {"videos": videos_data, "images": images_data, "next_cursor": cursors, "total": totals}
+
+@router.get("/media/facets", response_model=FacetsResponse)
+async def media_facets(
+    request: Request,
+    response: Response,
+    category: Optional[str] = Query(None, max_length=100),
+    uploaded_by: Optional[int] = Query(None, ge=1),
+):
+    """
+    Per-category and per-uploader counts for videos and images, optionally
+    narrowed by the other filter. Served from the incrementally maintained
+    media_facets aggregate, never from COUNT(*) over the media tables.
+    """
+    version = await get_media_version()
+    etag = _media_etag(version, "facets", category, uploaded_by)
+    headers = {"ETag": etag, "Cache-Control": MEDIA_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    videos_facets, images_facets = await asyncio.gather(
+        get_facets("videos", category, uploaded_by),
+        get_facets("images", category, uploaded_by),
+    )
+    payload = {"videos": videos_facets, "images": images_facets}
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(payload, headers=headers)  # ✅ Already in FacetsResponse shape
+    response.headers.update(headers)
+    return payload
+
+@router.get("/media/search", response_model=SearchResponse)
+async def search_media(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    Ranked search over video titles, descriptions and categories and image alt text.
+    Pass `next_cursor` back with the same `q` to get the following page.
+    """
+    results = await media_search.search(q, limit, cursor)
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(results)  # ✅ Hits are built in SearchHit shape
+    return results
+
+@router.get("/media/search-stats")
+async def media_search_stats():
+    """Reports which search backend is active and, in process, the index size."""
+    return media_search.stats()
+
+@router.get("/media/changes")
+async def media_changes(
+    since: Optional[int] = Query(None, ge=0, description="Resume after this seq (the last event id seen)"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events stream of writes to videos and images, so open
+    dashboards refetch only what changed instead of polling. Each `change`
+    event carries seq, op (create, update, delete, reorder, or refresh for
+    "refetch this type"), type, id and order_position. Reconnecting with
+    Last-Event-ID (EventSource does this itself) or ?since= resumes after
+    that seq; a `reset` event means the gap is gone and everything must be
+    refetched.
+    """
+    if changefeed.subscribers >= CHANGEFEED_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Too many open change streams", headers={"Retry-After": "5"})
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)  # ✅ A reconnect: newer than the ?since= in the original URL
+    return StreamingResponse(
+        changefeed.stream(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # ✅ No proxy buffering either
+    )
+
+@router.get("/media/changes-stats")
+async def media_changes_stats():
+    """Reports the change feed's position, buffer and open streams."""
+    return changefeed.stats()
+
+@router.get("/media/{name}/{media_id}/variants/{variant}.{fmt}")
+async def media_variant(name: Literal["videos", "images"], media_id: int, variant: str, fmt: str, v: Optional[str] = None):
+    """
+    Serves a resized variant of an image or a video's poster frame, as listed
+    in `variants`. A missing variant is rendered off the event loop; if that
+    takes too long or too many renders are already running, images redirect
+    to the original and videos get a 503.
+    """
+    if variant not in VARIANTS or fmt not in FORMATS:
+        raise HTTPException(status_code=404, detail="Unknown variant")
+    try:
+        path, stat_result, url = await derivative_cache.get(name, media_id, variant, fmt)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Media not found")
+    except DerivativeUnavailable as e:
+        if name == "images":
+            return RedirectResponse(e.url, status_code=307, headers={"Cache-Control": "no-store"})
+        if e.pending:
+            raise HTTPException(status_code=503, detail="Variant is being rendered", headers={"Retry-After": "2"})
+        raise HTTPException(status_code=404, detail="No variant available for this media")
+
+    # ✅ ?v= pins the source URL, so a matching link never changes content
+    cache_control = STORAGE_CACHE_CONTROL if v == derivative_cache.fingerprint(url) else "public, max-age=300"
+    return MediaFileResponse(path, stat_result=stat_result, media_type=FORMATS[fmt][2], headers={"Cache-Control": cache_control})
+
+@router.get("/media/variant-stats")
+async def media_variant_stats():
+    """Reports variant cache hits, renders and size against its bound."""
+    return derivative_cache.stats()
+
+@router.get("/media/cache-stats")
+async def media_cache_stats():
+    """Reports media page cache hits, misses and evictions for sizing."""
+    return media_cache.stats()
 
 @router.put("/media", response_model=Dict[str, str])
-async def update_media(media_data: MediaSchema):
+async def update_media(media_data: MediaOrderSchema):
     """Updates the order of media elements to maintain the desired arrangement."""
-    await update_media_order(media_data)
+    await update_media_order(media_data.items)
     return {"message": "Media order updated successfully"}
+
+@router.post("/media/batch", response_model=MediaBatchResponse)
+async def media_batch(batch: MediaBatchRequest, admin_id: int = Depends(get_current_admin)):
+    """
+    Creates, updates and deletes videos and images in one transaction.
+    Every operation gets its own result; invalid ones and unknown ids are
+    reported without failing the rest.
+    """
+    results = await apply_media_batch(batch.operations)
+    applied = sum(result["status"] in ("created", "updated", "deleted") for result in results)
+    return {"results": results, "applied": applied, "failed": len(results) - applied}
@@ -1,185 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
 from fastapi.responses import JSONResponse
-from datetime import datetime
-import pyotp, qrcode, io, base64, logging
+from typing import Literal
+import logging
 
-from database import get_db
-from models import admin_users
+from admission import Admission, auth_limiter, per_client, per_username, path_username
+from directory import admin_directory
+from qr import qr_renderer
 from auth import create_access_token
+from responses import etag_matches
 from schemas import MFAVerifyRequest  # ✅ Import Pydantic model from schemas.py
 
 router = APIRouter()
-logger = logging.getLogger("uvicorn.error")
+logger = logging.getLogger(__name__)
 
+# ✅ QR rendering is CPU-heavy; OTP checks are cheap but must not be brute-forced per user
+generate_admission = Admission("mfa_generate", [per_client(), per_username(path_username)], auth_limiter)
+verify_admission = Admission("mfa_verify", [per_client(), per_username()])
 
-@router.get("/mfa/generate/{username}")
-async def generate_qr(username: str, db: Session = Depends(get_db)):
-    logger.info(f"[QR GENERATE] Request received for user: {username}")
 
-    user_query = admin_users.select().where(admin_users.c.username == username)
-    user = db.execute(user_query).fetchone()
+@router.get("/mfa/generate/{username}", dependencies=[Depends(generate_admission)])
+async def generate_qr(
+    username: str,
+    request: Request,
+    response: Response,
+    format: Literal["png", "svg"] = Query("png", description="png: base64 PNG, svg: SVG markup"),
+):
+    logger.debug("[QR GENERATE] Request received for user: %s", username)
+
+    user = await admin_directory.credentials(username)
 
     if not user:
-        logger.warning(f"[QR GENERATE] User not found: {username}")
+        logger.warning("[QR GENERATE] User not found: %s", username)
         raise HTTPException(status_code=404, detail="User not found")
 
-    mfa_secret = user.mfa_secret
+    mfa_secret = user["mfa_secret"]
     if not mfa_secret:
+        import pyotp  # ✅ Imported on first MFA use, not at worker start-up
+
         mfa_secret = pyotp.random_base32()
-        logger.info(f"[QR GENERATE] Generated new MFA secret for user: {username}")
+        await admin_directory.update(user, mfa_secret=mfa_secret, mfa_enabled=0)
+        user = {**user, "mfa_secret": mfa_secret, "mfa_enabled": 0}
+        logger.info("[QR GENERATE] Stored a new MFA secret for user: %s", username)
 
-        update_query = (
-            admin_users.update()
-            .where(admin_users.c.username == username)
-            .values(mfa_secret=mfa_secret, mfa_enabled=0)
-        )
-        db.execute(update_query)
-        db.commit()
-        logger.info(f"[QR GENERATE] Stored new secret in DB for user: {username}")
+    # ✅ The response is fully determined by (username, secret, format, mfa_enabled)
+    mfa_enabled = user["mfa_enabled"] == 1
+    etag = f'"{qr_renderer.etag(username, mfa_secret, format)}-{int(mfa_enabled)}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
 
-    otp_uri = pyotp.TOTP(mfa_secret).provisioning_uri(name=username, issuer_name="MyApp")
+    otp_uri = admin_directory.totp(user).provisioning_uri(name=username, issuer_name="MyApp")
 
     try:
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(otp_uri)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = io.BytesIO()
-        img.save(buffer, format="PNG")
-        qr_base64 = base64.b64encode(buffer.getvalue()).decode()
+        # ✅ Cached per (username, secret, format); misses render in a process pool
+        qr_code = await qr_renderer.render(username, mfa_secret, otp_uri, format)
     except Exception as e:
-        logger.error(f"[QR GENERATE] QR generation failed: {str(e)}")
+        logger.error("[QR GENERATE] QR generation failed: %s", e)
         raise HTTPException(status_code=500, detail="QR Code generation failed")
 
-    logger.info(f"[QR GENERATE] QR code successfully generated for {username}")
+    logger.debug("[QR GENERATE] QR code generated for %s", username)
+    response.headers.update(headers)
     return {
-        "qr_code": qr_base64,
+        "qr_code": qr_code,
+        "format": format,
         "mfa_secret": mfa_secret,
-        "mfa_enabled": user.mfa_enabled == 1
+        "mfa_enabled": mfa_enabled
     }
 
 
-@router.post("/mfa/verify")
-async def verify_mfa_code(request: MFAVerifyRequest, db: Session = Depends(get_db)):
-    logger.info("🚨 ENTERED /mfa/verify endpoint")
-
+@router.post("/mfa/verify", dependencies=[Depends(verify_admission)])
+async def verify_mfa_code(request: MFAVerifyRequest):
+    # ✅ Never log the submitted or expected OTP, or the user row (it holds the secret)
     try:
-        logger.info(f"Username: {request.username}, Token: {request.token}")
-
-        user_query = admin_users.select().where(admin_users.c.username == request.username)
-        user = db.execute(user_query).fetchone()
-
-        logger.info(f"DB User: {user}")
+        user = await admin_directory.credentials(request.username)
 
-        if not user or not user.mfa_secret:
-            logger.warning("User not found or MFA secret missing.")
+        if not user or not user["mfa_secret"]:
+            logger.warning("[MFA VERIFY] User not found or MFA secret missing: %s", request.username)
             raise HTTPException(status_code=401, detail="Invalid user or 2FA not initialized")
 
-        totp = pyotp.TOTP(user.mfa_secret)
-        expected = totp.now()
-
-        logger.info(f"Server time: {datetime.now()}")
-        logger.info(f"Expected OTP: {expected}, Submitted OTP: {request.token}")
-
+        totp = admin_directory.totp(user)
         if not totp.verify(request.token, valid_window=1):
-            logger.warning("OTP verification failed.")
+            logger.warning("[MFA VERIFY] OTP verification failed for %s", request.username)
             raise HTTPException(status_code=401, detail="Invalid OTP")
 
-        logger.info("OTP verified successfully.")
+        if not user["mfa_enabled"]:
+            await admin_directory.update(user, mfa_enabled=1)
+            logger.info("[MFA VERIFY] Enabled MFA for %s", request.username)
 
-        if not user.mfa_enabled:
-            logger.info("Enabling MFA for user...")
-            update_query = (
-                admin_users.update()
-                .where(admin_users.c.username == request.username)
-                .values(mfa_enabled=1)
-            )
-            db.execute(update_query)
-            db.commit()
-            logger.info("MFA status updated in DB.")
-
-        access_token = create_access_token(data={"sub": user.username})
-        logger.info("Access token generated.")
+        access_token = create_access_token(data={"sub": user["username"]})
+        logger.debug("[MFA VERIFY] OTP verified for %s", request.username)
 
         return {
             "verified": True,
             "access_token": access_token
         }
 
-    except Exception as e:
-        logger.exception(f"💥 Exception in /mfa/verify: {e}")
-        raise HTTPException(status_code=500, detail="Server error during verification")
-
-
+    except HTTPException:
+        raise  # ✅ 401s stay 401s
 
-@router.post("/mfa/debug")
-async def mfa_debug(request: MFAVerifyRequest, db: Session = Depends(get_db)):
-    logger.info("🚨 ENTERED /mfa/verify endpoint")
-
-    try:
-        logger.info(f"Username: {request.username}, Token: {request.token}")
-
-        user_query = admin_users.select().where(admin_users.c.username == request.username)
-        user = db.execute(user_query).fetchone()
-
-        logger.info(f"DB User: {user}")
-
-        if not user or not user.mfa_secret:
-            logger.warning("User not found or MFA secret missing.")
-            raise HTTPException(status_code=401, detail="Invalid user or 2FA not initialized")
-
-        totp = pyotp.TOTP(user.mfa_secret)
-        expected = totp.now()
-
-        logger.info(f"Server time: {datetime.now()}")
-        logger.info(f"Expected OTP: {expected}, Submitted OTP: {request.token}")
-
-        if not totp.verify(request.token, valid_window=1):
-            logger.warning("OTP verification failed.")
-            raise HTTPException(status_code=401, detail="Invalid OTP")
-
-        logger.info("OTP verified successfully.")
-
-        if not user.mfa_enabled:
-            logger.info("Enabling MFA for user...")
-            update_query = (
-                admin_users.update()
-                .where(admin_users.c.username == request.username)
-                .values(mfa_enabled=1)
-            )
-            db.execute(update_query)
-            db.commit()
-            logger.info("MFA status updated in DB.")
+    except Exception:
+        logger.exception("[MFA VERIFY] Exception while verifying %s", request.username)
+        raise HTTPException(status_code=500, detail="Server error during verification")
 
-        access_token = create_access_token(data={"sub": user.username})
-        logger.info("Access token generated.")
 
-        return {
-            "verified": True,
-            "access_token": access_token
-        }
-
-    except Exception as e:
-        logger.exception(f"💥 Exception in /mfa/verify: {e}")
-        raise HTTPException(status_code=500, detail="Server error during verification")
-    # logger.info("🔥 Parsed Request via Pydantic:")
-    # logger.info(f"Username: {request.username}")
-    # logger.info(f"Token: {request.token}")
-    # return {"received": True}
-
-from sqlalchemy import text  # ✅ Add this import
-
-@router.get("/mfa/db-debug")
-async def mfa_db_debug(db: Session = Depends(get_db)):
-    logger.info("🧪 DB Connection Debug:")
-    logger.info(f"DB session object: {db}")
-    
-    try:
-        result = db.execute(text("SELECT 1"))
-        logger.info(f"DB Test Query Result: {result.scalar()}")
-    except Exception as e:
-        logger.error(f"❌ Error testing DB connection: {e}")
-        return {"db_connection": False, "error": str(e)}
 
-    return {"db_connection": True}
+@router.post("/mfa/debug", dependencies=[Depends(verify_admission)])
+async def mfa_debug(request: MFAVerifyRequest):
+    # ✅ Same checks as /mfa/verify
+    return await verify_mfa_code(request)
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Path, Request
+from typing import Optional
+
+from auth import get_current_admin
+from crud import URL_COLUMNS
+from derivatives import derivative_cache
+from schemas import UploadCreate, UploadResponse, UploadChunkResponse
+from storage import storage, MEDIA_DIRS
+
+router = APIRouter()
+
+UPLOAD_ID = Path(..., pattern="^[0-9a-f]{32}$")
+
+
+def _admin_id(admin_id) -> int:
+    return int(admin_id) if str(admin_id).isdigit() else None
+
+
+@router.post("/uploads", response_model=UploadResponse, status_code=201)
+async def create_upload(data: UploadCreate, admin_id=Depends(get_current_admin)):
+    """
+    Opens a resumable upload. Send the file as PUT /uploads/{id}/chunks/{n}
+    (chunk_size bytes each, the last one shorter), then POST .../complete.
+    """
+    return await storage.create(data, _admin_id(admin_id))
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadResponse)
+async def get_upload(upload_id: str = UPLOAD_ID, admin_id=Depends(get_current_admin)):
+    """Returns an upload's state; `received` lists the chunks to skip when resuming."""
+    return await storage.describe(upload_id)
+
+
+@router.put("/uploads/{upload_id}/chunks/{index}", response_model=UploadChunkResponse)
+async def put_chunk(
+    request: Request,
+    upload_id: str = UPLOAD_ID,
+    index: int = Path(..., ge=0),
+    x_chunk_sha256: Optional[str] = Header(None),
+    admin_id=Depends(get_current_admin),
+):
+    """Stores chunk `index` from the raw request body, verified against the X-Chunk-SHA256 header."""
+    return await storage.write_chunk(upload_id, index, request.stream(), x_chunk_sha256)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=UploadResponse)
+async def complete_upload(background_tasks: BackgroundTasks, upload_id: str = UPLOAD_ID, admin_id=Depends(get_current_admin)):
+    """Assembles the upload and creates its video or image row; its variants render after the response."""
+    upload = await storage.complete(upload_id)
+    name = MEDIA_DIRS[upload["type"]]
+    background_tasks.add_task(derivative_cache.warm, name, [{"id": upload["media_id"], URL_COLUMNS[name]: upload["url"]}])
+    return upload
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str = UPLOAD_ID, admin_id=Depends(get_current_admin)):
+    await storage.abort(upload_id)
+    return {"message": "Upload aborted"}
+
+
+@router.api_route("/files/{directory}/{stored_name}", methods=["GET", "HEAD"])
+async def get_file(directory: str, stored_name: str):
+    """Serves an uploaded file, with Range support for seeking in videos."""
+    return await storage.response(directory, stored_name)
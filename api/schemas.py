@@ -1,5 +1,6 @@
 from pydantic import BaseModel,field_validator
-from typing import Optional, List
+from typing import Optional, List, Literal, Any, Dict
+from datetime import datetime
 
 class AdminLogin(BaseModel):
     username: str
@@ -10,18 +11,55 @@ class VideoSchema(BaseModel):
     video_url: str
     title: Optional[str] = None
     uploaded_by: Optional[int] = None
-    created_at: Optional[str] = None
+    created_at: Optional[datetime] = None
+    variants: Dict[str, str] = {}  # ✅ Poster frame variant URLs (thumb, w320, ...), see derivatives.py
 
 class ImageSchema(BaseModel):
     id: int
     image_url: str
     alt_text: Optional[str] = None
     uploaded_by: Optional[int] = None
-    created_at: Optional[str] = None
+    created_at: Optional[datetime] = None
+    variants: Dict[str, str] = {}  # ✅ Resized variant URLs (thumb, w320, ...), see derivatives.py
+
+class MediaCursors(BaseModel):
+    videos: Optional[str] = None
+    images: Optional[str] = None
+
+class MediaTotals(BaseModel):
+    videos: int = 0
+    images: int = 0
 
 class MediaResponse(BaseModel):
     videos: List[VideoSchema]
     images: List[ImageSchema]
+    next_cursor: MediaCursors = MediaCursors()
+    total: MediaTotals = MediaTotals()
+
+class FacetCount(BaseModel):
+    value: Optional[Any] = None  # ✅ Category name or uploader id; null for media without one
+    count: int
+
+class MediaFacets(BaseModel):
+    total: int
+    categories: List[FacetCount]
+    uploaders: List[FacetCount]
+
+class FacetsResponse(BaseModel):
+    videos: MediaFacets
+    images: MediaFacets
+
+class SearchHit(BaseModel):
+    type: Literal["video", "image"]
+    id: int
+    url: str
+    title: Optional[str] = None  # ✅ Video title or image alt text
+    category: Optional[str] = None
+    score: float
+
+class SearchResponse(BaseModel):
+    results: List[SearchHit]
+    next_cursor: Optional[str] = None
 
 class MediaSchema(BaseModel):
     media_ids: List[int]
@@ -34,6 +72,110 @@ class MediaSchema(BaseModel):
             raise ValueError("media_ids must be a non-empty list.")
         return value
 
+class MediaOrderItem(BaseModel):
+    id: int
+    type: Literal["video", "image"]
+    position: int
+
+class MediaOrderSchema(BaseModel):
+    items: List[MediaOrderItem]
+
+    @field_validator("items")
+    @classmethod
+    def check_non_empty_list(cls, value):
+        """Ensures that at least one item is being reordered."""
+        if not value:
+            raise ValueError("items must be a non-empty list.")
+        return value
+
+# ✅ Upper bound on operations per POST /media/batch request
+MEDIA_BATCH_MAX_ITEMS = 1000
+
+class MediaBatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    type: Literal["video", "image"]
+    id: Optional[int] = None  # ✅ Required for update and delete
+    values: Dict[str, Any] = {}  # ✅ Column values for create and update
+
+class MediaBatchRequest(BaseModel):
+    operations: List[MediaBatchOperation]
+
+    @field_validator("operations")
+    @classmethod
+    def check_size(cls, value):
+        """Ensures the batch has between 1 and MEDIA_BATCH_MAX_ITEMS operations."""
+        if not value:
+            raise ValueError("operations must be a non-empty list.")
+        if len(value) > MEDIA_BATCH_MAX_ITEMS:
+            raise ValueError(f"at most {MEDIA_BATCH_MAX_ITEMS} operations per batch.")
+        return value
+
+class MediaBatchResult(BaseModel):
+    index: int
+    op: str
+    type: str
+    id: Optional[int] = None  # ✅ The new id for creates
+    status: Literal["created", "updated", "deleted", "not_found", "invalid", "failed"]
+    error: Optional[str] = None
+
+class MediaBatchResponse(BaseModel):
+    results: List[MediaBatchResult]
+    applied: int
+    failed: int
+
 class MFAVerifyRequest(BaseModel):
     username: str
-    token: str
\ No newline at end of file
+    token: str
+
+class JobSubmit(BaseModel):
+    kind: str
+    payload: Dict[str, Any] = {}
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: float
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    submitted_by: Optional[int] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class UploadCreate(BaseModel):
+    type: Literal["video", "image"]
+    file_name: str
+    size: int  # ✅ Total bytes
+    chunk_size: Optional[int] = None  # ✅ Defaults to UPLOAD_CHUNK_SIZE
+    sha256: Optional[str] = None  # ✅ Whole-file checksum (hex), verified on completion
+    title: Optional[str] = None
+    description: Optional[str] = None
+    alt_text: Optional[str] = None
+    category: Optional[str] = None
+
+    @field_validator("sha256")
+    @classmethod
+    def check_sha256(cls, value):
+        """Ensures the checksum is 64 hex digits."""
+        if value is not None and (len(value) != 64 or any(c not in "0123456789abcdefABCDEF" for c in value)):
+            raise ValueError("sha256 must be 64 hex digits.")
+        return value.lower() if value else value
+
+class UploadResponse(BaseModel):
+    id: str
+    type: str
+    file_name: str
+    size: int
+    chunk_size: int
+    chunks: int
+    received: List[int]  # ✅ Indexes of the verified chunks
+    status: str
+    url: str  # ✅ Where the file is served once completed
+    media_id: Optional[int] = None
+    expires_at: Optional[datetime] = None
+
+class UploadChunkResponse(BaseModel):
+    index: int
+    size: int
+    sha256: str
@@ -0,0 +1,337 @@
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import os
+import re
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import literal, literal_column, select, union_all
+from sqlalchemy.dialects.mysql import match
+
+from cache import LRUCache
+from database import database
+from models import videos, images
+from pagination import encode_token, decode_token
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ✅ Search settings
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")  # auto | fulltext | memory
+SEARCH_INDEX_BATCH_SIZE = int(os.getenv("SEARCH_INDEX_BATCH_SIZE", "5000"))
+SEARCH_RESULT_CACHE_ENTRIES = int(os.getenv("SEARCH_RESULT_CACHE_ENTRIES", "512"))
+SEARCH_RESULT_CACHE_TTL = float(os.getenv("SEARCH_RESULT_CACHE_TTL", "300"))
+
+# ✅ Searchable text per table, and the columns every hit is returned with
+SEARCH_FIELDS = {
+    "videos": ("title", "description", "category"),
+    "images": ("alt_text",),
+}
+TABLES = {"videos": videos, "images": images}
+MEDIA_TYPES = {"videos": "video", "images": "image"}
+
+# BM25 tuning for the in-process index
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str):
+    """Lower-cased word tokens; single characters carry no signal and are dropped."""
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1]
+
+
+def _hit_columns(name: str):
+    table = TABLES[name]
+    url = table.c.video_url if name == "videos" else table.c.image_url
+    title = table.c.title if name == "videos" else table.c.alt_text
+    return [
+        literal(MEDIA_TYPES[name]).label("type"),
+        table.c.id,
+        url.label("url"),
+        title.label("title"),
+        table.c.category,
+    ]
+
+
+class _TableIndex:
+    """Postings and document lengths for one table."""
+
+    def __init__(self):
+        self.postings = {}  # token -> {id: term frequency}
+        self.lengths = {}  # id -> number of tokens
+        self.total_length = 0
+        self.max_id = 0
+
+    def add(self, doc_id: int, tokens):
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {})[doc_id] = tf
+        self.lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+        self.max_id = max(self.max_id, doc_id)
+
+    def remove(self, doc_id: int, tokens):
+        length = self.lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for token in tokens:
+            docs = self.postings.get(token)
+            if docs is not None and docs.pop(doc_id, None) is not None and not docs:
+                del self.postings[token]
+
+
+class InvertedIndex:
+    """
+    In-process BM25 index over SEARCH_FIELDS, used when MySQL FULLTEXT is not.
+    It is built once on startup by streaming both tables in id order, then kept
+    current by the crud write paths (refresh / catch_up / discard). Each worker
+    holds its own copy, so writes made by other processes are not seen: run a
+    single worker or use the FULLTEXT backend when scaling out.
+    """
+
+    def __init__(self, batch_size: int = SEARCH_INDEX_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.tables = {name: _TableIndex() for name in SEARCH_FIELDS}
+        self._doc_tokens = {name: {} for name in SEARCH_FIELDS}  # id -> distinct tokens, for removal
+        self.ready = False
+        # ✅ Ranked results per (generation, terms, count); any index change bumps the generation
+        self.generation = 0
+        self.results = LRUCache(SEARCH_RESULT_CACHE_ENTRIES, SEARCH_RESULT_CACHE_TTL)
+
+    async def build(self):
+        for name in SEARCH_FIELDS:
+            await self._load(name, after_id=0)
+        self.ready = True
+        # ✅ Rows inserted while the last batch was in flight
+        for name in SEARCH_FIELDS:
+            await self.catch_up(name)
+        logger.info("Search index built: %d documents", sum(len(t.lengths) for t in self.tables.values()))
+
+    async def _load(self, name: str, after_id: int, ids=None):
+        table = TABLES[name]
+        columns = [table.c.id] + [table.c[field] for field in SEARCH_FIELDS[name]]
+        while True:
+            query = select(*columns).order_by(table.c.id).limit(self.batch_size)
+            query = query.where(table.c.id.in_(ids)) if ids is not None else query.where(table.c.id > after_id)
+            rows = await database.fetch_all(query)
+            for row in rows:
+                self._add(name, row["id"], " ".join(row[field] or "" for field in SEARCH_FIELDS[name]))
+            if ids is not None or len(rows) < self.batch_size:
+                return
+            after_id = rows[-1]["id"]
+
+    def _add(self, name: str, doc_id: int, text: str):
+        self.discard(name, [doc_id])
+        self.generation += 1
+        tokens = tokenize(text)
+        self.tables[name].add(doc_id, tokens)
+        self._doc_tokens[name][doc_id] = tuple(set(tokens))
+
+    async def refresh(self, name: str, ids):
+        """Re-reads the given rows after an insert or update."""
+        if not ids:
+            return
+        self.discard(name, ids)
+        await self._load(name, 0, ids=list(ids))
+
+    async def catch_up(self, name: str):
+        """Indexes rows appended since the last one seen (bulk inserts report no ids)."""
+        if self.ready:
+            await self._load(name, self.tables[name].max_id)
+
+    def discard(self, name: str, ids):
+        for doc_id in ids:
+            tokens = self._doc_tokens[name].pop(doc_id, None)
+            if tokens is not None:
+                self.tables[name].remove(doc_id, tokens)
+                self.generation += 1
+
+    def search(self, query: str, count: int):
+        """Top `count` (score, type, id) tuples, best first."""
+        terms = tuple(sorted(set(tokenize(query))))
+        key = (self.generation, terms, count)
+        top = self.results.get(key)
+        if top is None:
+            top = self._rank(terms, count)
+            self.results.set(key, top)
+        return top
+
+    def _rank(self, terms, count: int):
+        documents = sum(len(t.lengths) for t in self.tables.values())
+        if not terms or not documents:
+            return []
+
+        idf = {}
+        for term in terms:
+            df = sum(len(t.postings.get(term, ())) for t in self.tables.values())
+            if df:
+                idf[term] = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+        # ✅ Rarest terms first; bounds[i] is the best score a document can
+        # still collect from terms i onwards
+        ordered = sorted(idf.items(), key=lambda item: -item[1])
+        bounds = [sum(term_idf * (BM25_K1 + 1) for _, term_idf in ordered[i:]) for i in range(len(ordered))]
+
+        top = []
+        for name, index in self.tables.items():
+            if not index.lengths:
+                continue
+            norm = BM25_K1 * (1 - BM25_B)
+            scale = BM25_K1 * BM25_B * len(index.lengths) / index.total_length if index.total_length else 0.0
+            lengths, scores, closed = index.lengths, {}, False
+            for i, (term, term_idf) in enumerate(ordered):
+                docs = index.postings.get(term)
+                if not docs:
+                    continue
+                # ✅ MaxScore: once the current top `count` cannot be overtaken by a
+                # document that only matches the remaining (common) terms, those
+                # terms only add to the candidates instead of every posting
+                if not closed and len(scores) >= count:
+                    closed = heapq.nlargest(count, scores.values())[-1] >= bounds[i]
+                candidates = ((doc_id, docs.get(doc_id)) for doc_id in list(scores)) if closed else docs.items()
+                for doc_id, tf in candidates:
+                    if tf:
+                        weight = term_idf * tf * (BM25_K1 + 1) / (tf + norm + scale * lengths[doc_id])
+                        scores[doc_id] = scores.get(doc_id, 0.0) + weight
+            media_type = MEDIA_TYPES[name]
+            top += heapq.nsmallest(count, ((-score, media_type, doc_id) for doc_id, score in scores.items()))
+
+        top = sorted(top)[:count]
+        return [(round(-negative, 6), media_type, doc_id) for negative, media_type, doc_id in top]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "documents": sum(len(t.lengths) for t in self.tables.values()),
+            "terms": len({term for t in self.tables.values() for term in t.postings}),
+            "result_cache": self.results.stats(),
+        }
+
+
+class MediaSearch:
+    """
+    Ranked search over videos and images.
+    The FULLTEXT backend lets MySQL rank with MATCH ... AGAINST; the memory
+    backend ranks in process and only reads the rows of the returned page.
+    Results are paged with an opaque cursor holding the query and an offset:
+    relevance order has no stable key to seek on, and ranking has to look at
+    every match anyway.
+    """
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self.index = InvertedIndex() if backend == "memory" else None
+        self._build_task = None
+
+    async def start(self):
+        if self.index is not None:
+            self._build_task = asyncio.create_task(self.index.build())
+
+    async def stop(self):
+        if self._build_task is not None:
+            self._build_task.cancel()
+            await asyncio.gather(self._build_task, return_exceptions=True)
+            self._build_task = None
+
+    # ✅ Write hooks called by crud; MySQL maintains FULLTEXT indexes itself
+    async def refresh(self, name: str, ids):
+        if self.index is not None:
+            await self.index.refresh(name, ids)
+
+    async def catch_up(self, name: str):
+        if self.index is not None:
+            await self.index.catch_up(name)
+
+    def discard(self, name: str, ids):
+        if self.index is not None:
+            self.index.discard(name, ids)
+
+    async def search(self, query: str, limit: int, cursor: str = None):
+        offset = self._decode_cursor(query, cursor)
+        if self.index is not None:
+            hits = await self._search_memory(query, offset, limit + 1)
+        else:
+            hits = await self._search_fulltext(query, offset, limit + 1)
+
+        more = len(hits) > limit
+        return {
+            "results": hits[:limit],
+            "next_cursor": encode_token({"q": self._fingerprint(query), "o": offset + limit}) if more else None,
+        }
+
+    async def _search_memory(self, query: str, offset: int, count: int):
+        if not self.index.ready:
+            raise HTTPException(status_code=503, detail="Search index is still building", headers={"Retry-After": "5"})
+        ranked = self.index.search(query, offset + count)[offset:]
+        if not ranked:
+            return []
+
+        rows = {}
+        for name, media_type in MEDIA_TYPES.items():
+            ids = [doc_id for _, hit_type, doc_id in ranked if hit_type == media_type]
+            if ids:
+                query_rows = select(*_hit_columns(name)).where(TABLES[name].c.id.in_(ids))
+                for row in await database.fetch_all(query_rows):
+                    rows[(media_type, row["id"])] = dict(row)
+
+        hits = []
+        for score, media_type, doc_id in ranked:
+            row = rows.get((media_type, doc_id))
+            if row is not None:  # ✅ Deleted by another worker since indexing
+                hits.append({**row, "score": score})
+        return hits
+
+    async def _search_fulltext(self, query: str, offset: int, count: int):
+        selects = []
+        for name, fields in SEARCH_FIELDS.items():
+            table = TABLES[name]
+            score = match(*[table.c[field] for field in fields], against=query)
+            selects.append(select(*_hit_columns(name), score.label("score")).where(score))
+        ranked = (
+            union_all(*selects)
+            .order_by(literal_column("score").desc(), literal_column("type"), literal_column("id"))
+            .offset(offset)
+            .limit(count)
+        )
+        return [{**dict(row), "score": round(float(row["score"]), 6)} for row in await database.fetch_all(ranked)]
+
+    @staticmethod
+    def _fingerprint(query: str) -> str:
+        return hashlib.sha1(" ".join(tokenize(query)).encode()).hexdigest()[:12]
+
+    def _decode_cursor(self, query: str, cursor: str) -> int:
+        if not cursor:
+            return 0
+        try:
+            payload = decode_token(cursor)
+            if payload["q"] != self._fingerprint(query):
+                raise ValueError("cursor was issued for a different query")
+            offset = int(payload["o"])
+            if offset < 0:
+                raise ValueError("negative offset")
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+        return offset
+
+    def stats(self) -> dict:
+        stats = {"backend": self.backend}
+        if self.index is not None:
+            stats.update(self.index.stats())
+        return stats
+
+
+def _choose_backend() -> str:
+    if SEARCH_BACKEND != "auto":
+        return SEARCH_BACKEND
+    return "fulltext" if database.url.dialect == "mysql" else "memory"
+
+
+media_search = MediaSearch(_choose_backend())
@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.dialects import mysql, sqlite
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+from crud import apply_media_batch, BATCH_COLUMNS, BATCH_TABLES, URL_COLUMNS
+from database import database
+from metrics import registry, Counter
+from models import uploads, upload_chunks
+from schemas import MediaBatchOperation
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MiB = 1024 * 1024
+
+# ✅ Local storage settings
+STORAGE_DIR = os.getenv("STORAGE_DIR", "media_files")
+STORAGE_URL = os.getenv("STORAGE_URL", "/api/files")  # ✅ Prefix written into video_url / image_url
+STORAGE_ACCEL_REDIRECT = os.getenv("STORAGE_ACCEL_REDIRECT")  # e.g. /protected-files/ to let nginx send the files
+STORAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"  # ✅ Stored names are never reused
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * MiB)))
+UPLOAD_MIN_CHUNK_SIZE = 64 * 1024
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv("UPLOAD_MAX_CHUNK_SIZE", str(64 * MiB)))
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(20 * 1024 * MiB)))
+UPLOAD_TTL_HOURS = float(os.getenv("UPLOAD_TTL_HOURS", "24"))  # ✅ Since the last chunk
+UPLOAD_WRITE_BUFFER = int(os.getenv("UPLOAD_WRITE_BUFFER", str(MiB)))  # ✅ Bytes gathered per disk write
+UPLOAD_CHUNK_TIMEOUT = float(os.getenv("UPLOAD_CHUNK_TIMEOUT", "600"))  # ✅ Seconds one chunk PUT may take
+
+MEDIA_DIRS = {"video": "videos", "image": "images"}
+_STORED_NAME = re.compile(r"^[0-9a-f]{32}(\.[a-z0-9]{1,10})?$")
+_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+upload_chunks_received = registry.register(Counter(
+    "upload_chunks_total", "Upload chunks received, by result (stored or rejected).", ("result",),
+))
+upload_bytes = registry.register(Counter("upload_bytes_total", "Bytes of verified upload chunks written to disk."))
+
+
+def _write_at(fd: int, data: bytearray, offset: int, digest):
+    """Hashes and writes `data` at `offset` (hashlib and pwrite both release the GIL)."""
+    digest.update(data)
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view, offset = view[written:], offset + written
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        while block := source.read(MiB):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MediaFileResponse(FileResponse):
+    """
+    FileResponse (Range and If-Range handled by Starlette) that hands whole
+    files to the server when it offers the ASGI pathsend extension, so they
+    go out with sendfile instead of through Python. Otherwise it streams
+    in larger reads than Starlette's 64 KiB default.
+    """
+    chunk_size = MiB
+
+    async def __call__(self, scope, receive, send):
+        pathsend = "http.response.pathsend" in scope.get("extensions", {})
+        if not pathsend or scope["method"] != "GET" or "range" in Headers(scope=scope):
+            await super().__call__(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.pathsend", "path": str(self.path)})
+
+
+class LocalStorage:
+    """
+    Media files on local disk, uploaded in resumable chunks. An upload gets
+    a sparse .part file of its final size and each chunk is streamed into
+    place at its offset, hashed on the way and recorded only if it matches
+    its SHA-256, so chunks can arrive in any order, be retried, or resume
+    after a restart without the whole file ever being held in memory.
+    Completing moves the file under videos/ or images/ and creates its row
+    through the batch path, so facets, cache and search stay in step.
+
+    A chunk being written has an unverified upload_chunks row (a random
+    claim token and its start time), claimed under the upload's row lock.
+    complete() takes the same lock and counts only verified chunks, so it
+    can never publish a file while a PUT still writes into it; a PUT
+    arriving after completion began is refused before it opens the file.
+    """
+
+    def __init__(self, root: str = STORAGE_DIR):
+        self.root = root
+
+    def part_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, ".uploads", f"{upload_id}.part")
+
+    def file_path(self, directory: str, stored_name: str) -> str:
+        return os.path.join(self.root, directory, stored_name)
+
+    def url(self, media_type: str, stored_name: str) -> str:
+        return f"{STORAGE_URL.rstrip('/')}/{MEDIA_DIRS[media_type]}/{stored_name}"
+
+    @staticmethod
+    def _expiry() -> datetime:
+        return datetime.utcnow() + timedelta(hours=UPLOAD_TTL_HOURS)
+
+    @staticmethod
+    def _allocate(path: str, size: int):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as target:
+            target.truncate(size)  # ✅ Sparse: no disk is used until chunks land
+
+    async def _fetch(self, upload_id: str):
+        upload = await database.fetch_one(uploads.select().where(uploads.c.id == upload_id))
+        if upload is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return upload
+
+    async def create(self, data, created_by: int = None) -> dict:
+        """Opens an upload for an UploadCreate; the media row's values are fixed here."""
+        name, table = BATCH_TABLES[data.type]
+        chunk_size = data.chunk_size or UPLOAD_CHUNK_SIZE
+        if not 0 < data.size <= UPLOAD_MAX_SIZE:
+            raise HTTPException(status_code=400, detail=f"size must be between 1 and {UPLOAD_MAX_SIZE} bytes")
+        if not UPLOAD_MIN_CHUNK_SIZE <= chunk_size <= UPLOAD_MAX_CHUNK_SIZE:
+            raise HTTPException(status_code=400, detail=f"chunk_size must be between {UPLOAD_MIN_CHUNK_SIZE} and {UPLOAD_MAX_CHUNK_SIZE} bytes")
+
+        file_name = os.path.basename(data.file_name.replace("\\", "/")).strip()
+        if not file_name or len(file_name) > table.c.file_name.type.length:
+            raise HTTPException(status_code=400, detail="Invalid file_name")
+        fields = data.model_dump(include={"title", "description", "alt_text", "category"}, exclude_none=True)
+        unknown = sorted(set(fields) - set(BATCH_COLUMNS[name]))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"{', '.join(unknown)} not allowed for {name}")
+        for column, value in fields.items():
+            length = getattr(table.c[column].type, "length", None)
+            if length and len(value) > length:
+                raise HTTPException(status_code=400, detail=f"{column} is longer than {length} characters")
+
+        upload_id = uuid.uuid4().hex
+        extension = os.path.splitext(file_name)[1].lower()
+        stored_name = upload_id + (extension if _EXTENSION.match(extension) else "")
+        values = {"file_name": file_name, URL_COLUMNS[name]: self.url(data.type, stored_name), "uploaded_by": created_by, **fields}
+
+        await self.purge_expired()
+        await run_in_threadpool(self._allocate, self.part_path(upload_id), data.size)
+        await database.execute(uploads.insert().values(
+            id=upload_id, media_type=data.type, file_name=file_name, stored_name=stored_name, size=data.size,
+            chunk_size=chunk_size, sha256=data.sha256, details=json.dumps(values), created_by=created_by,
+            expires_at=self._expiry(),
+        ))
+        return await self.describe(upload_id)
+
+    async def describe(self, upload_id: str) -> dict:
+        upload = await self._fetch(upload_id)
+        chunks = -(-upload["size"] // upload["chunk_size"])
+        if upload["status"] == "completed":
+            received = list(range(chunks))
+        else:
+            query = (
+                select(upload_chunks.c.chunk_index)
+                .where(upload_chunks.c.upload_id == upload_id, upload_chunks.c.claim.is_(None))
+                .order_by(upload_chunks.c.chunk_index)
+            )
+            received = [row["chunk_index"] for row in await database.fetch_all(query)]
+        return {
+            "id": upload["id"], "type": upload["media_type"], "file_name": upload["file_name"], "size": upload["size"],
+            "chunk_size": upload["chunk_size"], "chunks": chunks, "received": received, "status": upload["status"],
+            "url": self.url(upload["media_type"], upload["stored_name"]), "media_id": upload["media_id"],
+            "expires_at": upload["expires_at"] if upload["status"] != "completed" else None,
+        }
+
+    async def _upsert_chunk(self, row: dict):
+        if database.url.dialect == "mysql":
+            query = mysql.insert(upload_chunks).values(row)
+            query = query.on_duplicate_key_update({column: query.inserted[column] for column in ("size", "sha256", "started_at", "claim")})
+        else:
+            query = sqlite.insert(upload_chunks).values(row)
+            query = query.on_conflict_do_update(
+                index_elements=["upload_id", "chunk_index"],
+                set_={column: query.excluded[column] for column in ("size", "sha256", "started_at", "claim")},
+            )
+        await database.execute(query)
+
+    async def _lock_open(self, upload_id: str):
+        """The upload's row, locked for the transaction; 409 unless it still takes chunks."""
+        upload = await database.fetch_one(uploads.select().where(uploads.c.id == upload_id).with_for_update())
+        if upload is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        if upload["status"] != "uploading":
+            raise HTTPException(status_code=409, detail=f"Upload is {upload['status']}")
+        return upload
+
+    def _chunk_key(self, upload_id: str, index: int):
+        return (upload_chunks.c.upload_id == upload_id, upload_chunks.c.chunk_index == index)
+
+    async def _claim_chunk(self, upload_id: str, index: int) -> str:
+        """Marks chunk `index` as being written (unverified) and returns the claim's token."""
+        started_at, claim = datetime.utcnow(), uuid.uuid4().hex
+        async with database.transaction():
+            await self._lock_open(upload_id)
+            current = await database.fetch_one(select(upload_chunks.c.started_at).where(*self._chunk_key(upload_id, index)))
+            # ✅ A writer gives up after UPLOAD_CHUNK_TIMEOUT, so an older claim belongs to a crashed process
+            if current is not None and current["started_at"] is not None and \
+                    current["started_at"] > started_at - timedelta(seconds=UPLOAD_CHUNK_TIMEOUT + 60):
+                raise HTTPException(status_code=409, detail=f"Chunk {index} is already being written")
+            # ✅ A retry overwrites the chunk's bytes, so it is unverified until it checks out again
+            await self._upsert_chunk({
+                "upload_id": upload_id, "chunk_index": index, "size": 0, "sha256": "", "started_at": started_at, "claim": claim,
+            })
+        return claim
+
+    async def _release_chunk(self, upload_id: str, index: int, claim: str):
+        await database.execute(upload_chunks.delete().where(*self._chunk_key(upload_id, index), upload_chunks.c.claim == claim))
+
+    async def _record_chunk(self, upload_id: str, index: int, claim: str, size: int, checksum: str):
+        async with database.transaction():
+            await self._lock_open(upload_id)
+            current = await database.fetch_val(select(upload_chunks.c.claim).where(*self._chunk_key(upload_id, index)))
+            if current != claim:
+                raise HTTPException(status_code=409, detail=f"Chunk {index} was taken over by another request; send it again")
+            await database.execute(upload_chunks.update().where(*self._chunk_key(upload_id, index)).values(
+                size=size, sha256=checksum, started_at=None, claim=None,
+            ))
+            await database.execute(uploads.update().where(uploads.c.id == upload_id).values(expires_at=self._expiry()))
+
+    async def _receive_chunk(self, fd: int, body, index: int, offset: int, expected: int):
+        """Streams `body` to `offset`; returns (bytes received, sha256 hex)."""
+        digest, received, buffer = hashlib.sha256(), 0, bytearray()
+        async for piece in body:
+            received += len(piece)
+            if received > expected:
+                upload_chunks_received.inc("rejected")
+                raise HTTPException(status_code=413, detail=f"Chunk {index} must be {expected} bytes")
+            buffer += piece
+            if len(buffer) >= UPLOAD_WRITE_BUFFER:
+                data, buffer = buffer, bytearray()
+                await run_in_threadpool(_write_at, fd, data, offset + received - len(data), digest)
+        if buffer:
+            await run_in_threadpool(_write_at, fd, buffer, offset + received - len(buffer), digest)
+        return received, digest.hexdigest()
+
+    async def write_chunk(self, upload_id: str, index: int, body, checksum: str) -> dict:
+        """
+        Streams one chunk (an async iterator of bytes, e.g. request.stream())
+        to its offset in the .part file. The chunk must have exactly its
+        expected length and match `checksum`; otherwise it is left unrecorded
+        and has to be sent again.
+        """
+        upload = await self._fetch(upload_id)
+        if upload["status"] != "uploading":
+            raise HTTPException(status_code=409, detail=f"Upload is {upload['status']}")
+        chunks = -(-upload["size"] // upload["chunk_size"])
+        if not 0 <= index < chunks:
+            raise HTTPException(status_code=400, detail=f"Chunk index must be between 0 and {chunks - 1}")
+        checksum = (checksum or "").lower()
+        if not _SHA256.match(checksum):
+            raise HTTPException(status_code=400, detail="X-Chunk-SHA256 header with the chunk's hex SHA-256 is required")
+
+        offset = index * upload["chunk_size"]
+        expected = min(upload["chunk_size"], upload["size"] - offset)
+        claim = await self._claim_chunk(upload_id, index)
+        try:
+            try:
+                fd = await run_in_threadpool(os.open, self.part_path(upload_id), os.O_WRONLY)
+            except FileNotFoundError:
+                raise HTTPException(status_code=409, detail="Upload is no longer open")
+            try:
+                received, digest = await asyncio.wait_for(
+                    self._receive_chunk(fd, body, index, offset, expected), UPLOAD_CHUNK_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                upload_chunks_received.inc("rejected")
+                raise HTTPException(status_code=408, detail=f"Chunk {index} took longer than {UPLOAD_CHUNK_TIMEOUT:g} seconds")
+            finally:
+                os.close(fd)
+
+            if received != expected:
+                upload_chunks_received.inc("rejected")
+                raise HTTPException(status_code=400, detail=f"Chunk {index} is {received} bytes, expected {expected}")
+            if digest != checksum:
+                upload_chunks_received.inc("rejected")
+                raise HTTPException(status_code=400, detail=f"Chunk {index} does not match its checksum")
+            await self._record_chunk(upload_id, index, claim, received, checksum)
+        except Exception:
+            await self._release_chunk(upload_id, index, claim)  # ✅ Lets the client retry at once
+            raise
+
+        upload_chunks_received.inc("stored")
+        upload_bytes.inc(amount=received)
+        return {"index": index, "size": received, "sha256": checksum}
+
+    def _finish_file(self, part: str, target: str, sha256: str = None):
+        if sha256 and _file_sha256(part) != sha256:
+            raise HTTPException(status_code=400, detail="File does not match its checksum")
+        with open(part, "rb") as source:
+            os.fsync(source.fileno())
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(part, target)
+
+    async def _reopen(self, upload_id: str):
+        await database.execute(uploads.update().where(uploads.c.id == upload_id).values(status="uploading"))
+
+    async def complete(self, upload_id: str) -> dict:
+        """
+        Checks every chunk is in, moves the file into place and creates the
+        videos/images row. Completing a completed upload returns it as is.
+        """
+        async with database.transaction():
+            upload = await database.fetch_one(uploads.select().where(uploads.c.id == upload_id).with_for_update())
+            if upload is None:
+                raise HTTPException(status_code=404, detail="Upload not found")
+            if upload["status"] == "completing":
+                raise HTTPException(status_code=409, detail="Upload is already being completed")
+            if upload["status"] == "uploading":
+                chunks = -(-upload["size"] // upload["chunk_size"])
+                # ✅ Chunks still being written are unverified, so they count as missing
+                query = select(func.count()).select_from(upload_chunks).where(
+                    upload_chunks.c.upload_id == upload_id, upload_chunks.c.claim.is_(None),
+                )
+                missing = chunks - await database.fetch_val(query)
+                if missing:
+                    raise HTTPException(status_code=400, detail=f"{missing} of {chunks} chunks missing")
+                await database.execute(uploads.update().where(uploads.c.id == upload_id).values(status="completing", expires_at=self._expiry()))
+        if upload["status"] == "completed":
+            return await self.describe(upload_id)
+
+        part = self.part_path(upload_id)
+        target = self.file_path(MEDIA_DIRS[upload["media_type"]], upload["stored_name"])
+        try:
+            await run_in_threadpool(self._finish_file, part, target, upload["sha256"])
+        except BaseException:
+            await self._reopen(upload_id)
+            raise
+
+        operation = MediaBatchOperation(op="create", type=upload["media_type"], values=json.loads(upload["details"]))
+        [result] = await apply_media_batch([operation])
+        if result["status"] != "created":
+            await run_in_threadpool(os.replace, target, part)
+            await self._reopen(upload_id)
+            raise HTTPException(status_code=400 if result["status"] == "invalid" else 500, detail=f"Could not create the media row: {result['error']}")
+
+        async with database.transaction():
+            await database.execute(uploads.update().where(uploads.c.id == upload_id).values(status="completed", media_id=result["id"]))
+            await database.execute(upload_chunks.delete().where(upload_chunks.c.upload_id == upload_id))
+        logger.info("Stored upload %s as %s %s (%d bytes)", upload_id, upload["media_type"], result["id"], upload["size"])
+        return await self.describe(upload_id)
+
+    async def _discard(self, upload):
+        async with database.transaction():
+            await database.execute(upload_chunks.delete().where(upload_chunks.c.upload_id == upload["id"]))
+            await database.execute(uploads.delete().where(uploads.c.id == upload["id"]))
+        paths = [self.part_path(upload["id"])]
+        if upload["status"] == "completing":  # ✅ Interrupted after the move, before the row existed
+            paths.append(self.file_path(MEDIA_DIRS[upload["media_type"]], upload["stored_name"]))
+        for path in paths:
+            try:
+                await run_in_threadpool(os.remove, path)
+            except FileNotFoundError:
+                pass
+
+    async def abort(self, upload_id: str):
+        upload = await self._fetch(upload_id)
+        if upload["status"] != "uploading":
+            raise HTTPException(status_code=409, detail=f"Upload is {upload['status']}")
+        await self._discard(upload)
+
+    async def purge_expired(self) -> int:
+        """Drops unfinished uploads whose last chunk is older than UPLOAD_TTL_HOURS."""
+        query = uploads.select().where(uploads.c.status != "completed", uploads.c.expires_at < datetime.utcnow())
+        expired = await database.fetch_all(query)
+        for upload in expired:
+            await self._discard(upload)
+        if expired:
+            logger.info("Purged %d expired uploads", len(expired))
+        return len(expired)
+
+    async def response(self, directory: str, stored_name: str) -> Response:
+        """Serves a stored file, or leaves it to nginx when STORAGE_ACCEL_REDIRECT is set."""
+        if directory not in MEDIA_DIRS.values() or not _STORED_NAME.match(stored_name):
+            raise HTTPException(status_code=404, detail="File not found")
+        headers = {"Cache-Control": STORAGE_CACHE_CONTROL}
+        if STORAGE_ACCEL_REDIRECT:
+            headers["X-Accel-Redirect"] = f"{STORAGE_ACCEL_REDIRECT.rstrip('/')}/{directory}/{stored_name}"
+            return Response(headers=headers)
+
+        path = self.file_path(directory, stored_name)
+        try:
+            stat_result = await run_in_threadpool(os.stat, path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
+        return MediaFileResponse(path, stat_result=stat_result, headers=headers)
+
+
+storage = LocalStorage()
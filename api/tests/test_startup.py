@@ -0,0 +1,20 @@
+"""
+Start-up budget: a fresh worker must be ready within STARTUP_BUDGET seconds
+(median of STARTUP_RUNS spawns) without importing the lazy MFA/QR modules.
+Run from the api/ directory: python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_startup import check
+
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "1.0"))
+STARTUP_RUNS = int(os.getenv("STARTUP_RUNS", "3"))
+
+
+def test_startup_within_budget():
+    _, ready, failures = check(STARTUP_RUNS, STARTUP_BUDGET)
+    assert not failures, "; ".join(failures)
+    assert ready <= STARTUP_BUDGET
@@ -31,7 +31,11 @@ export default function MFAPage() {
         }
 
         const data = await generateQRCode(user.username);
-        setQrCode(`data:image/png;base64,${data.qr_code}`);
+        setQrCode(
+          data.format === "svg"
+            ? `data:image/svg+xml;charset=utf-8,${encodeURIComponent(data.qr_code)}`
+            : `data:image/png;base64,${data.qr_code}`
+        );
         setSecret(data.mfa_secret);
 
         if (data.mfa_enabled === true) {
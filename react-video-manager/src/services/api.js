@@ -8,6 +8,8 @@ const getToken = () => localStorage.getItem("access_token");
 // Axios instance
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
+  // Sends the API's cookies cross-origin (db_primary_until: read-your-writes after an edit)
+  withCredentials: true,
   headers: {
     "Content-Type": "application/json",
   },
@@ -59,13 +61,20 @@ export const getAdminData = async () => {
 
 // ✅ 4️⃣ Logout
 export const logoutAdmin = () => {
+  const token = getToken();
+  if (token) {
+    // Revoke the token server-side; the local logout doesn't wait for it
+    apiClient
+      .post("/admin/logout", null, { headers: { Authorization: `Bearer ${token}` } })
+      .catch(() => {});
+  }
   localStorage.removeItem("access_token");
 };
 
 // ✅ 5️⃣ Generate MFA QR
-export const generateQRCode = async (username) => {
+export const generateQRCode = async (username, format = "svg") => {
   try {
-    const response = await apiClient.get(`/mfa/generate/${username}`);
+    const response = await apiClient.get(`/mfa/generate/${username}`, { params: { format } });
     return response.data;
   } catch (error) {
     throw error.response?.data?.detail || "Failed to generate MFA QR Code.";
@@ -93,6 +102,33 @@ export const verifyOTP = async (username, otp) => {
   }
 };
 
+// ✅ Fetch Media (revalidates with ETag, reuses the last body on 304)
+const mediaCache = new Map();
+
+export const getMedia = async (params = {}) => {
+  const key = JSON.stringify(params);
+  const cached = mediaCache.get(key);
+
+  try {
+    const response = await apiClient.get("/media", {
+      params,
+      headers: cached ? { "If-None-Match": cached.etag } : {},
+      validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+    });
+
+    if (response.status === 304 && cached) {
+      return cached.data;
+    }
+
+    if (response.headers.etag) {
+      mediaCache.set(key, { etag: response.headers.etag, data: response.data });
+    }
+    return response.data;
+  } catch (error) {
+    throw error.response?.data?.detail || "Failed to load media.";
+  }
+};
+
 // ✅ 7️⃣ Upload File After MFA
 export const uploadFile = async (file, otp) => {
   const formData = new FormData();